@@ -51,30 +51,57 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "core.timeouts.StatementTimeoutMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "core.routers.ReplicaPinningMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# Request profiling (core.profiling): PROFILING=true records per-view query
+# counts and timings, reported to staff at /core/profiling/.
+PROFILING = str.lower(os.getenv("PROFILING", "false")) == "true"
+if PROFILING:
+    MIDDLEWARE.insert(0, "core.profiling.QueryProfilingMiddleware")
+
+# Requests kept per view by the profiler
+PROFILING_BUFFER_SIZE = 200
+
+# Per-view limits (by URL name, "default" for every view); a request over
+# one of them logs a warning.
+PROFILING_BUDGETS = {
+    "default": {"queries": 50, "db_ms": 500, "total_ms": 1000},
+    "core:dashboard": {"queries": 10},
+    "data_loader:upload": {"total_ms": 30000},
+}
+
 ROOT_URLCONF = "config.urls"
 
 TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
         "DIRS": [BASE_DIR / "templates"],
-        "APP_DIRS": True,
         "OPTIONS": {
             "context_processors": [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
             ],
+            "loaders": [
+                "django.template.loaders.filesystem.Loader",
+                "django.template.loaders.app_directories.Loader",
+            ],
         },
     },
 ]
+if DEBUG != 'true':
+    # Compile each template once per process in production
+    TEMPLATES[0]["OPTIONS"]["loaders"] = [
+        ("django.template.loaders.cached.Loader", TEMPLATES[0]["OPTIONS"]["loaders"])
+    ]
 
 WSGI_APPLICATION = "config.wsgi.application"
 
@@ -98,6 +125,77 @@ else:
             "PASSWORD": os.getenv("DB_PASSWORD"),
             "HOST": os.getenv("DB_HOST"),
             "PORT": os.getenv("DB_PORT"),
+            # Keep connections open across requests, checked before reuse
+            "CONN_MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE", "60")),
+            "CONN_HEALTH_CHECKS": True,
+            # Behind a transaction-pooling PgBouncer, server-side cursors
+            # (used by QuerySet.iterator()) must be disabled.
+            "DISABLE_SERVER_SIDE_CURSORS": str.lower(
+                os.getenv("DB_DISABLE_SERVER_SIDE_CURSORS", "false")
+            ) == "true",
+            "OPTIONS": {},
+        }
+    }
+    if str.lower(os.getenv("DB_POOL", "false")) == "true":
+        # psycopg 3 connection pool (pip install "psycopg[binary,pool]");
+        # pooled connections replace persistent ones.
+        DATABASES["default"]["CONN_MAX_AGE"] = 0
+        DATABASES["default"]["OPTIONS"]["pool"] = {
+            "min_size": int(os.getenv("DB_POOL_MIN_SIZE", "2")),
+            "max_size": int(os.getenv("DB_POOL_MAX_SIZE", "10")),
+            "timeout": int(os.getenv("DB_POOL_TIMEOUT", "10")),
+        }
+
+# Optional read replica (core.routers): set DB_REPLICA_HOST and/or
+# DB_REPLICA_NAME (with DEBUG=true, the path of a second SQLite file, e.g. a
+# copy of db.sqlite3). Unset DB_REPLICA_* settings are those of the primary.
+if os.getenv("DB_REPLICA_HOST") or os.getenv("DB_REPLICA_NAME"):
+    DATABASES["replica"] = {
+        **DATABASES["default"],
+        "OPTIONS": dict(DATABASES["default"].get("OPTIONS", {})),
+        # Tests run against the primary's test database
+        "TEST": {"MIRROR": "default"},
+    }
+    for key in ("NAME", "USER", "PASSWORD", "HOST", "PORT"):
+        if os.getenv(f"DB_REPLICA_{key}"):
+            DATABASES["replica"][key] = os.getenv(f"DB_REPLICA_{key}")
+
+DATABASE_ROUTERS = ["core.routers.ReplicaRouter"]
+
+# Seconds during which reads stay on the primary after an import, or after
+# a request of the same client wrote: an upper bound of the replica's lag.
+REPLICA_PIN_SECONDS = int(os.getenv("DB_REPLICA_PIN_SECONDS", "10"))
+
+# Per-statement limit (ms) of web requests, set by
+# core.timeouts.StatementTimeoutMiddleware; management commands run without
+# it. PostgreSQL only.
+STATEMENT_TIMEOUT = int(os.getenv("DB_STATEMENT_TIMEOUT", "30000"))
+
+# Per-statement limit (ms) inside import transactions, which legitimately run
+# longer statements than web requests; 0 disables it. PostgreSQL only.
+IMPORT_STATEMENT_TIMEOUT = int(os.getenv("DB_IMPORT_STATEMENT_TIMEOUT", "0"))
+
+
+# Cache
+# Local memory by default. Set CACHE_DIR to share a file-based cache between
+# worker processes, so that an import invalidates every worker's entries;
+# it is required with a read replica, which the data version pins to the
+# primary after an import (check core.E001).
+CACHE_TIMEOUT = int(os.getenv("CACHE_TIMEOUT", "300"))
+if os.getenv("CACHE_DIR"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": os.getenv("CACHE_DIR"),
+            "TIMEOUT": CACHE_TIMEOUT,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "smarteduc",
+            "TIMEOUT": CACHE_TIMEOUT,
         }
     }
 
@@ -160,4 +258,21 @@ SESSION_COOKIE_SECURE = True
 CSRF_COOKIE_SECURE = True
 SECURE_BROWSER_XSS_FILTER = True
 SECURE_CONTENT_TYPE_NOSNIFF = True
-X_FRAME_OPTIONS = 'DENY'
\ No newline at end of file
+X_FRAME_OPTIONS = 'DENY'
+
+# Degree eligibility (core.services.eligibility), checked on the retained
+# notes (out of 20) of a program's courses; a rule set to None is skipped.
+DEGREE_ELIGIBILITY_RULES = {
+    # A course's credits are earned with a note at or above it
+    "pass_mark": 10,
+    # Credits earned over the academic year
+    "min_credits": 60,
+    # Credit-weighted average of the courses taken
+    "min_average": 10,
+    # Lowest note allowed on any course taken, after rattrapage
+    "min_note": None,
+}
+
+# Worker processes rendering transcripts in the export_transcripts command;
+# 0 uses one per CPU. Web downloads render in the requesting process.
+TRANSCRIPT_WORKERS = int(os.getenv("TRANSCRIPT_WORKERS", "0"))
@@ -1,5 +1,16 @@
+from collections import Counter
+
 from django.contrib import admin
+from django.contrib.admin.options import csrf_protect_m
+from django.contrib.auth import get_permission_codename
+
+from .routers import use_replica
+from .services.course_statistics import refresh_course_statistics
+from .services.purge import academic_year_plan, count_plan, institution_plan, purge
+from .services.student_search import search_students
 from .models import (
+    AcademicYear,
+    ChangeLog,
     Institution,
     Institute,
     Teacher,
@@ -12,29 +23,96 @@ from .models import (
 )
 
 
+class ReplicaChangelistMixin:
+    """
+    List and search from the read replica. Only GET: a POST runs an action,
+    whose reads must see the primary.
+    """
+
+    def changelist_view(self, request, extra_context=None):
+        with use_replica(request.method == "GET"):
+            return super().changelist_view(request, extra_context)
+
+
+class PurgeAdminMixin:
+    """
+    Delete through core.services.purge instead of the deletion collector,
+    which loads every cascaded row into memory, both to list it on the
+    confirmation page and to delete it. The page shows per-model counts
+    instead. Subclasses define purge_plan(obj).
+    """
+
+    def get_deleted_objects(self, objs, request):
+        counts = Counter()
+        for obj in objs:
+            for model, count in count_plan(self.purge_plan(obj)):
+                counts[model] += count
+        model_count = {
+            model._meta.verbose_name_plural: count
+            for model, count in counts.items()
+            if count
+        }
+        perms_needed = {
+            model._meta.verbose_name
+            for model, count in counts.items()
+            if count
+            and not request.user.has_perm(
+                f"{model._meta.app_label}."
+                f"{get_permission_codename('delete', model._meta)}"
+            )
+        }
+        return [str(obj) for obj in objs], model_count, perms_needed, []
+
+    @csrf_protect_m
+    def delete_view(self, request, object_id, extra_context=None):
+        # ModelAdmin.delete_view() runs the POST in transaction.atomic(),
+        # which would turn the per-batch transactions of purge() into
+        # savepoints of a single transaction spanning the whole purge. The
+        # delete_selected action already runs outside of one.
+        return self._delete_view(request, object_id, extra_context)
+
+    def delete_model(self, request, obj):
+        purge(self.purge_plan(obj))
+
+    def delete_queryset(self, request, queryset):
+        for obj in queryset:
+            purge(self.purge_plan(obj))
+
+
 @admin.register(Institution)
-class InstitutionAdmin(admin.ModelAdmin):
+class InstitutionAdmin(PurgeAdminMixin, ReplicaChangelistMixin, admin.ModelAdmin):
     list_display = ("acronym", "name", "type", "city")
     search_fields = ("name", "acronym", "city")
     list_filter = ("type", "city")
 
+    def purge_plan(self, obj):
+        return institution_plan(obj)
+
+
+@admin.register(AcademicYear)
+class AcademicYearAdmin(PurgeAdminMixin, ReplicaChangelistMixin, admin.ModelAdmin):
+    list_display = ("label", "start_year")
+
+    def purge_plan(self, obj):
+        return academic_year_plan(obj)
+
 
 @admin.register(Institute)
-class InstituteAdmin(admin.ModelAdmin):
+class InstituteAdmin(ReplicaChangelistMixin, admin.ModelAdmin):
     list_display = ("acronym", "name", "institution")
     search_fields = ("name", "acronym")
     list_filter = ("institution",)
 
 
 @admin.register(Program)
-class ProgramAdmin(admin.ModelAdmin):
+class ProgramAdmin(ReplicaChangelistMixin, admin.ModelAdmin):
     list_display = ("program_id", "name", "domain", "level", "institute")
     search_fields = ("program_id", "name", "domain")
     list_filter = ("domain", "level", "institute")
 
 
 @admin.register(Course)
-class CourseAdmin(admin.ModelAdmin):
+class CourseAdmin(ReplicaChangelistMixin, admin.ModelAdmin):
     list_display = (
         "course_id",
         "code",
@@ -46,17 +124,25 @@ class CourseAdmin(admin.ModelAdmin):
     )
     search_fields = ("course_id", "code", "name")
     list_filter = ("semester", "program", "teacher")
+    # teacher is nullable, so the default select_related() would skip it
+    list_select_related = ("program", "teacher")
 
 
 @admin.register(Student)
-class StudentAdmin(admin.ModelAdmin):
+class StudentAdmin(ReplicaChangelistMixin, admin.ModelAdmin):
     list_display = ("student_id", "first_name", "last_name", "gender", "birthdate")
     search_fields = ("student_id", "first_name", "last_name")
     list_filter = ("gender",)
 
+    def get_search_results(self, request, queryset, search_term):
+        # Indexed, accent-insensitive search instead of icontains scans
+        if not search_term.strip():
+            return queryset, False
+        return search_students(search_term, queryset), False
+
 
 @admin.register(Teacher)
-class TeacherAdmin(admin.ModelAdmin):
+class TeacherAdmin(ReplicaChangelistMixin, admin.ModelAdmin):
     list_display = (
         "teacher_id",
         "first_name",
@@ -70,7 +156,7 @@ class TeacherAdmin(admin.ModelAdmin):
 
 
 @admin.register(Enrollment)
-class EnrollmentAdmin(admin.ModelAdmin):
+class EnrollmentAdmin(ReplicaChangelistMixin, admin.ModelAdmin):
     list_display = (
         "enrollment_id",
         "student",
@@ -84,14 +170,14 @@ class EnrollmentAdmin(admin.ModelAdmin):
 
 
 @admin.register(Degree)
-class DegreeAdmin(admin.ModelAdmin):
+class DegreeAdmin(ReplicaChangelistMixin, admin.ModelAdmin):
     list_display = ("degree_id", "name", "degree_type", "enrollment", "date_awarded")
     list_filter = ("degree_type", "date_awarded")
     search_fields = ("degree_id", "name", "enrollment__student__student_id")
 
 
 @admin.register(Result)
-class ResultAdmin(admin.ModelAdmin):
+class ResultAdmin(ReplicaChangelistMixin, admin.ModelAdmin):
     list_display = (
         "result_id",
         "enrollment",
@@ -102,3 +188,25 @@ class ResultAdmin(admin.ModelAdmin):
     )
     list_filter = ("academic_year", "session", "course")
     search_fields = ("result_id", "enrollment__student__student_id", "course__code")
+
+    # Notes changed here must show in the stored course statistics and ranks,
+    # as after an import
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        refresh_course_statistics({form.initial.get("course"), obj.course_id} - {None})
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        refresh_course_statistics([obj.course_id])
+
+    def delete_queryset(self, request, queryset):
+        course_ids = set(queryset.values_list("course_id", flat=True))
+        super().delete_queryset(request, queryset)
+        refresh_course_statistics(course_ids)
+
+
+@admin.register(ChangeLog)
+class ChangeLogAdmin(ReplicaChangelistMixin, admin.ModelAdmin):
+    list_display = ("seq", "model", "object_id", "action", "changed_at")
+    list_filter = ("model", "action")
+    search_fields = ("object_id",)
@@ -0,0 +1,238 @@
+import base64
+import json
+from functools import wraps
+
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Exists, OuterRef, Q
+from django.db.models.expressions import RawSQL
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response, set_response_etag
+from django.utils.dateparse import parse_datetime
+from django.views.decorators.http import require_safe
+
+from core.models import (
+    ChangeLog,
+    Institute,
+    Student,
+    Teacher,
+    Program,
+    Course,
+    Enrollment,
+    Result,
+    Degree,
+)
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# Columns never exposed through the API
+PRIVATE_FIELDS = {"search_name"}
+
+# Resource name -> (model, lookup from the model to its Institution)
+RESOURCES = {
+    "institutes": (Institute, "institution"),
+    "students": (Student, None),
+    "teachers": (Teacher, "institute__institution"),
+    "programs": (Program, "institute__institution"),
+    "courses": (Course, "program__institute__institution"),
+    "enrollments": (Enrollment, "institute__institution"),
+    "results": (Result, "enrollment__institute__institution"),
+    "degrees": (Degree, "enrollment__institute__institution"),
+}
+
+
+class BadRequest(Exception):
+    pass
+
+
+def api_login_required(view_func):
+    """Like login_required, but answer 401 instead of redirecting to the login page."""
+
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({"error": "Authentication required."}, status=401)
+        return view_func(request, *args, **kwargs)
+
+    return wrapper
+
+
+def encode_cursor(pk):
+    return base64.urlsafe_b64encode(json.dumps(pk).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        raise BadRequest("Invalid cursor.")
+
+
+def resource_cursor(model, cursor):
+    """Decode a resource cursor: the primary key of the last row served."""
+    pk = decode_cursor(cursor)
+    if type(pk) not in (int, str):
+        raise BadRequest("Invalid cursor.")
+    try:
+        return model._meta.pk.to_python(pk)
+    except ValidationError:
+        raise BadRequest("Invalid cursor.")
+
+
+def public_fields(model):
+    return [
+        field.attname
+        for field in model._meta.concrete_fields
+        if field.name not in PRIVATE_FIELDS
+    ]
+
+
+def scoped_queryset(resource, institution):
+    """All rows of ``resource`` reachable from ``institution``."""
+    model, lookup = RESOURCES[resource]
+    if model is Student:
+        # Students belong to an institution through their enrollments
+        return Student.objects.filter(
+            Exists(
+                Enrollment.objects.filter(
+                    student=OuterRef("pk"), institute__institution=institution
+                )
+            )
+        )
+    return model.objects.filter(**{lookup: institution})
+
+
+def select_fields(model, requested):
+    """Resolve the ``fields`` parameter; the primary key is always included."""
+    available = public_fields(model)
+    if not requested:
+        return available
+
+    fields = [name.strip() for name in requested.split(",") if name.strip()]
+    unknown = [name for name in fields if name not in available]
+    if unknown:
+        raise BadRequest(f"Unknown fields: {', '.join(unknown)}")
+    pk = model._meta.pk.attname
+    return fields if pk in fields else [pk, *fields]
+
+
+def page_size(value):
+    try:
+        size = int(value or DEFAULT_PAGE_SIZE)
+    except ValueError:
+        raise BadRequest("limit must be an integer.")
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+def read_page(request, resource):
+    """
+    Return one page of ``resource`` as (rows, next_cursor). Pages are keyed
+    on the primary key (rows after the cursor, in pk order), so every page
+    costs an index range scan whatever its depth.
+    """
+    model, _ = RESOURCES[resource]
+    queryset = scoped_queryset(resource, request.user.institution)
+
+    updated_since = request.GET.get("updated_since")
+    if updated_since:
+        if "updated_at" not in public_fields(model):
+            raise BadRequest(f"{resource} do not support updated_since.")
+        since = parse_datetime(updated_since)
+        if since is None:
+            raise BadRequest("updated_since must be an ISO 8601 datetime.")
+        queryset = queryset.filter(updated_at__gte=since)
+
+    cursor = request.GET.get("cursor")
+    if cursor:
+        queryset = queryset.filter(pk__gt=resource_cursor(model, cursor))
+
+    fields = select_fields(model, request.GET.get("fields"))
+    limit = page_size(request.GET.get("limit"))
+    rows = list(queryset.order_by("pk").values(*fields)[: limit + 1])
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][model._meta.pk.attname])
+    return rows, next_cursor
+
+
+@api_login_required
+@require_safe
+def resource_list(request, resource):
+    """
+    Read-only, cursor-paginated list of a core resource, scoped to the
+    user's institution. Supports ``fields``, ``limit``, ``cursor`` and
+    ``updated_since`` parameters, and answers 304 when the client's
+    If-None-Match ETag still matches the page.
+    """
+    if resource not in RESOURCES:
+        return JsonResponse({"error": f"Unknown resource '{resource}'."}, status=404)
+
+    try:
+        rows, next_cursor = read_page(request, resource)
+    except BadRequest as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    response = JsonResponse({"results": rows, "next_cursor": next_cursor})
+    set_response_etag(response)
+    return get_conditional_response(
+        request, etag=response.get("ETag"), response=response
+    )
+
+
+def feed_position(cursor):
+    """Decode a change feed position, a [txid, seq] pair."""
+    position = decode_cursor(cursor)
+    if not (
+        isinstance(position, list)
+        and len(position) == 2
+        and all(type(value) is int for value in position)
+    ):
+        raise BadRequest("Invalid cursor.")
+    return position
+
+
+@api_login_required
+@require_safe
+def change_feed(request):
+    """
+    Entries of the ChangeLog after position ``since``, in (txid, seq)
+    order. The ``next_since`` of a page is the ``since`` to send next.
+
+    On PostgreSQL only entries of transactions older than every running one
+    are served: an import still in progress may hold entries with a lower
+    ``seq`` than entries already committed, and they are served once it
+    has finished, after those. The feed spans every institution, so it is
+    reserved to staff users.
+    """
+    if not request.user.is_staff:
+        return JsonResponse({"error": "Staff access required."}, status=403)
+
+    since = request.GET.get("since")
+    try:
+        txid, seq = feed_position(since) if since else (0, 0)
+        limit = page_size(request.GET.get("limit"))
+    except BadRequest as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    entries = ChangeLog.objects.filter(Q(txid__gt=txid) | Q(txid=txid, seq__gt=seq))
+    if connections[entries.db].vendor == "postgresql":
+        entries = entries.filter(
+            txid__lt=RawSQL("pg_snapshot_xmin(pg_current_snapshot())::text::bigint", [])
+        )
+    rows = list(
+        entries.order_by("txid", "seq").values(
+            "seq", "model", "object_id", "action", "changed_at", "txid"
+        )[:limit]
+    )
+    if rows:
+        since = encode_cursor([rows[-1]["txid"], rows[-1]["seq"]])
+    response = JsonResponse(
+        {"results": rows, "next_since": since or encode_cursor([0, 0])}
+    )
+    set_response_etag(response)
+    return get_conditional_response(
+        request, etag=response.get("ETag"), response=response
+    )
@@ -1,6 +1,21 @@
 from django.apps import AppConfig
+from django.core import checks
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from core.routers import check_shared_cache
+        from core.signals import connect_change_tracking
+        from core.services.partitioning import reset_partitioned_tables
+        from core.services.student_search import ensure_sqlite_index
+
+        connect_change_tracking(self)
+        post_migrate.connect(ensure_sqlite_index, sender=self)
+        post_migrate.connect(reset_partitioned_tables, sender=self)
+        connection_created.connect(reset_partitioned_tables)
+        checks.register(check_shared_cache)
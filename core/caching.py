@@ -0,0 +1,31 @@
+import time
+
+from django.core.cache import cache
+
+# Cache key holding the current data version. Keys of values derived from
+# imported data embed it, so bumping it invalidates them all at once.
+DATA_VERSION_KEY = "core:data_version"
+
+
+def data_version():
+    return cache.get_or_set(DATA_VERSION_KEY, time.time_ns, None)
+
+
+def bump_data_version():
+    """
+    Invalidate every cached value derived from imported data. The version
+    is a timestamp rather than a counter, so a version lost to eviction
+    never comes back to match stale entries.
+    """
+    cache.set(DATA_VERSION_KEY, time.time_ns(), None)
+
+
+def institution_key(name, institution):
+    """Cache key of ``name`` for ``institution`` at the current data version."""
+    institution_id = institution.pk if institution else None
+    return f"core:{name}:{institution_id}:{data_version()}"
+
+
+def cached_for_institution(name, institution, compute, timeout=None):
+    """Return the cached result of ``compute()`` for ``institution``, computing it on a miss."""
+    return cache.get_or_set(institution_key(name, institution), compute, timeout)
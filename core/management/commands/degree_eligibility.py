@@ -0,0 +1,93 @@
+import argparse
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import AcademicYear, Degree, Program
+from core.services.eligibility import award_degrees, degree_candidates
+
+
+def rule_value(value):
+    """A rule threshold, or None for "none" to skip the rule."""
+    return None if value.lower() == "none" else float(value)
+
+
+class Command(BaseCommand):
+    help = (
+        "List the enrollments of a program for an academic year that qualify "
+        "for a degree, and optionally award it to them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("program_id")
+        parser.add_argument("year", help="Academic year, e.g. 2024-2025")
+        for rule, help_text in [
+            ("pass-mark", "Note from which a course's credits are earned."),
+            ("min-credits", "Credits to earn."),
+            ("min-average", "Credit-weighted average to reach."),
+            ("min-note", "Lowest note allowed on any course."),
+        ]:
+            parser.add_argument(
+                f"--{rule}",
+                type=rule_value,
+                default=argparse.SUPPRESS,
+                help=f"{help_text} Default: DEGREE_ELIGIBILITY_RULES; "
+                f'"none" skips the rule.',
+            )
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="List every enrollment, not only the eligible ones.",
+        )
+        parser.add_argument("--output", help="Write the list to this CSV file.")
+        parser.add_argument(
+            "--award",
+            action="store_true",
+            help="Create the degree of every eligible enrollment without one.",
+        )
+        parser.add_argument(
+            "--degree-type", choices=[key for key, _ in Degree.DEGREE_TYPE_CHOICES]
+        )
+        parser.add_argument("--name", help="Name of the awarded degree.")
+        parser.add_argument(
+            "--date",
+            type=datetime.date.fromisoformat,
+            default=datetime.date.today(),
+            help="Award date, YYYY-MM-DD (default: today).",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            program = Program.objects.get(pk=options["program_id"])
+            academic_year = AcademicYear.objects.get(
+                pk=AcademicYear.parse(options["year"])
+            )
+        except (Program.DoesNotExist, AcademicYear.DoesNotExist):
+            raise CommandError("No such program or academic year.")
+        except ValueError as e:
+            raise CommandError(e)
+        if options["award"] and not (options["degree_type"] and options["name"]):
+            raise CommandError("--award requires --degree-type and --name.")
+
+        rules = {
+            rule: options[rule]
+            for rule in ("pass_mark", "min_credits", "min_average", "min_note")
+            if rule in options
+        }
+        candidates = degree_candidates(program, academic_year, **rules)
+        eligible = candidates["eligible"]
+        listed = candidates if options["all"] else candidates[eligible]
+        if options["output"]:
+            listed.to_csv(options["output"])
+        else:
+            self.stdout.write(listed.round(2).to_string())
+        self.stdout.write(
+            f"{eligible.sum()} of {len(candidates)} enrollments eligible, "
+            f"{(eligible & candidates['has_degree']).sum()} already awarded."
+        )
+
+        if options["award"]:
+            degrees = award_degrees(
+                candidates, options["degree_type"], options["name"], options["date"]
+            )
+            self.stdout.write(self.style.SUCCESS(f"Awarded {len(degrees)} degrees."))
@@ -0,0 +1,56 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import AcademicYear, Program
+from core.services.transcripts import (
+    cohort_transcripts,
+    stream_transcripts,
+    transcript_formats,
+    transcript_workers,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Write the transcripts of a program's students for an academic year "
+        "to a ZIP archive, rendered by a pool of worker processes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("program_id")
+        parser.add_argument("year", help="Academic year, e.g. 2024-2025")
+        parser.add_argument("archive", help="Path of the ZIP archive to write.")
+        parser.add_argument(
+            "--format", dest="file_format", choices=transcript_formats(), default="html"
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            help="Worker processes (default: TRANSCRIPT_WORKERS).",
+        )
+
+    def handle(self, *args, program_id, year, archive, file_format, workers, **options):
+        try:
+            program = Program.objects.select_related("institute__institution").get(
+                pk=program_id
+            )
+            academic_year = AcademicYear.objects.get(pk=AcademicYear.parse(year))
+        except (Program.DoesNotExist, AcademicYear.DoesNotExist):
+            raise CommandError("No such program or academic year.")
+        except ValueError as e:
+            raise CommandError(e)
+
+        start = time.perf_counter()
+        documents = cohort_transcripts(program, academic_year)
+        with open(archive, "wb") as f:
+            for chunk in stream_transcripts(
+                documents, file_format, workers or transcript_workers()
+            ):
+                f.write(chunk)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Wrote {len(documents)} transcripts to {archive} "
+                f"in {time.perf_counter() - start:.1f}s."
+            )
+        )
@@ -0,0 +1,70 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import AcademicYear, Institution
+from core.services.purge import (
+    BATCH_SIZE,
+    academic_year_plan,
+    count_plan,
+    institution_plan,
+    purge,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete an institution or an academic year with everything that "
+        "cascades from it, in batched set-based deletes."
+    )
+
+    def add_arguments(self, parser):
+        subcommands = parser.add_subparsers(dest="scope", required=True)
+
+        institution = subcommands.add_parser(
+            "institution", help="Purge an institution."
+        )
+        institution.add_argument("acronym")
+
+        year = subcommands.add_parser(
+            "year", help="Purge an academic year, its enrollments and results."
+        )
+        year.add_argument("year", help="Academic year, e.g. 2019-2020")
+
+        for subcommand in (institution, year):
+            subcommand.add_argument(
+                "--dry-run",
+                action="store_true",
+                help="Only count the rows that would be deleted.",
+            )
+            subcommand.add_argument(
+                "--batch-size",
+                type=int,
+                default=BATCH_SIZE,
+                help="Rows deleted per statement.",
+            )
+
+    def handle(self, *args, scope, dry_run, batch_size, **options):
+        try:
+            if scope == "institution":
+                target = Institution.objects.get(acronym=options["acronym"])
+                plan = institution_plan(target)
+            else:
+                target = AcademicYear.objects.get(
+                    pk=AcademicYear.parse(options["year"])
+                )
+                plan = academic_year_plan(target)
+        except (Institution.DoesNotExist, AcademicYear.DoesNotExist):
+            raise CommandError(f"No such {scope}.")
+        except ValueError as e:
+            raise CommandError(e)
+
+        if dry_run:
+            for model, count in count_plan(plan):
+                self.stdout.write(f"{model._meta.label}\t{count}")
+            self.stdout.write(f"Dry run: nothing deleted from {target}.")
+            return
+
+        purge(plan, batch_size, progress=self.report)
+        self.stdout.write(self.style.SUCCESS(f"Purged {target}"))
+
+    def report(self, model, deleted, total):
+        self.stdout.write(f"{model._meta.label}\t{deleted}/{total}")
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from core.services.course_statistics import BATCH_SIZE, refresh_course_statistics
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the stored note statistics of some or all courses, e.g. "
+        "after results were changed outside of an import."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "course_ids", nargs="*", help="Courses to refresh (default: all)."
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=BATCH_SIZE,
+            help="Courses summarized at a time.",
+        )
+
+    def handle(self, *args, course_ids, batch_size, **options):
+        stored = refresh_course_statistics(course_ids or None, batch_size)
+        self.stdout.write(self.style.SUCCESS(f"Stored statistics of {stored} cohorts."))
@@ -0,0 +1,84 @@
+import re
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core.models import AcademicYear
+from core.services.partitioning import (
+    PartitioningError,
+    check_partitioned,
+    create_partition,
+    detach_partition,
+    list_partitions,
+)
+
+TABLE = "core_result"
+
+
+class Command(BaseCommand):
+    help = (
+        "Manage the academic-year partitions of the results table (PostgreSQL): "
+        "list them, create upcoming ones, or detach a closed year for archival."
+    )
+
+    def add_arguments(self, parser):
+        subcommands = parser.add_subparsers(dest="action", required=True)
+
+        subcommands.add_parser("list", help="List the partitions.")
+
+        create = subcommands.add_parser("create", help="Create partitions.")
+        create.add_argument("years", nargs="*", help="Academic years, e.g. 2025-2026")
+        create.add_argument(
+            "--upcoming",
+            type=int,
+            default=0,
+            help="Also create partitions for this many years after the latest one.",
+        )
+
+        detach = subcommands.add_parser(
+            "detach", help="Detach a year's partition into a standalone table."
+        )
+        detach.add_argument("year")
+        detach.add_argument(
+            "--schema", help="Move the detached table to this archive schema."
+        )
+
+    def handle(self, *args, action, **options):
+        try:
+            check_partitioned(TABLE, connection)
+            getattr(self, f"handle_{action}")(**options)
+        except (PartitioningError, ValueError) as e:
+            raise CommandError(e)
+
+    def handle_list(self, **options):
+        for name, bound in list_partitions(TABLE, connection):
+            self.stdout.write(f"{name}\t{bound}")
+
+    def handle_create(self, years, upcoming, **options):
+        start_years = [AcademicYear.parse(year) for year in years]
+        if upcoming:
+            bounds = [bound for _, bound in list_partitions(TABLE, connection)]
+            latest = max(partitioned_years(bounds), default=None)
+            if latest is None:
+                raise CommandError("No academic year partition to start from.")
+            start_years += range(latest + 1, latest + 1 + upcoming)
+        if not start_years:
+            raise CommandError("Give academic years or --upcoming N.")
+
+        for start_year in start_years:
+            year, _ = AcademicYear.objects.get_or_create(start_year=start_year)
+            if create_partition(TABLE, start_year, connection):
+                self.stdout.write(self.style.SUCCESS(f"Created partition for {year}"))
+            else:
+                self.stdout.write(f"Partition for {year} already exists")
+
+    def handle_detach(self, year, schema, **options):
+        name = detach_partition(TABLE, AcademicYear.parse(year), schema, connection)
+        self.stdout.write(self.style.SUCCESS(f"Detached {year} into {name}"))
+
+
+def partitioned_years(bounds):
+    """Start years held by partition bounds like "FOR VALUES IN (2024)"."""
+    for bound in bounds:
+        for value in re.findall(r"\d+", bound):
+            yield int(value)
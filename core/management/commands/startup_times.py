@@ -0,0 +1,87 @@
+import os
+import re
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# "import time: <self us> | <cumulative us> | <indented module name>"
+IMPORT_TIME = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+# Importing the URLconf loads every view, as a worker does when it boots
+STARTUP = "import django; django.setup(); import {module}"
+
+
+def measure_imports(module):
+    """
+    Import ``module`` after django.setup() in a fresh interpreter, under
+    ``python -X importtime``, and return (name, self_us, cumulative_us,
+    depth) for every module it loaded, in import order.
+    """
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", STARTUP.format(module=module)],
+        capture_output=True,
+        text=True,
+        env=os.environ.copy(),
+    )
+    if process.returncode:
+        raise CommandError(process.stderr.strip().splitlines()[-1])
+
+    timings = []
+    for line in process.stderr.splitlines():
+        match = IMPORT_TIME.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            timings.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return timings
+
+
+class Command(BaseCommand):
+    help = (
+        "Report the import time of the modules loaded on startup (django.setup() "
+        "and the URLconf), slowest first, measured in a fresh interpreter."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--module",
+            default=settings.ROOT_URLCONF,
+            help="Module to import after django.setup() (default: the URLconf).",
+        )
+        parser.add_argument(
+            "--limit", type=int, default=20, help="Number of modules to list."
+        )
+        parser.add_argument(
+            "--top-level",
+            action="store_true",
+            help="Only list modules imported directly, not their dependencies.",
+        )
+        parser.add_argument(
+            "--forbid",
+            action="append",
+            default=[],
+            metavar="MODULE",
+            help="Fail if this module gets imported on startup (repeatable).",
+        )
+
+    def handle(self, *args, module, limit, top_level, forbid, **options):
+        timings = measure_imports(module)
+        total_us = sum(self_us for _, self_us, _, _ in timings)
+        self.stdout.write(
+            f"{len(timings)} modules imported in {total_us / 1000:.1f} ms "
+            f"(django.setup() + import {module})"
+        )
+
+        listed = [t for t in timings if t[3] == 0] if top_level else timings
+        listed = sorted(listed, key=lambda t: t[2], reverse=True)[:limit]
+        self.stdout.write(f"{'cumulative ms':>14} {'self ms':>9}  module")
+        for name, self_us, cumulative_us, _ in listed:
+            self.stdout.write(
+                f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {name}"
+            )
+
+        loaded = {name for name, _, _, _ in timings}
+        found = [name for name in forbid if name in loaded]
+        if found:
+            raise CommandError(f"Imported on startup: {', '.join(found)}")
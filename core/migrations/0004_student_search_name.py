@@ -0,0 +1,67 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:16
+
+import unicodedata
+
+from django.db import migrations, models
+
+# ID prefix searches are served by the varchar_pattern_ops index Django
+# creates for the primary key.
+POSTGRES_INDEXES = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX core_student_search_name_trgm ON core_student "
+    "USING gin (search_name gin_trgm_ops)",
+]
+
+POSTGRES_DROP = [
+    "DROP INDEX IF EXISTS core_student_search_name_trgm",
+]
+
+
+def normalize_text(value):
+    # Frozen copy of core.models.normalize_text as of this migration.
+    decomposed = unicodedata.normalize("NFKD", value)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.lower().split())
+
+
+def fill_search_name(apps, schema_editor):
+    Student = apps.get_model("core", "Student")
+    batch = []
+    for student in Student.objects.only("first_name", "last_name").iterator():
+        student.search_name = normalize_text(
+            f"{student.last_name} {student.first_name}"
+        )
+        batch.append(student)
+        if len(batch) >= 1000:
+            Student.objects.bulk_update(batch, ["search_name"])
+            batch = []
+    Student.objects.bulk_update(batch, ["search_name"])
+
+
+def run_on_postgres(statements):
+    # Other backends get their search index from core.services.student_search.
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor == "postgresql":
+            for statement in statements:
+                schema_editor.execute(statement)
+
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0003_alter_result_session"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="student",
+            name="search_name",
+            field=models.CharField(blank=True, editable=False, max_length=201),
+        ),
+        migrations.RunPython(fill_search_name, migrations.RunPython.noop),
+        migrations.RunPython(
+            run_on_postgres(POSTGRES_INDEXES), run_on_postgres(POSTGRES_DROP)
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:21
+
+from django.db import migrations
+
+from core.migrations._partitioning import rebuild_table
+
+
+def partition_result(apps, schema_editor):
+    # Declarative partitioning is PostgreSQL only; other backends keep a plain table.
+    if schema_editor.connection.vendor == "postgresql":
+        rebuild_table(
+            schema_editor, "core_result", ["result_id", "academic_year"], "academic_year"
+        )
+
+
+def unpartition_result(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        rebuild_table(schema_editor, "core_result", ["result_id"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_change_tracking'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_result, unpartition_result),
+    ]
@@ -0,0 +1,152 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:24
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from core.migrations._partitioning import rebuild_table
+
+
+def legacy_start_year(label):
+    # Free-text years were never validated: key "2024-2025", "2024/25" or
+    # "2024" alike by their first four-digit year.
+    match = re.search(r"\d{4}", label)
+    if not match:
+        raise ValueError(f"Cannot map academic year '{label}' to a start year.")
+    return int(match.group())
+
+
+def check_constraints(schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        # Check the deferred foreign keys now: PostgreSQL refuses to alter a
+        # table with pending trigger events in the same transaction.
+        schema_editor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+
+
+def fill_academic_years(apps, schema_editor):
+    AcademicYear = apps.get_model("core", "AcademicYear")
+    year_models = [
+        apps.get_model("core", "Enrollment"),
+        apps.get_model("core", "Result"),
+    ]
+    labels = set()
+    for model in year_models:
+        labels.update(
+            model.objects.values_list("academic_year_label", flat=True).distinct()
+        )
+
+    start_years = {label: legacy_start_year(label) for label in labels}
+    AcademicYear.objects.bulk_create(
+        [AcademicYear(start_year=year) for year in set(start_years.values())],
+        ignore_conflicts=True,
+    )
+    for model in year_models:
+        for label, start_year in start_years.items():
+            model.objects.filter(academic_year_label=label).update(
+                academic_year_id=start_year
+            )
+    check_constraints(schema_editor)
+
+
+def fill_labels(apps, schema_editor):
+    AcademicYear = apps.get_model("core", "AcademicYear")
+    for model_name in ["Enrollment", "Result"]:
+        model = apps.get_model("core", model_name)
+        for start_year in AcademicYear.objects.values_list("start_year", flat=True):
+            model.objects.filter(academic_year_id=start_year).update(
+                academic_year_label=f"{start_year}-{start_year + 1}"
+            )
+    check_constraints(schema_editor)
+
+
+def partition_by_year_id(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        rebuild_table(
+            schema_editor,
+            "core_result",
+            ["result_id", "academic_year_id"],
+            "academic_year_id",
+        )
+
+
+def partition_by_label(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        rebuild_table(
+            schema_editor,
+            "core_result",
+            ["result_id", "academic_year_label"],
+            "academic_year_label",
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_partition_result'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AcademicYear',
+            fields=[
+                ('start_year', models.PositiveSmallIntegerField(primary_key=True, serialize=False)),
+            ],
+            options={
+                'ordering': ['start_year'],
+            },
+        ),
+        migrations.RenameField(
+            model_name='enrollment',
+            old_name='academic_year',
+            new_name='academic_year_label',
+        ),
+        migrations.RenameField(
+            model_name='result',
+            old_name='academic_year',
+            new_name='academic_year_label',
+        ),
+        migrations.AddField(
+            model_name='enrollment',
+            name='academic_year',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='enrollments', to='core.academicyear'),
+        ),
+        migrations.AddField(
+            model_name='result',
+            name='academic_year',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.PROTECT, related_name='results', to='core.academicyear'),
+        ),
+        migrations.RunPython(fill_academic_years, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='enrollment',
+            name='academic_year',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='enrollments', to='core.academicyear'),
+        ),
+        migrations.AlterField(
+            model_name='result',
+            name='academic_year',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='results', to='core.academicyear'),
+        ),
+        migrations.RunPython(partition_by_year_id, partition_by_label),
+        # Reversed, the label columns come back empty: let them be null
+        # until fill_labels has run.
+        migrations.AlterField(
+            model_name='enrollment',
+            name='academic_year_label',
+            field=models.CharField(max_length=20, null=True),
+        ),
+        migrations.AlterField(
+            model_name='result',
+            name='academic_year_label',
+            field=models.CharField(max_length=20, null=True),
+        ),
+        migrations.RunPython(migrations.RunPython.noop, fill_labels),
+        migrations.RemoveField(
+            model_name='enrollment',
+            name='academic_year_label',
+        ),
+        migrations.RemoveField(
+            model_name='result',
+            name='academic_year_label',
+        ),
+    ]
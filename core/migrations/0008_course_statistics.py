@@ -0,0 +1,37 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_academic_year'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourseStatistics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('session', models.CharField(choices=[('normal', 'Session Normale'), ('rattrapage', 'Session de Rattrapage')], max_length=50)),
+                ('count', models.PositiveIntegerField()),
+                ('mean', models.FloatField()),
+                ('median', models.FloatField()),
+                ('std_dev', models.FloatField()),
+                ('minimum', models.FloatField()),
+                ('maximum', models.FloatField()),
+                ('histogram', models.JSONField()),
+                ('notes', models.JSONField()),
+                ('counts', models.JSONField()),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('academic_year', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='course_statistics', to='core.academicyear')),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='statistics', to='core.course')),
+            ],
+            options={
+                'verbose_name_plural': 'course statistics',
+                'constraints': [models.UniqueConstraint(fields=('course', 'academic_year', 'session'), name='unique_course_statistics')],
+            },
+        ),
+    ]
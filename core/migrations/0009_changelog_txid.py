@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 13:51
+
+import core.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_course_statistics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='changelog',
+            name='txid',
+            field=models.BigIntegerField(db_default=core.models.TransactionId(), editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='changelog',
+            index=models.Index(fields=['txid', 'seq'], name='changelog_position'),
+        ),
+    ]
@@ -0,0 +1,125 @@
+"""
+Frozen copy of the table rebuild helper of core.services.partitioning, as
+migrations 0006 and 0007 use it. Do not change it along with the live code:
+migrations must run the same way whatever the current state of the project.
+The migration loader skips this module, as its name starts with "_".
+"""
+
+import re
+
+
+def partition_name(table, value):
+    return f"{table}_y{re.sub(r'[^0-9A-Za-z]+', '_', str(value)).strip('_').lower()}"
+
+
+def default_partition_name(table):
+    return f"{table}_default"
+
+
+def is_partitioned(table, connection):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass",
+            [table],
+        )
+        return cursor.fetchone() is not None
+
+
+def list_partitions(table, connection):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) "
+            "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = %s::regclass ORDER BY c.relname",
+            [table],
+        )
+        return cursor.fetchall()
+
+
+def rebuild_table(schema_editor, table, primary_key, partition_key=None):
+    """
+    Rebuild ``table`` with ``primary_key`` as its primary key and, when
+    ``partition_key`` is given, as a table LIST-partitioned on that column
+    with one partition per existing value plus a default partition (the
+    primary key must then contain ``partition_key``). Without it the table
+    is rebuilt unpartitioned. Rows, indexes, unique and foreign key
+    constraints are carried over. PostgreSQL only.
+    """
+    quote_name = schema_editor.quote_name
+    old = f"{table}_old"
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT indexdef FROM pg_indexes WHERE tablename = %s "
+            "AND indexname NOT IN (SELECT conname FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype IN ('p', 'u'))",
+            [table, table],
+        )
+        # Indexes of a partitioned table are defined ON ONLY the parent;
+        # recreate them on the whole new table.
+        indexes = [
+            indexdef.replace(" ON ONLY ", " ON ", 1)
+            for (indexdef,) in cursor.fetchall()
+        ]
+        cursor.execute(
+            "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+            "WHERE conrelid = %s::regclass AND contype IN ('f', 'u')",
+            [table],
+        )
+        constraints = cursor.fetchall()
+        values = []
+        if partition_key:
+            cursor.execute(
+                f"SELECT DISTINCT {quote_name(partition_key)} FROM {quote_name(table)} "
+                f"WHERE {quote_name(partition_key)} IS NOT NULL"
+            )
+            values = [value for (value,) in cursor.fetchall()]
+
+    # Free the table, primary key and partition names for the new table
+    if is_partitioned(table, schema_editor.connection):
+        for name, _ in list_partitions(table, schema_editor.connection):
+            schema_editor.execute(
+                f"ALTER TABLE {quote_name(name)} RENAME TO {quote_name(name + '_old')}"
+            )
+    schema_editor.execute(
+        f"ALTER TABLE {quote_name(table)} RENAME TO {quote_name(old)}"
+    )
+    schema_editor.execute(
+        f"ALTER TABLE {quote_name(old)} RENAME CONSTRAINT "
+        f"{quote_name(table + '_pkey')} TO {quote_name(old + '_pkey')}"
+    )
+
+    partitioning = (
+        f" PARTITION BY LIST ({quote_name(partition_key)})" if partition_key else ""
+    )
+    schema_editor.execute(
+        f"CREATE TABLE {quote_name(table)} (LIKE {quote_name(old)} "
+        f"INCLUDING DEFAULTS INCLUDING CONSTRAINTS){partitioning}"
+    )
+    schema_editor.execute(
+        f"ALTER TABLE {quote_name(table)} ADD CONSTRAINT "
+        f"{quote_name(table + '_pkey')} PRIMARY KEY "
+        f"({', '.join(quote_name(column) for column in primary_key)})"
+    )
+    if partition_key:
+        for value in values:
+            schema_editor.execute(
+                f"CREATE TABLE {quote_name(partition_name(table, value))} "
+                f"PARTITION OF {quote_name(table)} FOR VALUES IN (%s)",
+                [value],
+            )
+        schema_editor.execute(
+            f"CREATE TABLE {quote_name(default_partition_name(table))} "
+            f"PARTITION OF {quote_name(table)} DEFAULT"
+        )
+
+    schema_editor.execute(
+        f"INSERT INTO {quote_name(table)} SELECT * FROM {quote_name(old)}"
+    )
+    schema_editor.execute(f"DROP TABLE {quote_name(old)}")
+    for indexdef in indexes:
+        schema_editor.execute(indexdef)
+    for name, definition in constraints:
+        schema_editor.execute(
+            f"ALTER TABLE {quote_name(table)} ADD CONSTRAINT {quote_name(name)} "
+            f"{definition}"
+        )
@@ -1,6 +1,30 @@
+import re
+import unicodedata
+
 from django.db import models
 
 
+def normalize_text(value):
+    """Lowercase ``value``, strip its accents and collapse whitespace."""
+    decomposed = unicodedata.normalize("NFKD", value)
+    stripped = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(stripped.lower().split())
+
+
+class TrackedModel(models.Model):
+    """
+    Base for models whose changes downstream consumers sync incrementally:
+    adds creation/modification timestamps, and every save or delete is
+    appended to the ChangeLog (see core.signals).
+    """
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        abstract = True
+
+
 class Institution(models.Model):
     name = models.CharField(max_length=255)
     acronym = models.CharField(max_length=50, unique=True)
@@ -22,7 +46,38 @@ class Institute(models.Model):
         return f"{self.acronym} ({self.institution.acronym})"
 
 
-class Program(models.Model):
+class AcademicYear(models.Model):
+    """
+    An academic year such as 2024-2025, keyed by its first calendar year so
+    that year ordering and ranges are integer comparisons on the foreign key.
+    """
+
+    LABEL_RE = re.compile(r"^(\d{4})-(\d{4})$")
+
+    start_year = models.PositiveSmallIntegerField(primary_key=True)
+
+    class Meta:
+        ordering = ["start_year"]
+
+    def __str__(self):
+        return self.label
+
+    @property
+    def label(self):
+        return f"{self.start_year}-{self.start_year + 1}"
+
+    @classmethod
+    def parse(cls, label):
+        """Return the start year of a label like "2024-2025"; raise ValueError if malformed."""
+        match = cls.LABEL_RE.match(str(label).strip())
+        if not match or int(match.group(2)) != int(match.group(1)) + 1:
+            raise ValueError(
+                f"Invalid academic year '{label}' (expected e.g. 2024-2025)."
+            )
+        return int(match.group(1))
+
+
+class Program(TrackedModel):
     program_id = models.CharField(max_length=20, primary_key=True)
     institute = models.ForeignKey(
         Institute, on_delete=models.CASCADE, related_name="programs"
@@ -35,18 +90,28 @@ class Program(models.Model):
         return f"{self.name} ({self.level})"
 
 
-class Student(models.Model):
+class Student(TrackedModel):
     student_id = models.CharField(max_length=20, primary_key=True)
     first_name = models.CharField(max_length=100)
     last_name = models.CharField(max_length=100)
     gender = models.CharField(max_length=1, choices=[("M", "Male"), ("F", "Female")])
     birthdate = models.DateField()
+    # Accent-free, lowercase "last_name first_name", indexed for name search
+    search_name = models.CharField(max_length=201, blank=True, editable=False)
 
     def __str__(self):
         return f"{self.first_name} {self.last_name} ({self.student_id})"
 
+    def save(self, *args, **kwargs):
+        self.search_name = self.build_search_name(self.first_name, self.last_name)
+        super().save(*args, **kwargs)
 
-class Enrollment(models.Model):
+    @staticmethod
+    def build_search_name(first_name, last_name):
+        return normalize_text(f"{last_name} {first_name}")
+
+
+class Enrollment(TrackedModel):
     STATUS_CHOICES = [
         ("active", "Active"),
         ("abandoned", "Abandoned"),
@@ -61,14 +126,16 @@ class Enrollment(models.Model):
         Program, on_delete=models.CASCADE, related_name="enrollments"
     )
     institute = models.ForeignKey(Institute, on_delete=models.CASCADE)
-    academic_year = models.CharField(max_length=20)
+    academic_year = models.ForeignKey(
+        AcademicYear, on_delete=models.PROTECT, related_name="enrollments"
+    )
     status = models.CharField(max_length=50, choices=STATUS_CHOICES, default="active")
 
     def __str__(self):
         return f"{self.student} - {self.program} ({self.academic_year})"
 
 
-class Teacher(models.Model):
+class Teacher(TrackedModel):
     STATUS_CHOICES = [
         ("permanent", "Permanent"),
         ("vacataire", "Vacataire"),
@@ -98,7 +165,7 @@ class Teacher(models.Model):
         return f"{self.first_name} {self.last_name} ({self.grade})"
 
 
-class Course(models.Model):
+class Course(TrackedModel):
     course_id = models.CharField(max_length=20, primary_key=True)
     program = models.ForeignKey(
         Program, on_delete=models.CASCADE, related_name="courses"
@@ -115,7 +182,7 @@ class Course(models.Model):
         return f"{self.code} - {self.name}"
 
 
-class Degree(models.Model):
+class Degree(TrackedModel):
     DEGREE_TYPE_CHOICES = [
         ("licence_fondamentale", "Licence Fondamentale"),
         ("licence_pro", "Licence Professionnelle"),
@@ -138,7 +205,7 @@ class Degree(models.Model):
         return f"{self.name} ({self.degree_type})"
 
 
-class Result(models.Model):
+class Result(TrackedModel):
     SESSION_CHOICES = [
         ("normal", "Session Normale"),
         ("rattrapage", "Session de Rattrapage"),
@@ -149,9 +216,108 @@ class Result(models.Model):
         Enrollment, on_delete=models.CASCADE, related_name="results"
     )
     course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name="results")
-    academic_year = models.CharField(max_length=20)
+    academic_year = models.ForeignKey(
+        AcademicYear, on_delete=models.PROTECT, related_name="results"
+    )
     session = models.CharField(max_length=50, choices=SESSION_CHOICES, default="normal")
     note = models.DecimalField(max_digits=5, decimal_places=2)
 
     def __str__(self):
         return f"{self.enrollment.student} - {self.course.code} ({self.note})"
+
+
+class CourseStatistics(models.Model):
+    """
+    Note statistics of one course session in one academic year, computed in
+    batch by core.services.course_statistics. ``notes`` holds the distinct
+    notes in ascending order and ``counts`` how many results have each: the
+    rank and percentile of any note follow from them.
+    """
+
+    course = models.ForeignKey(
+        Course, on_delete=models.CASCADE, related_name="statistics"
+    )
+    academic_year = models.ForeignKey(
+        AcademicYear, on_delete=models.CASCADE, related_name="course_statistics"
+    )
+    session = models.CharField(max_length=50, choices=Result.SESSION_CHOICES)
+    count = models.PositiveIntegerField()
+    mean = models.FloatField()
+    median = models.FloatField()
+    std_dev = models.FloatField()
+    minimum = models.FloatField()
+    maximum = models.FloatField()
+    # Results per one-point bin of the 0-20 scale, 20 included in the last
+    histogram = models.JSONField()
+    notes = models.JSONField()
+    counts = models.JSONField()
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "course statistics"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["course", "academic_year", "session"],
+                name="unique_course_statistics",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.course_id} {self.academic_year_id} {self.session}"
+
+
+class TransactionId(models.Func):
+    """
+    Id of the current transaction on PostgreSQL, as a bigint (xid8 never
+    wraps around); 0 on other backends.
+    """
+
+    template = "0"
+    output_field = models.BigIntegerField()
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return "pg_current_xact_id()::text::bigint", []
+
+
+class ChangeLog(models.Model):
+    """
+    Append-only log of changes to tracked models, read in (txid, seq) order.
+
+    Sequence numbers are drawn when a row is inserted but become visible
+    when its transaction commits, so a long import can commit entries below
+    a ``seq`` a consumer has already read. On PostgreSQL each entry records
+    the id of the transaction that wrote it: once every transaction below
+    an id has finished (see change_feed), no entry can appear before it.
+    Elsewhere writes are serialized and ``txid`` is 0.
+    """
+
+    UPSERT = "upsert"
+    DELETE = "delete"
+    ACTION_CHOICES = [
+        (UPSERT, "Created or updated"),
+        (DELETE, "Deleted"),
+    ]
+
+    seq = models.BigAutoField(primary_key=True)
+    model = models.CharField(max_length=20)
+    object_id = models.CharField(max_length=20)
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    changed_at = models.DateTimeField(auto_now_add=True)
+    txid = models.BigIntegerField(db_default=TransactionId(), editable=False)
+
+    class Meta:
+        indexes = [models.Index(fields=["txid", "seq"], name="changelog_position")]
+
+    def __str__(self):
+        return f"#{self.seq} {self.action} {self.model} {self.object_id}"
+
+    @classmethod
+    def record(cls, model, object_ids, action=UPSERT):
+        """Append one entry per primary key in ``object_ids``."""
+        cls.objects.bulk_create(
+            [
+                cls(model=model._meta.model_name, object_id=str(pk), action=action)
+                for pk in object_ids
+            ],
+            batch_size=1000,
+        )
@@ -0,0 +1,165 @@
+import logging
+import re
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Repeated SQL shapes kept per request and shown per view in the report
+TOP_SHAPES = 5
+
+# Literals and placeholder lists that vary between executions of one query
+SHAPE_PATTERNS = [
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),
+    (re.compile(r"%s"), "?"),
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)"), "(...)"),
+    (re.compile(r"\s+"), " "),
+]
+
+
+def sql_shape(sql):
+    """Reduce ``sql`` to its shape: the same query with any parameters."""
+    for pattern, replacement in SHAPE_PATTERNS:
+        sql = pattern.sub(replacement, sql)
+    return sql.strip()
+
+
+class RequestProfile:
+    """Queries of one request, collected through a database execute wrapper."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.shapes = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+            self.shapes[sql_shape(sql)] += 1
+
+
+class ProfileStore:
+    """
+    Thread-safe, in-process store of the last ``size`` request profiles of
+    each view, keyed by URL name.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.lock = threading.Lock()
+        self.views = defaultdict(lambda: deque(maxlen=self.size))
+
+    def add(self, view, record):
+        with self.lock:
+            self.views[view].append(record)
+
+    def clear(self):
+        with self.lock:
+            self.views.clear()
+
+    def report(self):
+        """Per-view aggregates, slowest average first."""
+        with self.lock:
+            views = {view: list(records) for view, records in self.views.items()}
+
+        rows = []
+        for view, records in views.items():
+            shapes = Counter()
+            for record in records:
+                shapes.update(record["repeated"])
+            rows.append(
+                {
+                    "view": view,
+                    "requests": len(records),
+                    "avg_queries": mean(r["queries"] for r in records),
+                    "max_queries": max(r["queries"] for r in records),
+                    "avg_db_ms": mean(r["db_ms"] for r in records),
+                    "avg_total_ms": mean(r["total_ms"] for r in records),
+                    "p95_total_ms": percentile([r["total_ms"] for r in records], 95),
+                    "over_budget": sum(1 for r in records if r["over_budget"]),
+                    "repeated": shapes.most_common(TOP_SHAPES),
+                }
+            )
+        return sorted(rows, key=lambda row: row["avg_total_ms"], reverse=True)
+
+
+def mean(values):
+    values = list(values)
+    return sum(values) / len(values)
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+store = ProfileStore(getattr(settings, "PROFILING_BUFFER_SIZE", 200))
+
+
+def budget_for(view):
+    budgets = getattr(settings, "PROFILING_BUDGETS", {})
+    return {**budgets.get("default", {}), **budgets.get(view, {})}
+
+
+def exceeded(record, budget):
+    """Names of the ``budget`` limits (queries, db_ms, total_ms) ``record`` went over."""
+    return [name for name, limit in budget.items() if record.get(name, 0) > limit]
+
+
+class QueryProfilingMiddleware:
+    """
+    Record the query count, database time, total time and repeated SQL
+    shapes of every request, aggregated per URL name in ``store``. A request
+    going over its view's budget (PROFILING_BUDGETS) logs a warning. Opt-in:
+    enabled by the PROFILING setting.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        profile = RequestProfile()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(profile))
+            response = self.get_response(request)
+        total_ms = (time.perf_counter() - start) * 1000
+
+        match = request.resolver_match
+        view = (match.view_name if match else None) or "unresolved"
+        record = {
+            "path": request.path,
+            "queries": profile.queries,
+            "db_ms": profile.db_time * 1000,
+            "total_ms": total_ms,
+            "repeated": {
+                shape: count
+                for shape, count in profile.shapes.most_common(TOP_SHAPES)
+                if count > 1
+            },
+        }
+        over = exceeded(record, budget_for(view))
+        record["over_budget"] = bool(over)
+        if over:
+            logger.warning(
+                "%s (%s) over budget on %s: %d queries, %.0f ms in db, %.0f ms total",
+                view,
+                request.path,
+                ", ".join(over),
+                record["queries"],
+                record["db_ms"],
+                record["total_ms"],
+            )
+        store.add(view, record)
+        return response
@@ -0,0 +1,142 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+from core.caching import data_version
+
+# Alias of the optional read replica in settings.DATABASES
+REPLICA = "replica"
+
+# Cookie keeping a client's reads on the primary after one of its requests wrote
+PIN_COOKIE = "db_primary"
+
+
+def check_shared_cache(app_configs, **kwargs):
+    """
+    The replica needs a cache shared by every worker process: the data
+    version held in a per-process one would only keep the reads of the
+    worker that ran an import on the primary.
+    """
+    if replica_configured() and isinstance(caches["default"], LocMemCache):
+        return [
+            checks.Error(
+                "The read replica needs a cache shared between worker "
+                "processes, not the local memory cache.",
+                hint="Set CACHE_DIR, on storage every worker can reach.",
+                id="core.E001",
+            )
+        ]
+    return []
+
+
+class Routing:
+    """Where the reads of the current request, command or task go."""
+
+    def __init__(self, allowed):
+        # The replica may serve these reads: configured and caught up
+        self.allowed = allowed
+        # Reads are inside use_replica()
+        self.replica = False
+        # Something was written: later reads must see it
+        self.wrote = False
+
+
+routing = ContextVar("db_routing", default=None)
+
+
+def replica_configured():
+    return REPLICA in settings.DATABASES
+
+
+def replica_available():
+    """
+    Whether the replica is configured and the last import, purge or restore
+    (which bump the data version, a timestamp) is older than
+    REPLICA_PIN_SECONDS, i.e. has reached the replica.
+    """
+    if not replica_configured():
+        return False
+    version = data_version()
+    return time.time_ns() - version > settings.REPLICA_PIN_SECONDS * 10**9
+
+
+@contextmanager
+def use_replica(enabled=True):
+    """
+    Send the reads of the block, or of the decorated view, to the replica
+    when it is available. Writes always go to the primary, and once one is
+    made the following reads do too. ``enabled=False`` keeps the reads of a
+    nested block on the primary.
+    """
+    current = routing.get()
+    token = None
+    if current is None:
+        current = Routing(replica_available())
+        token = routing.set(current)
+    previous, current.replica = current.replica, enabled
+    try:
+        yield
+    finally:
+        current.replica = previous
+        if token is not None:
+            routing.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Reads inside use_replica() go to the replica; any other query, and
+    every migration, goes to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        current = routing.get()
+        if current and current.replica and current.allowed and not current.wrote:
+            return REPLICA
+        return None
+
+    def db_for_write(self, model, **hints):
+        current = routing.get()
+        if current:
+            current.wrote = True
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return False if db == REPLICA else None
+
+
+class ReplicaPinningMiddleware:
+    """
+    Decide once per request whether the replica may serve its reads: not
+    right after an import, nor for REPLICA_PIN_SECONDS after a request of
+    the same client wrote (e.g. an upload or an admin change), so that
+    users always see their own changes.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        current = Routing(PIN_COOKIE not in request.COOKIES and replica_available())
+        token = routing.set(current)
+        try:
+            response = self.get_response(request)
+        finally:
+            routing.reset(token)
+        if current.wrote and replica_configured():
+            response.set_cookie(
+                PIN_COOKIE,
+                "1",
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
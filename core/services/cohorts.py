@@ -0,0 +1,143 @@
+from core.caching import cached_for_institution
+from core.models import Enrollment
+from core.services.grade_sheet import fetch_rows
+
+# A cohort is the students whose first enrollment is in the same academic
+# year and the same program, or institute.
+GROUPS = ["program_id", "institute_id"]
+
+
+def load_enrollments(institution):
+    """Every enrollment of ``institution`` as a DataFrame, one row each."""
+    import pandas as pd
+
+    rows = fetch_rows(
+        Enrollment.objects.filter(institute__institution=institution).values_list(
+            "student_id", "program_id", "institute_id", "academic_year_id", "status"
+        )
+    )
+    enrollments = pd.DataFrame.from_records(
+        rows, columns=["student_id", "program_id", "institute_id", "year", "status"]
+    )
+    enrollments["status"] = enrollments["status"].astype("category")
+    return enrollments
+
+
+def student_outcomes(enrollments):
+    """
+    One row per student: the year, program and institute of their first
+    enrollment, and the year they graduated or dropped out, if they did.
+    A student drops out with an abandoned last enrollment, or the year after
+    their last enrollment if it is older than the latest year on record.
+    Students first seen in the earliest year on record may have entered
+    before it.
+    """
+    import numpy as np
+
+    ordered = enrollments.sort_values(["student_id", "year"], kind="stable")
+    grouped = ordered.groupby("student_id", sort=False)
+    outcomes = (
+        grouped[["year", "program_id", "institute_id"]]
+        .first()
+        .rename(columns={"year": "entry_year"})
+    )
+    last = grouped[["year", "status"]].last()
+
+    graduated = ordered["status"] == "graduated"
+    outcomes["graduated_year"] = (
+        ordered[graduated].groupby("student_id")["year"].min().reindex(outcomes.index)
+    )
+    dropped = np.where(
+        last["status"] == "abandoned",
+        last["year"],
+        np.where(last["year"] < enrollments["year"].max(), last["year"] + 1, np.nan),
+    )
+    outcomes["dropout_year"] = np.where(
+        outcomes["graduated_year"].isna(), dropped, np.nan
+    )
+    return outcomes
+
+
+def funnels(enrollments, outcomes, by):
+    """
+    Funnel of every cohort grouped ``by`` (one of GROUPS): for each year
+    since entry up to the latest year on record, the students enrolled that
+    year and those graduated or dropped out by then, as counts and as
+    shares of the cohort size.
+    """
+    import numpy as np
+
+    keys = [by, "entry_year"]
+    latest = enrollments["year"].max()
+
+    # One row per cohort and year since entry
+    grid = outcomes.groupby(keys).size().rename("size").reset_index()
+    grid = grid.loc[grid.index.repeat(latest - grid["entry_year"] + 1)]
+    grid["years"] = grid.groupby(keys).cumcount()
+    grid = grid.set_index([*keys, "years"])
+
+    present = (
+        enrollments[["student_id", "year"]]
+        .drop_duplicates()
+        .join(outcomes[keys], on="student_id")
+    )
+    years = (present["year"] - present["entry_year"]).rename("years")
+    grid["enrolled"] = (
+        present.groupby([by, "entry_year", years])
+        .size()
+        .reindex(grid.index, fill_value=0)
+    )
+    for column, year in [("graduated", "graduated_year"), ("dropped", "dropout_year")]:
+        done = outcomes[outcomes[year].notna()]
+        years = (done[year] - done["entry_year"]).astype(int).rename("years")
+        counts = done.groupby([by, "entry_year", years]).size()
+        # Cumulative over the years since entry of each cohort
+        grid[column] = (
+            counts.reindex(grid.index, fill_value=0).groupby(level=keys).cumsum()
+        )
+
+    for column, share in [
+        ("enrolled", "retention"),
+        ("graduated", "graduation_rate"),
+        ("dropped", "dropout_rate"),
+    ]:
+        grid[share] = np.round(grid[column] / grid["size"], 4)
+    return grid.reset_index()
+
+
+def cohort_analytics(institution):
+    """
+    Cohort funnels of ``institution`` by program and by institute, as lists
+    of records keyed by GROUPS, cached until the next import.
+    """
+
+    def compute():
+        enrollments = load_enrollments(institution)
+        if enrollments.empty:
+            return {by: [] for by in GROUPS}
+        outcomes = student_outcomes(enrollments)
+        return {
+            by: funnels(enrollments, outcomes, by).to_dict("records") for by in GROUPS
+        }
+
+    return cached_for_institution("cohorts", institution, compute)
+
+
+def cohort_table(records, by, key, share):
+    """
+    Percentages of ``share`` (e.g. "retention") for the cohorts of the
+    program or institute ``key``: one row per entry year with its cohort
+    size, one column per year since entry.
+    """
+    import pandas as pd
+
+    funnel = pd.DataFrame.from_records(records)
+    if not funnel.empty:
+        funnel = funnel[funnel[by].astype(str) == str(key)]
+    if funnel.empty:
+        return funnel
+    table = 100 * funnel.pivot(index="entry_year", columns="years", values=share)
+    table.columns = [f"Year {years + 1}" for years in table.columns]
+    table.insert(0, "Students", funnel.groupby("entry_year")["size"].first())
+    table.index = [f"{year}-{year + 1}" for year in table.index]
+    return table
@@ -0,0 +1,100 @@
+from itertools import groupby
+from operator import itemgetter
+
+from django.db.models import FloatField
+from django.db.models.functions import Cast
+
+from core.caching import bump_data_version
+from core.models import Course, CourseStatistics, Result
+from core.timeouts import import_transaction
+
+# Courses whose results are loaded and summarized at a time
+BATCH_SIZE = 500
+
+# Notes are out of 20: one histogram bin per point
+MAX_NOTE = 20
+
+
+def cohort_statistics(course_id, academic_year_id, session, notes):
+    """Unsaved CourseStatistics of one cohort's ``notes``, a sorted float array."""
+    import numpy as np
+
+    values, counts = np.unique(notes, return_counts=True)
+    histogram, _ = np.histogram(notes, bins=MAX_NOTE, range=(0, MAX_NOTE))
+    return CourseStatistics(
+        course_id=course_id,
+        academic_year_id=academic_year_id,
+        session=session,
+        count=len(notes),
+        mean=float(notes.mean()),
+        median=float(np.median(notes)),
+        std_dev=float(notes.std()),
+        minimum=float(notes[0]),
+        maximum=float(notes[-1]),
+        histogram=histogram.tolist(),
+        notes=values.tolist(),
+        counts=counts.tolist(),
+    )
+
+
+def compute_statistics(results):
+    """
+    Statistics of every (course, academic year, session) cohort among
+    ``results``. The notes come sorted by cohort and note from a single
+    query, so that each cohort is a slice of one NumPy array.
+    """
+    import numpy as np
+
+    keys = ("course_id", "academic_year_id", "session")
+    rows = list(
+        results.order_by(*keys, "note").values_list(*keys, Cast("note", FloatField()))
+    )
+    notes = np.fromiter((row[3] for row in rows), dtype=float, count=len(rows))
+
+    statistics, start = [], 0
+    for key, cohort in groupby(rows, key=itemgetter(0, 1, 2)):
+        end = start + sum(1 for _ in cohort)
+        statistics.append(cohort_statistics(*key, notes[start:end]))
+        start = end
+    return statistics
+
+
+def refresh_course_statistics(course_ids=None, batch_size=BATCH_SIZE):
+    """
+    Recompute the statistics of ``course_ids``, or of every course, replacing
+    the stored ones ``batch_size`` courses at a time. Returns the number of
+    cohorts stored.
+    """
+    if course_ids is None:
+        course_ids = Course.objects.order_by("pk").values_list("pk", flat=True)
+    course_ids = sorted(set(course_ids))
+
+    stored = 0
+    try:
+        for start in range(0, len(course_ids), batch_size):
+            batch = course_ids[start : start + batch_size]
+            with import_transaction():
+                CourseStatistics.objects.filter(course_id__in=batch).delete()
+                statistics = CourseStatistics.objects.bulk_create(
+                    compute_statistics(Result.objects.filter(course_id__in=batch))
+                )
+            stored += len(statistics)
+    finally:
+        # Statistics are served from the replica once it has caught up
+        bump_data_version()
+    return stored
+
+
+def ranks(statistics, notes):
+    """
+    Rank (1 for the best note, ties sharing the better rank) and percentile
+    (share of the cohort at or below the note) of each of ``notes`` in the
+    cohort of ``statistics``, as two arrays.
+    """
+    import numpy as np
+
+    values = np.asarray(statistics.notes, dtype=float)
+    at_or_below = np.concatenate([[0], np.cumsum(statistics.counts)])[
+        np.searchsorted(values, np.asarray(notes, dtype=float), side="right")
+    ]
+    return statistics.count - at_or_below + 1, 100 * at_or_below / statistics.count
@@ -0,0 +1,107 @@
+from django.conf import settings
+from django.db import transaction
+
+from core.caching import bump_data_version
+from core.models import ChangeLog, Course, Degree
+from core.services.grade_sheet import load_result_triples, load_students, pivot_results
+
+# Candidate list column checked by each rule, as named in the reasons
+RULE_COLUMNS = {
+    "min_credits": ("credits", "credits"),
+    "min_average": ("average", "average"),
+    "min_note": ("lowest_note", "lowest note"),
+}
+
+
+def eligibility_rules(**overrides):
+    """DEGREE_ELIGIBILITY_RULES with ``overrides`` applied."""
+    rules = dict(settings.DEGREE_ELIGIBILITY_RULES)
+    unknown = set(overrides) - set(rules)
+    if unknown:
+        raise ValueError(f"Unknown eligibility rules: {', '.join(sorted(unknown))}.")
+    rules.update(overrides)
+    return rules
+
+
+def degree_candidates(program, academic_year, **rules):
+    """
+    Check every enrollment of a program for an academic year against the
+    eligibility rules (DEGREE_ELIGIBILITY_RULES, overridden by ``rules``) in
+    one pass over the enrollment x course matrix of retained notes, where a
+    rattrapage note replaces the normal session's.
+
+    Returns the students as indexed by enrollment_id, with the credits they
+    earned, the credit-weighted average and lowest note of the courses they
+    took, whether they already have a degree, whether they are eligible and
+    otherwise the rules they fail.
+    """
+    import numpy as np
+    import pandas as pd
+
+    rules = eligibility_rules(**rules)
+    candidates = load_students(program, academic_year)
+    courses = list(
+        Course.objects.filter(program=program).values_list("course_id", "credits")
+    )
+    notes = pivot_results(
+        load_result_triples(program, academic_year),
+        candidates.index,
+        [course_id for course_id, _ in courses],
+    )
+    credits = np.array([credits for _, credits in courses], dtype=float)
+
+    taken = ~np.isnan(notes)
+    with np.errstate(invalid="ignore"):
+        candidates["credits"] = ((notes >= rules["pass_mark"]) @ credits).astype(int)
+        # No course taken: NaN average and lowest note, which fail their rules
+        candidates["average"] = np.nansum(notes * credits, axis=1) / (taken @ credits)
+    lowest = np.min(np.where(taken, notes, np.inf), axis=1, initial=np.inf)
+    candidates["lowest_note"] = np.where(np.isinf(lowest), np.nan, lowest)
+    candidates["has_degree"] = candidates.index.isin(
+        Degree.objects.filter(
+            enrollment__program=program, enrollment__academic_year=academic_year
+        ).values_list("enrollment_id", flat=True)
+    )
+
+    eligible = np.ones(len(candidates), dtype=bool)
+    reasons = pd.Series("", index=candidates.index)
+    for rule, (column, label) in RULE_COLUMNS.items():
+        if rules[rule] is None:
+            continue
+        failed = ~(candidates[column] >= rules[rule]).to_numpy()
+        eligible &= ~failed
+        reasons = reasons.str.cat(
+            np.where(failed, f"{label} below {rules[rule]}; ", "")
+        )
+    candidates["eligible"] = eligible
+    candidates["reasons"] = reasons.str.rstrip("; ")
+    return candidates
+
+
+def award_degrees(candidates, degree_type, name, date_awarded):
+    """
+    Create in bulk the Degree of every eligible candidate who has none yet,
+    keyed by the enrollment id. A candidate whose enrollment id is already
+    another degree's id is left out. Returns the created degrees.
+    """
+    if degree_type not in dict(Degree.DEGREE_TYPE_CHOICES):
+        raise ValueError(f"Invalid degree type '{degree_type}'.")
+
+    ids = candidates.index[candidates["eligible"] & ~candidates["has_degree"]]
+    taken = set(Degree.objects.filter(pk__in=list(ids)).values_list("pk", flat=True))
+    degrees = [
+        Degree(
+            degree_id=enrollment_id,
+            enrollment_id=enrollment_id,
+            date_awarded=date_awarded,
+            degree_type=degree_type,
+            name=name,
+        )
+        for enrollment_id in ids
+        if enrollment_id not in taken
+    ]
+    with transaction.atomic():
+        Degree.objects.bulk_create(degrees, batch_size=1000)
+        ChangeLog.record(Degree, [degree.pk for degree in degrees])
+    bump_data_version()
+    return degrees
@@ -0,0 +1,125 @@
+import io
+
+from django.db import connections
+from django.db.models import FloatField
+from django.db.models.functions import Cast
+
+from core.models import Course, Enrollment, Result
+
+# numpy and pandas are imported inside the functions using them, so that
+# loading the views does not pay for them on every process start.
+
+STUDENT_COLUMNS = ["student_id", "last_name", "first_name"]
+
+# Sessions from lowest to highest precedence: a later session's grade wins.
+SESSION_PRECEDENCE = ["normal", "rattrapage"]
+
+
+def fetch_rows(queryset):
+    """
+    Run a values_list() queryset on a raw cursor, skipping the per-row
+    conversion the ORM applies to each fetched tuple.
+    """
+    sql, params = queryset.query.sql_with_params()
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+def load_result_triples(program, academic_year):
+    """Return (enrollment_id, course_id, session, note) rows for a program/year."""
+    return fetch_rows(
+        Result.objects.filter(
+            enrollment__program=program, academic_year=academic_year
+        ).values_list(
+            "enrollment_id",
+            "course_id",
+            "session",
+            Cast("note", FloatField()),
+        )
+    )
+
+
+def pivot_results(triples, enrollment_ids, course_ids):
+    """
+    Scatter result triples into an enrollment x course matrix of notes, rows
+    and columns following ``enrollment_ids`` and ``course_ids``. Sessions are
+    applied in SESSION_PRECEDENCE order, so a rattrapage grade overrides the
+    normal session grade of the same course.
+    """
+    import numpy as np
+    import pandas as pd
+
+    matrix = np.full((len(enrollment_ids), len(course_ids)), np.nan)
+    if not triples:
+        return matrix
+
+    df = pd.DataFrame.from_records(
+        triples, columns=["enrollment_id", "course_id", "session", "note"]
+    )
+    rows = pd.Index(enrollment_ids).get_indexer(df["enrollment_id"])
+    cols = pd.Index(course_ids).get_indexer(df["course_id"])
+    sessions = df["session"].to_numpy()
+    notes = df["note"].to_numpy(dtype=float)
+    known = (rows >= 0) & (cols >= 0)
+    for session in SESSION_PRECEDENCE:
+        mask = known & (sessions == session)
+        matrix[rows[mask], cols[mask]] = notes[mask]
+    return matrix
+
+
+def load_students(program, academic_year):
+    """
+    The students enrolled in a program for an academic year, by name, as a
+    DataFrame of STUDENT_COLUMNS indexed by enrollment_id.
+    """
+    import pandas as pd
+
+    return pd.DataFrame.from_records(
+        Enrollment.objects.filter(program=program, academic_year=academic_year)
+        .order_by("student__last_name", "student__first_name")
+        .values_list(
+            "enrollment_id",
+            "student_id",
+            "student__last_name",
+            "student__first_name",
+        ),
+        columns=["enrollment_id", *STUDENT_COLUMNS],
+        index="enrollment_id",
+    )
+
+
+def build_grade_sheet(program, academic_year):
+    """
+    Build the grade sheet of a program for an academic year: one row per
+    enrollment, the student's identity first, then one column per course
+    (labelled by course code) holding the retained note.
+    """
+    import pandas as pd
+
+    students = load_students(program, academic_year)
+    courses = list(
+        Course.objects.filter(program=program)
+        .order_by("semester", "code")
+        .values_list("course_id", "code")
+    )
+
+    notes = pivot_results(
+        load_result_triples(program, academic_year),
+        students.index,
+        [course_id for course_id, _ in courses],
+    )
+    notes = pd.DataFrame(
+        notes, index=students.index, columns=[code for _, code in courses]
+    )
+    return pd.concat([students, notes], axis=1)
+
+
+def export_grade_sheet(sheet, file_format):
+    """Serialize a grade sheet to CSV or Excel bytes."""
+    buffer = io.BytesIO()
+    if file_format == "xlsx":
+        sheet.to_excel(buffer, index=False, sheet_name="Grades")
+    else:
+        sheet.to_csv(buffer, index=False)
+    return buffer.getvalue()
@@ -0,0 +1,166 @@
+import re
+
+from django.db import connection as default_connection
+from django.db import connections, transaction
+
+# Partitioned tables and the column they are partitioned on
+PARTITIONED_TABLES = {"core_result": "academic_year_id"}
+
+
+class PartitioningError(Exception):
+    pass
+
+
+def quote(name, connection=default_connection):
+    return connection.ops.quote_name(name)
+
+
+def partition_name(table, value):
+    """Name of the partition of ``table`` holding ``value``, e.g. core_result_y2024."""
+    return f"{table}_y{re.sub(r'[^0-9A-Za-z]+', '_', str(value)).strip('_').lower()}"
+
+
+def default_partition_name(table):
+    return f"{table}_default"
+
+
+def is_partitioned(table, connection=default_connection):
+    """
+    Whether ``table`` is partitioned, looked up in the catalog once per
+    database connection: conflict_target() asks on every upsert.
+    """
+    if connection.vendor != "postgresql":
+        return False
+    tables = getattr(connection, "partitioned_tables", None)
+    if tables is None:
+        tables = connection.partitioned_tables = {}
+    if table not in tables:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass",
+                [table],
+            )
+            tables[table] = cursor.fetchone() is not None
+    return tables[table]
+
+
+def reset_partitioned_tables(sender, connection=None, using=None, **kwargs):
+    """
+    connection_created and post_migrate receiver: tables are looked up again
+    on a new connection, and after migrations, which may partition them.
+    """
+    (connection or connections[using]).partitioned_tables = {}
+
+
+def conflict_target(model, connection=default_connection):
+    """
+    Fields identifying a row of ``model`` for ON CONFLICT upserts: the primary
+    key, plus the partition key when the table is partitioned, since unique
+    constraints of a partitioned table must contain it.
+    """
+    fields = [model._meta.pk.name]
+    partition_key = PARTITIONED_TABLES.get(model._meta.db_table)
+    if partition_key and is_partitioned(model._meta.db_table, connection):
+        fields.append(partition_key)
+    return fields
+
+
+def moved_rows_delete(model, source, connection=default_connection):
+    """
+    DELETE statement removing the stored rows of ``model`` that rows of
+    ``source`` (a table of incoming rows) move to another partition, or
+    None when the table is not partitioned. The primary key of a
+    partitioned table includes the partition key, so an upsert on
+    conflict_target() would keep the old row next to the new one, and the
+    model's primary key would no longer be unique.
+    """
+    table = model._meta.db_table
+    partition_key = PARTITIONED_TABLES.get(table)
+    if not partition_key or not is_partitioned(table, connection):
+        return None
+    pk = quote(model._meta.pk.column, connection)
+    key = quote(partition_key, connection)
+    return (
+        f"DELETE FROM {quote(table, connection)} AS stored USING {source} AS incoming "
+        f"WHERE stored.{pk} = incoming.{pk} "
+        f"AND stored.{key} IS DISTINCT FROM incoming.{key}"
+    )
+
+
+def list_partitions(table, connection=default_connection):
+    """Return (partition table, bound expression) pairs attached to ``table``."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) "
+            "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = %s::regclass ORDER BY c.relname",
+            [table],
+        )
+        return cursor.fetchall()
+
+
+def check_partitioned(table, connection=default_connection):
+    if not is_partitioned(table, connection):
+        raise PartitioningError(
+            f"{table} is not partitioned (partitioning requires PostgreSQL)."
+        )
+
+
+def create_partition(table, value, connection=default_connection):
+    """
+    Create the partition of ``table`` holding ``value``. Rows of that value
+    already sitting in the default partition are moved into it, since
+    PostgreSQL refuses to attach a partition whose rows the default holds.
+    Returns False if the partition already exists.
+    """
+    check_partitioned(table, connection)
+    name = partition_name(table, value)
+    if name in dict(list_partitions(table, connection)):
+        return False
+
+    key = quote(PARTITIONED_TABLES[table], connection)
+    default = quote(default_partition_name(table), connection)
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TABLE {quote(name, connection)} "
+            f"(LIKE {quote(table, connection)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"
+        )
+        cursor.execute(
+            f"WITH moved AS (DELETE FROM {default} WHERE {key} = %s RETURNING *) "
+            f"INSERT INTO {quote(name, connection)} SELECT * FROM moved",
+            [value],
+        )
+        cursor.execute(
+            f"ALTER TABLE {quote(table, connection)} "
+            f"ATTACH PARTITION {quote(name, connection)} FOR VALUES IN (%s)",
+            [value],
+        )
+    return True
+
+
+def detach_partition(table, value, archive_schema=None, connection=default_connection):
+    """
+    Detach the partition of ``table`` holding ``value``: its rows disappear
+    from ``table`` but stay in a standalone table, optionally moved to
+    ``archive_schema``. Returns the archived table name.
+    """
+    check_partitioned(table, connection)
+    name = partition_name(table, value)
+    if name not in dict(list_partitions(table, connection)):
+        raise PartitioningError(f"No partition of {table} for '{value}'.")
+
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        cursor.execute(
+            f"ALTER TABLE {quote(table, connection)} "
+            f"DETACH PARTITION {quote(name, connection)}"
+        )
+        if archive_schema:
+            cursor.execute(
+                f"CREATE SCHEMA IF NOT EXISTS {quote(archive_schema, connection)}"
+            )
+            cursor.execute(
+                f"ALTER TABLE {quote(name, connection)} "
+                f"SET SCHEMA {quote(archive_schema, connection)}"
+            )
+            return f"{archive_schema}.{name}"
+    return name
@@ -0,0 +1,143 @@
+from django.db import models, router, transaction
+from django.db.models import Q
+
+from core.caching import bump_data_version
+from core.services.course_statistics import refresh_course_statistics
+from core.models import (
+    AcademicYear,
+    ChangeLog,
+    Course,
+    CourseStatistics,
+    Degree,
+    Enrollment,
+    Institute,
+    Institution,
+    Program,
+    Result,
+    Teacher,
+    TrackedModel,
+)
+
+# Rows deleted per statement, each batch in its own transaction
+BATCH_SIZE = 5000
+
+
+def institution_plan(institution):
+    """
+    (model, queryset) steps deleting ``institution`` and everything that
+    cascades from it, children first. Each queryset follows every CASCADE
+    path into its model, e.g. results of the institution's courses taken
+    through another institution's enrollment.
+    """
+    institutes = Q(institute__institution=institution)
+    programs = Q(program__institute__institution=institution)
+    enrollments = Q(enrollment__institute__institution=institution) | Q(
+        enrollment__program__institute__institution=institution
+    )
+    return [
+        (
+            Result,
+            Result.objects.filter(
+                enrollments | Q(course__program__institute__institution=institution)
+            ),
+        ),
+        (Degree, Degree.objects.filter(enrollments)),
+        (Enrollment, Enrollment.objects.filter(institutes | programs)),
+        (
+            CourseStatistics,
+            CourseStatistics.objects.filter(
+                course__program__institute__institution=institution
+            ),
+        ),
+        (Course, Course.objects.filter(programs)),
+        (Teacher, Teacher.objects.filter(institutes)),
+        (Program, Program.objects.filter(institutes)),
+        (Institute, Institute.objects.filter(institution=institution)),
+        (Institution, Institution.objects.filter(pk=institution.pk)),
+    ]
+
+
+def academic_year_plan(year):
+    """
+    Steps deleting an academic year with its enrollments and results. The
+    results of an enrollment of that year go with it whatever their own year.
+    """
+    return [
+        (
+            Result,
+            Result.objects.filter(
+                Q(academic_year=year) | Q(enrollment__academic_year=year)
+            ),
+        ),
+        (Degree, Degree.objects.filter(enrollment__academic_year=year)),
+        (Enrollment, Enrollment.objects.filter(academic_year=year)),
+        (CourseStatistics, CourseStatistics.objects.filter(academic_year=year)),
+        (AcademicYear, AcademicYear.objects.filter(pk=year.pk)),
+    ]
+
+
+def count_plan(plan):
+    """Rows each step of ``plan`` would delete, as (model, count) pairs."""
+    return [(model, queryset.count()) for model, queryset in plan]
+
+
+def set_null_references(model, pks):
+    """
+    Clear the SET_NULL foreign keys pointing at the ``model`` rows about to
+    be deleted, as the deletion collector would.
+    """
+    for relation in model._meta.related_objects:
+        if relation.on_delete is models.SET_NULL:
+            relation.related_model._base_manager.filter(
+                **{f"{relation.field.name}__in": pks}
+            ).update(**{relation.field.name: None})
+
+
+def purge(plan, batch_size=BATCH_SIZE, progress=None):
+    """
+    Run ``plan`` bottom-up in batches of set-based DELETEs: no row is loaded
+    as a model instance and no transaction spans more than one batch, so
+    memory stays flat whatever the scope. Children go before their parents,
+    so an interrupted purge leaves consistent data and can simply be run
+    again. Deletions of tracked models are logged in the ChangeLog.
+
+    ``progress(model, deleted, total)`` is called after each batch. Returns
+    the (model, deleted) pairs.
+    """
+    deleted = []
+    # Courses whose results are deleted: their statistics are recomputed
+    # at the end, whichever institution or year they belong to
+    course_ids = set()
+    try:
+        for model, queryset in plan:
+            total = queryset.count()
+            done = 0
+            while True:
+                using = router.db_for_write(model)
+                with transaction.atomic(using=using):
+                    rows = queryset.using(using).order_by()
+                    if model is Result:
+                        batch = list(rows.values_list("pk", "course_id")[:batch_size])
+                        pks = [pk for pk, _ in batch]
+                        course_ids.update(course_id for _, course_id in batch)
+                    else:
+                        pks = list(rows.values_list("pk", flat=True)[:batch_size])
+                    if not pks:
+                        break
+                    set_null_references(model, pks)
+                    # _raw_delete() issues a single DELETE without collecting
+                    # related objects: every cascade is an earlier step
+                    model._base_manager.using(using).filter(pk__in=pks)._raw_delete(
+                        using
+                    )
+                    if issubclass(model, TrackedModel):
+                        ChangeLog.record(model, pks, ChangeLog.DELETE)
+                done += len(pks)
+                if progress:
+                    progress(model, done, total)
+            deleted.append((model, done))
+    finally:
+        if course_ids:
+            refresh_course_statistics(course_ids)
+        bump_data_version()
+    return deleted
@@ -0,0 +1,140 @@
+from django.db import connections
+from django.db.models import Exists, OuterRef, Q
+from django.db.models.expressions import RawSQL
+
+from core.models import Enrollment, Student, normalize_text
+
+# SQLite has no trigram index: an FTS5 table serves accent-insensitive
+# prefix matching instead. Its external content is core_student_search, a
+# copy of the students' search names under an INTEGER PRIMARY KEY, as the
+# implicit rowid of core_student may change on VACUUM and desynchronize the
+# index. Triggers keep both in sync. They are (re)installed after every
+# migrate, since SQLite table rebuilds drop the triggers of core_student.
+SQLITE_SEARCH_TABLES = [
+    "CREATE TABLE core_student_search (id INTEGER PRIMARY KEY, "
+    "student_id varchar(20) NOT NULL UNIQUE, search_name varchar(201) NOT NULL)",
+    "INSERT INTO core_student_search(student_id, search_name) "
+    "SELECT student_id, search_name FROM core_student",
+    "CREATE VIRTUAL TABLE core_student_fts USING fts5("
+    "student_id UNINDEXED, search_name, content='core_student_search', "
+    "content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    "INSERT INTO core_student_fts(core_student_fts) VALUES ('rebuild')",
+]
+SQLITE_SEARCH_TRIGGERS = [
+    "CREATE TRIGGER core_student_search_insert AFTER INSERT ON core_student "
+    "BEGIN INSERT INTO core_student_search(student_id, search_name) "
+    "VALUES (new.student_id, new.search_name); END",
+    "CREATE TRIGGER core_student_search_delete AFTER DELETE ON core_student "
+    "BEGIN DELETE FROM core_student_search WHERE student_id = old.student_id; END",
+    "CREATE TRIGGER core_student_search_update AFTER UPDATE ON core_student "
+    "BEGIN UPDATE core_student_search "
+    "SET student_id = new.student_id, search_name = new.search_name "
+    "WHERE student_id = old.student_id; END",
+    "CREATE TRIGGER core_student_fts_insert AFTER INSERT ON core_student_search "
+    "BEGIN INSERT INTO core_student_fts(rowid, student_id, search_name) "
+    "VALUES (new.id, new.student_id, new.search_name); END",
+    "CREATE TRIGGER core_student_fts_delete AFTER DELETE ON core_student_search "
+    "BEGIN INSERT INTO core_student_fts(core_student_fts, rowid, student_id, search_name) "
+    "VALUES ('delete', old.id, old.student_id, old.search_name); END",
+    "CREATE TRIGGER core_student_fts_update AFTER UPDATE ON core_student_search "
+    "BEGIN INSERT INTO core_student_fts(core_student_fts, rowid, student_id, search_name) "
+    "VALUES ('delete', old.id, old.student_id, old.search_name); "
+    "INSERT INTO core_student_fts(rowid, student_id, search_name) "
+    "VALUES (new.id, new.student_id, new.search_name); END",
+]
+SQLITE_SEARCH_DROP = [
+    "DROP TRIGGER IF EXISTS core_student_search_insert",
+    "DROP TRIGGER IF EXISTS core_student_search_delete",
+    "DROP TRIGGER IF EXISTS core_student_search_update",
+    # Triggers of core_student in earlier versions of the index
+    "DROP TRIGGER IF EXISTS core_student_fts_insert",
+    "DROP TRIGGER IF EXISTS core_student_fts_delete",
+    "DROP TRIGGER IF EXISTS core_student_fts_update",
+    "DROP TABLE IF EXISTS core_student_fts",
+    "DROP TABLE IF EXISTS core_student_search",
+]
+
+AUTOCOMPLETE_LIMIT = 20
+
+
+SQLITE_SEARCH_OBJECTS = {
+    "core_student_search",
+    "core_student_fts",
+    "core_student_search_insert",
+    "core_student_search_delete",
+    "core_student_search_update",
+    "core_student_fts_insert",
+    "core_student_fts_delete",
+    "core_student_fts_update",
+}
+
+
+def ensure_sqlite_index(using="default", **kwargs):
+    """
+    Rebuild the SQLite FTS5 index, its content table and their triggers if
+    any of them is missing. Connected to post_migrate.
+    """
+    connection = connections[using]
+    if connection.vendor != "sqlite":
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master")
+        if SQLITE_SEARCH_OBJECTS <= {name for (name,) in cursor.fetchall()}:
+            return
+        for statement in (
+            SQLITE_SEARCH_DROP + SQLITE_SEARCH_TABLES + SQLITE_SEARCH_TRIGGERS
+        ):
+            cursor.execute(statement)
+
+
+def search_filter(query, using="default"):
+    """
+    Build a Q object matching students whose ID starts with ``query`` or whose
+    names contain every word of ``query``, ignoring case and accents.
+    """
+    terms = normalize_text(query).split()
+    if not terms:
+        return Q(pk__in=[])
+
+    by_id = Q(student_id__startswith=query.strip())
+    if connections[using].vendor == "sqlite":
+        # Every term as a quoted FTS5 prefix query: "kof"* "ama"*
+        match = " ".join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+        by_name = Q(
+            pk__in=RawSQL(
+                "SELECT student_id FROM core_student_fts "
+                "WHERE core_student_fts MATCH %s",
+                [match],
+            )
+        )
+    else:
+        # Served by the search_name trigram index on PostgreSQL.
+        by_name = Q()
+        for term in terms:
+            by_name &= Q(search_name__contains=term)
+    return by_id | by_name
+
+
+def search_students(query, queryset=None):
+    """Filter ``queryset`` (all students by default) down to those matching ``query``."""
+    if queryset is None:
+        queryset = Student.objects.all()
+    return queryset.filter(search_filter(query, queryset.db))
+
+
+def autocomplete(query, institution, limit=AUTOCOMPLETE_LIMIT):
+    """Return up to ``limit`` matching students enrolled in ``institution``."""
+    students = Student.objects.filter(
+        Exists(
+            Enrollment.objects.filter(
+                student=OuterRef("pk"), institute__institution=institution
+            )
+        )
+    )
+    return [
+        {"student_id": student_id, "name": f"{first_name} {last_name}"}
+        for student_id, first_name, last_name in search_students(query, students)
+        .order_by("search_name")
+        .values_list("student_id", "first_name", "last_name")[:limit]
+    ]
@@ -0,0 +1,317 @@
+import datetime
+import io
+import multiprocessing
+import os
+import zipfile
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from importlib.util import find_spec
+from itertools import repeat
+
+import django
+from django.conf import settings
+from django.template.loader import render_to_string
+from django.utils.text import slugify
+
+from core.models import Course, CourseStatistics, Degree, Enrollment
+from core.services.course_statistics import ranks
+from core.services.grade_sheet import SESSION_PRECEDENCE, load_result_triples
+
+# Documents handed to a worker process at a time
+CHUNK_SIZE = 50
+
+FORMATS = ["html", "xlsx", "pdf"]
+
+
+def transcript_formats():
+    """Available formats: PDF needs WeasyPrint, which is not a requirement."""
+    return [
+        file_format
+        for file_format in FORMATS
+        if file_format != "pdf" or find_spec("weasyprint")
+    ]
+
+
+def retained_results(triples):
+    """
+    Map (enrollment_id, course_id) -> (note, session) from result triples,
+    a rattrapage note replacing the normal session's.
+    """
+    precedence = {session: i for i, session in enumerate(SESSION_PRECEDENCE)}
+    retained = {}
+    for enrollment_id, course_id, session, note in sorted(
+        triples, key=lambda triple: precedence.get(triple[2], 0)
+    ):
+        retained[enrollment_id, course_id] = (note, session)
+    return retained
+
+
+def cohort_ranks(program, academic_year, retained):
+    """
+    Map (enrollment_id, course_id) -> (rank, cohort size) of each retained
+    note within its course session, from the stored course statistics.
+    """
+    notes = defaultdict(list)
+    for (enrollment_id, course_id), (note, session) in retained.items():
+        notes[course_id, session].append((enrollment_id, note))
+
+    cohort = {}
+    for statistics in CourseStatistics.objects.filter(
+        course__program=program, academic_year=academic_year
+    ):
+        entries = notes.get((statistics.course_id, statistics.session), [])
+        if not entries:
+            continue
+        rank, _ = ranks(statistics, [note for _, note in entries])
+        for (enrollment_id, _), position in zip(entries, rank.tolist()):
+            cohort[enrollment_id, statistics.course_id] = (position, statistics.count)
+    return cohort
+
+
+def cohort_transcripts(program, academic_year):
+    """
+    The transcript data of every student enrolled in ``program`` for
+    ``academic_year``, as plain picklable dicts, fetched in a fixed number
+    of set-based queries whatever the cohort size.
+    """
+    pass_mark = settings.DEGREE_ELIGIBILITY_RULES["pass_mark"]
+    institute = program.institute
+    enrollments = (
+        Enrollment.objects.filter(program=program, academic_year=academic_year)
+        .order_by("student__last_name", "student__first_name")
+        .values(
+            "enrollment_id",
+            "status",
+            "student_id",
+            "student__first_name",
+            "student__last_name",
+            "student__birthdate",
+        )
+    )
+    courses = list(
+        Course.objects.filter(program=program)
+        .order_by("semester", "code")
+        .values("course_id", "code", "name", "semester", "credits")
+    )
+    retained = retained_results(load_result_triples(program, academic_year))
+    positions = cohort_ranks(program, academic_year, retained)
+    degree_types = dict(Degree.DEGREE_TYPE_CHOICES)
+    degrees = {
+        degree["enrollment_id"]: {
+            "degree_id": degree["degree_id"],
+            "name": degree["name"],
+            "degree_type": degree_types.get(degree["degree_type"]),
+            "date_awarded": degree["date_awarded"],
+        }
+        for degree in Degree.objects.filter(
+            enrollment__program=program, enrollment__academic_year=academic_year
+        ).values("enrollment_id", "degree_id", "name", "degree_type", "date_awarded")
+    }
+
+    documents = []
+    for enrollment in enrollments:
+        enrollment_id = enrollment["enrollment_id"]
+        lines, attempted, earned, weighted = [], 0, 0, 0.0
+        for course in courses:
+            note, session = retained.get(
+                (enrollment_id, course["course_id"]), (None, None)
+            )
+            rank, cohort_size = positions.get(
+                (enrollment_id, course["course_id"]), (None, None)
+            )
+            if note is not None:
+                attempted += course["credits"]
+                weighted += note * course["credits"]
+                if note >= pass_mark:
+                    earned += course["credits"]
+            lines.append(
+                {
+                    **course,
+                    "note": note,
+                    "session": session,
+                    "earned": note is not None and note >= pass_mark,
+                    "rank": rank,
+                    "cohort_size": cohort_size,
+                }
+            )
+        documents.append(
+            {
+                "institution": institute.institution.name,
+                "institute": institute.name,
+                "program": {
+                    "program_id": program.program_id,
+                    "name": program.name,
+                    "domain": program.domain,
+                    "level": program.level,
+                },
+                "academic_year": academic_year.label,
+                "enrollment_id": enrollment_id,
+                "status": enrollment["status"],
+                "student": {
+                    "student_id": enrollment["student_id"],
+                    "first_name": enrollment["student__first_name"],
+                    "last_name": enrollment["student__last_name"],
+                    "birthdate": enrollment["student__birthdate"],
+                },
+                "courses": lines,
+                "credits_attempted": attempted,
+                "credits_earned": earned,
+                "average": weighted / attempted if attempted else None,
+                "degree": degrees.get(enrollment_id),
+                "generated_on": datetime.date.today(),
+            }
+        )
+    return documents
+
+
+def transcript_filename(document, file_format):
+    # The enrollment keeps names unique: a student may be enrolled twice in
+    # the same program and year
+    student = document["student"]
+    name = slugify(
+        f"{student['student_id']} {student['last_name']} {student['first_name']} "
+        f"{document['enrollment_id']}"
+    )
+    return f"{name}.{file_format}"
+
+
+def render_excel(document):
+    """An .xlsx transcript, written row by row by a write-only workbook."""
+    from openpyxl import Workbook
+
+    student = document["student"]
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Transcript")
+    sheet.append([document["institution"], document["institute"]])
+    sheet.append([document["program"]["name"], document["program"]["level"]])
+    sheet.append(["Academic year", document["academic_year"]])
+    sheet.append(
+        [
+            "Student",
+            student["student_id"],
+            student["last_name"],
+            student["first_name"],
+            student["birthdate"],
+        ]
+    )
+    sheet.append([])
+    sheet.append(["Semester", "Code", "Course", "Credits", "Note", "Session", "Rank"])
+    for line in document["courses"]:
+        sheet.append(
+            [
+                line["semester"],
+                line["code"],
+                line["name"],
+                line["credits"],
+                line["note"],
+                line["session"],
+                line["rank"] and f"{line['rank']}/{line['cohort_size']}",
+            ]
+        )
+    sheet.append([])
+    sheet.append(
+        ["Credits earned", document["credits_earned"], document["credits_attempted"]]
+    )
+    sheet.append(["Average", document["average"]])
+    if document["degree"]:
+        degree = document["degree"]
+        sheet.append(
+            ["Degree", degree["name"], degree["degree_type"], degree["date_awarded"]]
+        )
+
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
+
+
+def render_transcript(document, file_format):
+    """Render one transcript; returns its (filename, content) in the archive."""
+    if file_format == "xlsx":
+        content = render_excel(document)
+    else:
+        content = render_to_string("core/transcript.html", document)
+        if file_format == "pdf":
+            from weasyprint import HTML
+
+            content = HTML(string=content).write_pdf()
+        else:
+            content = content.encode()
+    return transcript_filename(document, file_format), content
+
+
+class ZipStream:
+    """Unseekable file object buffering what a ZipFile writes until drained."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def transcript_workers():
+    return settings.TRANSCRIPT_WORKERS or os.cpu_count() or 1
+
+
+def render_batch(documents, file_format):
+    return [render_transcript(document, file_format) for document in documents]
+
+
+def render_in_pool(documents, file_format, workers):
+    """
+    Render ``documents`` in a pool of ``workers`` processes, yielding the
+    (filename, content) pairs in order. Batches are submitted as earlier ones
+    are consumed, at most two per worker in flight, so that rendered files do
+    not pile up in memory ahead of a slow consumer. The processes are started
+    fresh ("spawn"), as forked children would share the parent's database
+    connections.
+    """
+    size = max(1, min(CHUNK_SIZE, len(documents) // workers))
+    pending = deque()
+    pool = ProcessPoolExecutor(
+        workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=django.setup,
+    )
+    try:
+        for start in range(0, len(documents), size):
+            pending.append(
+                pool.submit(render_batch, documents[start : start + size], file_format)
+            )
+            if len(pending) == 2 * workers:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
+def stream_transcripts(documents, file_format, workers=1):
+    """
+    Render ``documents`` and yield a ZIP archive of the transcripts chunk by
+    chunk, as each one is added. By default documents are rendered in the
+    calling process, as web downloads do; offline exports may pass more
+    ``workers`` to render them in a pool of processes.
+    """
+    workers = min(workers, len(documents))
+    # Already-compressed .xlsx and PDF files are stored as they are
+    compression = zipfile.ZIP_DEFLATED if file_format == "html" else zipfile.ZIP_STORED
+    stream = ZipStream()
+    with zipfile.ZipFile(stream, "w", compression) as archive:
+        if workers > 1:
+            rendered = render_in_pool(documents, file_format, workers)
+        else:
+            rendered = map(render_transcript, documents, repeat(file_format))
+        for filename, content in rendered:
+            archive.writestr(filename, content)
+            yield stream.drain()
+    yield stream.drain()
@@ -0,0 +1,22 @@
+from django.db.models.signals import post_delete, post_save
+
+from core.models import ChangeLog, TrackedModel
+
+
+def record_save(sender, instance, **kwargs):
+    ChangeLog.record(sender, [instance.pk], ChangeLog.UPSERT)
+
+
+def record_delete(sender, instance, **kwargs):
+    ChangeLog.record(sender, [instance.pk], ChangeLog.DELETE)
+
+
+def connect_change_tracking(app_config):
+    """
+    Log per-row saves and deletes of every TrackedModel. Bulk writes bypass
+    signals and call ChangeLog.record themselves.
+    """
+    for model in app_config.get_models():
+        if issubclass(model, TrackedModel):
+            post_save.connect(record_save, sender=model)
+            post_delete.connect(record_delete, sender=model)
@@ -1,3 +1,1023 @@
-from django.test import TestCase
+import io
+import tempfile
+import time
+import zipfile
+from concurrent.futures import Future
+from unittest import mock
 
-# Create your tests here.
+from django.contrib import admin
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, router
+from django.http import HttpResponse
+from django.test import (
+    RequestFactory,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from accounts.models import User
+from core.api import encode_cursor
+from core.caching import DATA_VERSION_KEY, bump_data_version
+from core.profiling import QueryProfilingMiddleware, store
+from core.routers import (
+    PIN_COOKIE,
+    ReplicaPinningMiddleware,
+    check_shared_cache,
+    use_replica,
+)
+from core.services.cohorts import cohort_analytics, cohort_table
+from core.services.course_statistics import ranks, refresh_course_statistics
+from core.services.eligibility import award_degrees, degree_candidates
+from core.services.transcripts import cohort_transcripts, stream_transcripts
+from core.services.purge import academic_year_plan, count_plan, institution_plan, purge
+from core.services.student_search import search_students
+from core.models import (
+    AcademicYear,
+    ChangeLog,
+    Institution,
+    Institute,
+    Student,
+    Teacher,
+    Program,
+    Course,
+    CourseStatistics,
+    Enrollment,
+    Result,
+    Degree,
+)
+
+# Generous wall-clock bound for one request or call on the test fixtures
+MAX_SECONDS = 5
+
+
+def build_dataset(institute, count, offset=0):
+    """
+    Create ``count`` rows of every core model under ``institute``: one
+    student, teacher, program, course, enrollment, result and degree per
+    index, ids starting at ``offset``.
+    """
+    year, _ = AcademicYear.objects.get_or_create(start_year=2024)
+    ids = range(offset, offset + count)
+    Student.objects.bulk_create(
+        Student(
+            student_id=f"S{i}",
+            first_name=f"First{i}",
+            last_name=f"Last{i}",
+            gender="M",
+            birthdate="2000-01-01",
+            search_name=Student.build_search_name(f"First{i}", f"Last{i}"),
+        )
+        for i in ids
+    )
+    Teacher.objects.bulk_create(
+        Teacher(
+            teacher_id=f"T{i}", institute=institute, first_name="T", last_name=f"{i}"
+        )
+        for i in ids
+    )
+    Program.objects.bulk_create(
+        Program(
+            program_id=f"P{i}",
+            institute=institute,
+            name=f"Program {i}",
+            domain="Sciences",
+            level="L1",
+        )
+        for i in ids
+    )
+    Course.objects.bulk_create(
+        Course(
+            course_id=f"C{i}",
+            program_id=f"P{i}",
+            teacher_id=f"T{i}",
+            name=f"Course {i}",
+            code=f"K{i}",
+            credits=3,
+            semester="S1",
+        )
+        for i in ids
+    )
+    Enrollment.objects.bulk_create(
+        Enrollment(
+            enrollment_id=f"E{i}",
+            student_id=f"S{i}",
+            program_id=f"P{i}",
+            institute=institute,
+            academic_year=year,
+        )
+        for i in ids
+    )
+    Result.objects.bulk_create(
+        Result(
+            result_id=f"R{i}",
+            enrollment_id=f"E{i}",
+            course_id=f"C{i}",
+            academic_year=year,
+            note=12,
+        )
+        for i in ids
+    )
+    Degree.objects.bulk_create(
+        Degree(
+            degree_id=f"D{i}",
+            enrollment_id=f"E{i}",
+            date_awarded="2025-07-01",
+            degree_type="licence_fondamentale",
+            name="Licence",
+        )
+        for i in ids
+    )
+
+
+class InstitutionTestCase(TestCase):
+    """
+    The fixture most tests share: the institution UL, its institute FDS
+    holding ``DATASET_SIZE`` rows of build_dataset, and a user of UL, a
+    superuser when ``SUPERUSER`` is set.
+    """
+
+    DATASET_SIZE = 0
+    SUPERUSER = False
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.institution = Institution.objects.create(
+            name="Université de Lomé", acronym="UL", type="public", city="Lomé"
+        )
+        cls.institute = Institute.objects.create(
+            institution=cls.institution, name="Faculté des Sciences", acronym="FDS"
+        )
+        if cls.SUPERUSER:
+            create_user = User.objects.create_superuser
+        else:
+            create_user = User.objects.create_user
+        cls.user = create_user(
+            username="user", password="user", institution=cls.institution
+        )
+        if cls.DATASET_SIZE:
+            build_dataset(cls.institute, cls.DATASET_SIZE)
+
+
+class QueryCountTestCase(InstitutionTestCase):
+    """
+    Compare the queries of a request on a small fixture with the same
+    request once the fixture has grown: any difference is a per-row query.
+    """
+
+    SMALL = 3
+    LARGE = 30
+    DATASET_SIZE = SMALL
+    SUPERUSER = True
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def grow(self):
+        build_dataset(self.institute, self.LARGE - self.SMALL, offset=self.SMALL)
+
+    def count_queries(self, url):
+        # Measure the uncached path: cached pages would hide per-row queries
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = self.client.get(url)
+            elapsed = time.perf_counter() - start
+        self.assertEqual(response.status_code, 200, url)
+        self.assertLess(elapsed, MAX_SECONDS, url)
+        return len(queries)
+
+    def assertConstantQueries(self, url, max_queries):
+        small = self.count_queries(url)
+        self.grow()
+        large = self.count_queries(url)
+        self.assertEqual(
+            small,
+            large,
+            f"{url}: {small} queries for {self.SMALL} rows, {large} for {self.LARGE}",
+        )
+        self.assertLessEqual(large, max_queries, url)
+
+
+class DashboardQueryCountTests(QueryCountTestCase):
+    def test_dashboard(self):
+        self.assertConstantQueries(reverse("core:dashboard"), 10)
+
+
+class DashboardCacheTests(QueryCountTestCase):
+    def test_cached_until_import(self):
+        url = reverse("core:dashboard")
+        self.count_queries(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.context["total_students"], self.SMALL)
+        cached = len(queries)
+
+        self.grow()
+        bump_data_version()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.context["total_students"], self.LARGE)
+        self.assertGreater(len(queries), cached)
+
+
+class AdminChangelistQueryCountTests(QueryCountTestCase):
+    def test_changelists(self):
+        changelists = [
+            reverse(
+                f"admin:{model._meta.app_label}_{model._meta.model_name}_changelist"
+            )
+            for model in admin.site._registry
+            if model._meta.app_label == "core"
+        ]
+        small = {url: self.count_queries(url) for url in changelists}
+        self.grow()
+        for url in changelists:
+            with self.subTest(url=url):
+                large = self.count_queries(url)
+                self.assertEqual(small[url], large)
+                self.assertLessEqual(large, 15)
+
+
+class ChangeFeedTests(InstitutionTestCase):
+    DATASET_SIZE = 3
+    SUPERUSER = True
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def read_feed(self, **params):
+        response = self.client.get(reverse("core:api_changes"), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_saves_and_deletes_are_recorded(self):
+        student = Student.objects.get(pk="S0")
+        student.first_name = "Adélaïde"
+        student.save()
+        Result.objects.get(pk="R1").delete()
+        self.assertEqual(
+            list(ChangeLog.objects.values_list("model", "object_id", "action")),
+            [("student", "S0", ChangeLog.UPSERT), ("result", "R1", ChangeLog.DELETE)],
+        )
+
+    def test_pages(self):
+        ChangeLog.record(Student, ["S0", "S1", "S2"])
+        ChangeLog.record(Result, ["R0"], ChangeLog.DELETE)
+
+        page = self.read_feed(limit=3)
+        self.assertEqual(
+            [row["object_id"] for row in page["results"]], ["S0", "S1", "S2"]
+        )
+        page = self.read_feed(since=page["next_since"], limit=3)
+        self.assertEqual([row["object_id"] for row in page["results"]], ["R0"])
+        last = self.read_feed(since=page["next_since"])
+        self.assertEqual(last, {"results": [], "next_since": page["next_since"]})
+
+    def test_invalid_position(self):
+        for since in ["not a cursor", encode_cursor({"seq": 1}), encode_cursor(3)]:
+            with self.subTest(since=since):
+                response = self.client.get(
+                    reverse("core:api_changes"), {"since": since}
+                )
+                self.assertEqual(response.status_code, 400)
+
+    def test_staff_only(self):
+        self.user.is_staff = False
+        self.user.save()
+        response = self.client.get(reverse("core:api_changes"))
+        self.assertEqual(response.status_code, 403)
+
+
+class ResourceListTests(InstitutionTestCase):
+    DATASET_SIZE = 3
+
+    def setUp(self):
+        self.client.force_login(self.user)
+        self.url = reverse("core:api_resource", args=["students"])
+
+    def test_pages(self):
+        page = self.client.get(self.url, {"limit": 2}).json()
+        self.assertEqual([row["student_id"] for row in page["results"]], ["S0", "S1"])
+        page = self.client.get(
+            self.url, {"limit": 2, "cursor": page["next_cursor"]}
+        ).json()
+        self.assertEqual([row["student_id"] for row in page["results"]], ["S2"])
+        self.assertIsNone(page["next_cursor"])
+
+    def test_invalid_cursor(self):
+        for resource, cursor in [
+            ("students", "not a cursor"),
+            ("students", encode_cursor({"student_id": "S0"})),
+            ("students", encode_cursor(["S0"])),
+            ("institutes", encode_cursor("S0")),
+        ]:
+            with self.subTest(resource=resource, cursor=cursor):
+                response = self.client.get(
+                    reverse("core:api_resource", args=[resource]), {"cursor": cursor}
+                )
+                self.assertEqual(response.status_code, 400)
+
+    def test_fields(self):
+        response = self.client.get(self.url, {"fields": "last_name, first_name"})
+        self.assertEqual(
+            response.json()["results"][0],
+            {"student_id": "S0", "last_name": "Last0", "first_name": "First0"},
+        )
+        for fields in ["nickname", "search_name"]:
+            with self.subTest(fields=fields):
+                response = self.client.get(self.url, {"fields": fields})
+                self.assertEqual(response.status_code, 400)
+
+    def test_not_modified(self):
+        etag = self.client.get(self.url)["ETag"]
+        response = self.client.get(self.url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 304)
+
+        Student.objects.filter(pk="S1").update(first_name="Adélaïde")
+        response = self.client.get(self.url, headers={"if-none-match": etag})
+        self.assertEqual(response.status_code, 200)
+
+    def test_login_required(self):
+        self.client.logout()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 401)
+
+    def test_updated_since(self):
+        Student.objects.update(updated_at="2020-01-01T00:00:00Z")
+        Student.objects.get(pk="S1").save()
+        response = self.client.get(self.url, {"updated_since": "2024-01-01T00:00:00Z"})
+        self.assertEqual(
+            [row["student_id"] for row in response.json()["results"]], ["S1"]
+        )
+        response = self.client.get(self.url, {"updated_since": "yesterday"})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(
+            reverse("core:api_resource", args=["institutes"]),
+            {"updated_since": "2024-01-01T00:00:00Z"},
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class StudentSearchTests(InstitutionTestCase):
+    DATASET_SIZE = 2
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        student = Student.objects.get(pk="S0")
+        student.first_name, student.last_name = "Adélaïde", "Kokouvi"
+        student.save()
+        # Matches the name searches below, but is not enrolled in UL
+        Student.objects.create(
+            student_id="X0",
+            first_name="Adelaide",
+            last_name="Kokou",
+            gender="F",
+            birthdate="2001-01-01",
+        )
+
+    def search(self, query):
+        return sorted(search_students(query).values_list("pk", flat=True))
+
+    def test_accent_insensitive(self):
+        for query in ["adelaide", "ADÉLAÏDE", "kok adél", "  Kokou  "]:
+            with self.subTest(query=query):
+                self.assertEqual(self.search(query), ["S0", "X0"])
+        self.assertEqual(self.search("kokouvi adelaide"), ["S0"])
+        self.assertEqual(self.search("S1"), ["S1"])
+        self.assertEqual(self.search("Ade Kofi"), [])
+        self.assertEqual(self.search("  "), [])
+
+    def test_index_follows_changes(self):
+        student = Student.objects.get(pk="S1")
+        student.first_name = "Élodie"
+        student.save()
+        self.assertEqual(self.search("elodie"), ["S1"])
+        self.assertEqual(self.search("first1"), [])
+        Student.objects.filter(pk="S1").delete()
+        self.assertEqual(self.search("elodie"), [])
+
+    def test_autocomplete(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("core:student_autocomplete"), {"q": "adel"})
+        self.assertEqual(
+            response.json(),
+            {"results": [{"student_id": "S0", "name": "Adélaïde Kokouvi"}]},
+        )
+
+
+class AcademicYearTests(SimpleTestCase):
+    def test_parse(self):
+        self.assertEqual(AcademicYear.parse("2024-2025"), 2024)
+        self.assertEqual(AcademicYear.parse(" 1999-2000 "), 1999)
+        self.assertEqual(AcademicYear(start_year=2024).label, "2024-2025")
+
+    def test_malformed(self):
+        for label in ["2024", "2024/2025", "24-25", "2024-2025-2026", "", None]:
+            with self.subTest(label=label):
+                with self.assertRaises(ValueError):
+                    AcademicYear.parse(label)
+
+    def test_years_not_consecutive(self):
+        for label in ["2024-2026", "2025-2024", "2024-2024"]:
+            with self.subTest(label=label):
+                with self.assertRaises(ValueError):
+                    AcademicYear.parse(label)
+
+
+class ProfilingTests(InstitutionTestCase):
+    DATASET_SIZE = 2
+
+    def setUp(self):
+        store.clear()
+        self.addCleanup(store.clear)
+
+    @override_settings(PROFILING_BUDGETS={"default": {"queries": 1}})
+    def test_over_budget(self):
+        def view(request):
+            for pk in ["S0", "S1"]:
+                Student.objects.filter(pk=pk).exists()
+            return HttpResponse()
+
+        middleware = QueryProfilingMiddleware(view)
+        with self.assertLogs("core.profiling", "WARNING") as logs:
+            middleware(RequestFactory().get("/students/"))
+        self.assertIn("unresolved (/students/) over budget on queries", logs.output[0])
+
+        [row] = store.report()
+        self.assertEqual((row["view"], row["requests"]), ("unresolved", 1))
+        self.assertEqual((row["max_queries"], row["over_budget"]), (2, 1))
+        [(shape, count)] = row["repeated"]
+        self.assertEqual(count, 2)
+        self.assertIn('WHERE "core_student"."student_id" = ?', shape)
+
+    def test_report_staff_only(self):
+        store.add(
+            "core:dashboard",
+            {
+                "path": "/",
+                "queries": 12,
+                "db_ms": 3,
+                "total_ms": 8,
+                "repeated": {},
+                "over_budget": True,
+            },
+        )
+        url = reverse("core:profiling_report")
+        self.client.force_login(self.user)
+        response = self.client.get(url)
+        self.assertRedirects(
+            response,
+            f"{reverse('admin:login')}?next={url}",
+            fetch_redirect_response=False,
+        )
+        self.client.post(url)
+        self.assertEqual(len(store.report()), 1)
+
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(url)
+        self.assertContains(response, "core:dashboard")
+        response = self.client.post(url)
+        self.assertRedirects(response, url)
+        self.assertEqual(store.report(), [])
+
+
+class StartupImportTests(SimpleTestCase):
+    def test_no_dataframe_stack_on_startup(self):
+        # Booting a worker must not load pandas: only reading a file does
+        call_command("startup_times", forbid=["pandas", "numpy"], stdout=io.StringIO())
+
+
+class PurgeTests(InstitutionTestCase):
+    DATASET_SIZE = 4
+    SUPERUSER = True
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        other = Institution.objects.create(
+            name="Université de Kara", acronym="UK", type="public", city="Kara"
+        )
+        cls.other_institute = Institute.objects.create(
+            institution=other, name="Faculté des Lettres", acronym="FDL"
+        )
+        build_dataset(cls.other_institute, 2, offset=4)
+        # Another institution's course taught by one of the purged teachers
+        Course.objects.filter(pk="C4").update(teacher_id="T0")
+
+    def test_institution(self):
+        plan = institution_plan(self.institution)
+        self.assertEqual(dict(count_plan(plan))[Result], 4)
+
+        purge(plan, batch_size=3)
+        self.assertFalse(Institution.objects.filter(pk=self.institution.pk).exists())
+        self.assertEqual(Result.objects.count(), 2)
+        self.assertEqual(Enrollment.objects.count(), 2)
+        self.assertEqual(Student.objects.count(), 6)
+        self.assertIsNone(Course.objects.get(pk="C4").teacher_id)
+        self.user.refresh_from_db()
+        self.assertIsNone(self.user.institution)
+        self.assertEqual(
+            ChangeLog.objects.filter(model="result", action=ChangeLog.DELETE).count(),
+            4,
+        )
+
+    def test_statistics_of_other_institutions_courses(self):
+        # A UL student took the UK course C4: the result goes with UL
+        Result.objects.create(
+            result_id="X0",
+            enrollment_id="E0",
+            course_id="C4",
+            academic_year_id=2024,
+            note=6,
+        )
+        refresh_course_statistics(["C4"])
+        statistics = CourseStatistics.objects.get(course_id="C4")
+        self.assertEqual((statistics.count, statistics.mean), (2, 9))
+
+        purge(institution_plan(self.institution))
+        statistics = CourseStatistics.objects.get(course_id="C4")
+        self.assertEqual((statistics.count, statistics.mean), (1, 12))
+        self.assertEqual(statistics.notes, [12])
+
+    def test_academic_year(self):
+        year = AcademicYear.objects.get(start_year=2024)
+        purge(academic_year_plan(year))
+        self.assertFalse(AcademicYear.objects.exists())
+        self.assertFalse(Result.objects.exists())
+        self.assertEqual(Course.objects.count(), 6)
+
+    def test_admin_delete(self):
+        self.client.force_login(self.user)
+        url = reverse("admin:core_institution_delete", args=[self.institution.pk])
+        response = self.client.get(url)
+        self.assertContains(response, "Results: 4")
+        self.client.post(url, {"post": "yes"})
+        self.assertFalse(Institution.objects.filter(pk=self.institution.pk).exists())
+        self.assertEqual(Result.objects.count(), 2)
+
+
+class PurgeAdminTransactionTests(TransactionTestCase):
+    # TestCase wraps every test in a transaction: only a TransactionTestCase
+    # can tell whether the admin purge runs inside one
+    def setUp(self):
+        institution = Institution.objects.create(
+            name="Université de Lomé", acronym="UL", type="public", city="Lomé"
+        )
+        institute = Institute.objects.create(
+            institution=institution, name="Faculté des Sciences", acronym="FDS"
+        )
+        build_dataset(institute, 2)
+        self.institution = institution
+        self.client.force_login(
+            User.objects.create_superuser(username="user", password="user")
+        )
+
+    def in_transaction(self, plan, **kwargs):
+        self.assertFalse(connection.in_atomic_block)
+        return purge(plan, **kwargs)
+
+    def test_delete_view(self):
+        url = reverse("admin:core_institution_delete", args=[self.institution.pk])
+        with mock.patch("core.admin.purge", side_effect=self.in_transaction) as run:
+            self.client.post(url, {"post": "yes"})
+        run.assert_called_once()
+        self.assertFalse(Institution.objects.exists())
+        self.assertFalse(Result.objects.exists())
+
+    def test_delete_selected(self):
+        url = reverse("admin:core_institution_changelist")
+        with mock.patch("core.admin.purge", side_effect=self.in_transaction) as run:
+            self.client.post(
+                url,
+                {
+                    "action": "delete_selected",
+                    "_selected_action": [self.institution.pk],
+                    "post": "yes",
+                },
+            )
+        run.assert_called_once()
+        self.assertFalse(Institution.objects.exists())
+
+
+@mock.patch("core.routers.replica_configured", return_value=True)
+class ReplicaRoutingTests(SimpleTestCase):
+    def setUp(self):
+        # The last import reached the replica a minute ago
+        cache.set(DATA_VERSION_KEY, time.time_ns() - 60 * 10**9, None)
+        self.addCleanup(cache.clear)
+
+    def test_reads_inside_use_replica(self, configured):
+        self.assertEqual(router.db_for_read(Student), "default")
+        with use_replica():
+            self.assertEqual(router.db_for_read(Student), "replica")
+            with use_replica(False):
+                self.assertEqual(router.db_for_read(Student), "default")
+            self.assertEqual(router.db_for_write(Student), "default")
+            self.assertEqual(router.db_for_read(Student), "default")
+
+    def test_primary_right_after_import(self, configured):
+        bump_data_version()
+        with use_replica():
+            self.assertEqual(router.db_for_read(Student), "default")
+
+    def test_client_pinned_after_write(self, configured):
+        @use_replica()
+        def view(request):
+            if request.method == "POST":
+                router.db_for_write(Student)
+            return HttpResponse(router.db_for_read(Student))
+
+        middleware = ReplicaPinningMiddleware(view)
+        factory = RequestFactory()
+        self.assertEqual(middleware(factory.get("/")).content, b"replica")
+        response = middleware(factory.post("/"))
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+        request = factory.get("/")
+        request.COOKIES[PIN_COOKIE] = "1"
+        self.assertEqual(middleware(request).content, b"default")
+
+    def test_shared_cache_required(self, configured):
+        self.assertEqual(
+            [error.id for error in check_shared_cache(None)], ["core.E001"]
+        )
+        with tempfile.TemporaryDirectory() as location:
+            shared = {
+                "default": {
+                    "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+                    "LOCATION": location,
+                }
+            }
+            with override_settings(CACHES=shared):
+                self.assertEqual(check_shared_cache(None), [])
+
+
+class CourseStatisticsTests(InstitutionTestCase):
+    NOTES = [8, 12, 12, 15.5]
+    DATASET_SIZE = len(NOTES)
+    SUPERUSER = True
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # Every result of the same course session, one in the catch-up session
+        for i, note in enumerate(cls.NOTES):
+            Result.objects.filter(pk=f"R{i}").update(course_id="C0", note=note)
+        Result.objects.create(
+            result_id="R9",
+            enrollment_id="E0",
+            course_id="C0",
+            academic_year_id=2024,
+            session="rattrapage",
+            note=10,
+        )
+
+    def test_refresh(self):
+        self.assertEqual(refresh_course_statistics(["C0", "C1"]), 2)
+        statistics = CourseStatistics.objects.get(course="C0", session="normal")
+        self.assertEqual(statistics.count, 4)
+        self.assertAlmostEqual(statistics.mean, 11.875)
+        self.assertEqual(statistics.median, 12)
+        self.assertEqual((statistics.minimum, statistics.maximum), (8, 15.5))
+        self.assertEqual(sum(statistics.histogram), 4)
+        self.assertEqual(statistics.histogram[12], 2)
+
+        rank, percentile = ranks(statistics, [15.5, 12, 8, 20])
+        self.assertEqual(rank.tolist(), [1, 2, 4, 1])
+        self.assertEqual(percentile.tolist(), [100, 75, 25, 100])
+
+    def test_admin_changes(self):
+        refresh_course_statistics()
+        self.client.force_login(self.user)
+        self.client.post(
+            reverse("admin:core_result_change", args=["R1"]),
+            {
+                "result_id": "R1",
+                "enrollment": "E1",
+                "course": "C1",
+                "academic_year": 2024,
+                "session": "normal",
+                "note": 20,
+            },
+        )
+        self.assertEqual(
+            CourseStatistics.objects.get(course="C0", session="normal").count, 3
+        )
+        self.assertEqual(
+            CourseStatistics.objects.get(course="C1", session="normal").notes, [20]
+        )
+
+        self.client.post(
+            reverse("admin:core_result_delete", args=["R9"]), {"post": "yes"}
+        )
+        self.assertFalse(CourseStatistics.objects.filter(session="rattrapage").exists())
+
+    def test_refresh_replaces_stored(self):
+        refresh_course_statistics()
+        Result.objects.filter(session="rattrapage").delete()
+        refresh_course_statistics(["C0"])
+        self.assertEqual(
+            list(CourseStatistics.objects.values_list("session", flat=True)),
+            ["normal"],
+        )
+
+    def test_page(self):
+        refresh_course_statistics()
+        self.client.force_login(self.user)
+        statistics = CourseStatistics.objects.get(course="C0", session="normal")
+        response = self.client.get(
+            reverse("core:course_statistics"),
+            {"course": "C0", "cohort": statistics.pk},
+        )
+        self.assertEqual(
+            [(result.pk, rank) for result, rank, _ in response.context["rows"]],
+            [("R3", 1), ("R1", 2), ("R2", 2), ("R0", 4)],
+        )
+
+
+class DegreeEligibilityTests(InstitutionTestCase):
+    DATASET_SIZE = 4
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Degree.objects.all().delete()
+        # Four students of program P0 taking courses C0 (3 credits), C1 (6)
+        Enrollment.objects.update(program_id="P0")
+        Course.objects.filter(pk="C1").update(program_id="P0", credits=6)
+        notes = {
+            "E0": {"C0": 12, "C1": 14},
+            "E1": {"C0": 8, "C1": 11},
+            "E2": {"C0": 9, "C1": 5},
+            "E3": {"C0": 16},
+        }
+        Result.objects.all().delete()
+        Result.objects.bulk_create(
+            Result(
+                result_id=f"R{enrollment_id}{course_id}",
+                enrollment_id=enrollment_id,
+                course_id=course_id,
+                academic_year_id=2024,
+                note=note,
+            )
+            for enrollment_id, courses in notes.items()
+            for course_id, note in courses.items()
+        )
+        # E2 passes C1 after rattrapage
+        Result.objects.create(
+            result_id="RE2C1r",
+            enrollment_id="E2",
+            course_id="C1",
+            academic_year_id=2024,
+            session="rattrapage",
+            note=10,
+        )
+        cls.program = Program.objects.get(pk="P0")
+        cls.year = AcademicYear.objects.get(pk=2024)
+
+    def test_candidates(self):
+        candidates = degree_candidates(
+            self.program, self.year, min_credits=9, min_average=10, min_note=None
+        )
+        self.assertEqual(
+            candidates["credits"].to_dict(),
+            {"E0": 9, "E1": 6, "E2": 6, "E3": 3},
+        )
+        self.assertAlmostEqual(candidates.loc["E1", "average"], 10)
+        self.assertEqual(
+            candidates["eligible"].to_dict(),
+            {"E0": True, "E1": False, "E2": False, "E3": False},
+        )
+        self.assertEqual(
+            candidates.loc["E2", "reasons"], "credits below 9; average below 10"
+        )
+
+        candidates = degree_candidates(
+            self.program, self.year, min_credits=None, min_average=None, min_note=9.5
+        )
+        self.assertEqual(
+            candidates.index[candidates["eligible"]].tolist(), ["E0", "E3"]
+        )
+
+    def test_award(self):
+        candidates = degree_candidates(self.program, self.year, min_credits=6)
+        degrees = award_degrees(
+            candidates, "licence_fondamentale", "Licence", "2025-07-01"
+        )
+        self.assertEqual(sorted(degree.pk for degree in degrees), ["E0", "E1"])
+        self.assertEqual(
+            ChangeLog.objects.filter(model="degree", action=ChangeLog.UPSERT).count(),
+            2,
+        )
+
+        candidates = degree_candidates(self.program, self.year, min_credits=6)
+        self.assertEqual(candidates["has_degree"].sum(), 2)
+        self.assertEqual(
+            award_degrees(candidates, "licence_fondamentale", "Licence", "2025-07-01"),
+            [],
+        )
+
+
+class TranscriptTests(InstitutionTestCase):
+    DATASET_SIZE = 3
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        Enrollment.objects.update(program_id="P0")
+        Result.objects.update(course_id="C0")
+        Result.objects.create(
+            result_id="R0r",
+            enrollment_id="E0",
+            course_id="C0",
+            academic_year_id=2024,
+            session="rattrapage",
+            note=9,
+        )
+        refresh_course_statistics()
+        cls.program = Program.objects.select_related("institute__institution").get(
+            pk="P0"
+        )
+        cls.year = AcademicYear.objects.get(pk=2024)
+
+    def test_cohort_queries(self):
+        with self.assertNumQueries(5):
+            documents = cohort_transcripts(self.program, self.year)
+        self.assertEqual(len(documents), 3)
+        line = documents[0]["courses"][0]
+        self.assertEqual((line["note"], line["session"]), (9, "rattrapage"))
+        self.assertFalse(line["earned"])
+        self.assertEqual(documents[1]["courses"][0]["rank"], 1)
+        self.assertEqual(documents[1]["degree"]["name"], "Licence")
+
+    def assertArchive(self, file_format, workers):
+        documents = cohort_transcripts(self.program, self.year)
+        content = b"".join(stream_transcripts(documents, file_format, workers))
+        with zipfile.ZipFile(io.BytesIO(content)) as archive:
+            self.assertIsNone(archive.testzip())
+            names = archive.namelist()
+            self.assertEqual(len(names), len(set(names)))
+            return {name: archive.read(name) for name in names}
+
+    def test_html(self):
+        files = self.assertArchive("html", 1)
+        self.assertEqual(
+            sorted(files),
+            [
+                "s0-last0-first0-e0.html",
+                "s1-last1-first1-e1.html",
+                "s2-last2-first2-e2.html",
+            ],
+        )
+        self.assertIn(b"Course 0", files["s0-last0-first0-e0.html"])
+
+    def test_excel_in_worker_processes(self):
+        from openpyxl import load_workbook
+
+        files = self.assertArchive("xlsx", 2)
+        sheet = load_workbook(io.BytesIO(files["s1-last1-first1-e1.xlsx"])).active
+        self.assertEqual(sheet["E7"].value, 12)
+
+    def test_student_enrolled_twice(self):
+        Enrollment.objects.create(
+            enrollment_id="E0-bis",
+            student_id="S0",
+            program_id="P0",
+            institute=self.institute,
+            academic_year=self.year,
+        )
+        files = self.assertArchive("html", 1)
+        self.assertEqual(len(files), 4)
+        self.assertIn("s0-last0-first0-e0-bis.html", files)
+
+    @mock.patch("core.services.transcripts.CHUNK_SIZE", 1)
+    @mock.patch("core.services.transcripts.ProcessPoolExecutor")
+    def test_pool_submit_window(self, executor):
+        # Batches are submitted as the archive is consumed, not all up front
+        def submit(function, *args):
+            future = Future()
+            future.set_result(function(*args))
+            return future
+
+        pool = executor.return_value
+        pool.submit.side_effect = submit
+        documents = cohort_transcripts(self.program, self.year) * 4
+        stream = stream_transcripts(documents, "html", 2)
+        next(stream)
+        self.assertEqual(pool.submit.call_count, 4)
+        self.assertEqual(len(list(stream)), 12)
+        self.assertEqual(pool.submit.call_count, 12)
+        pool.shutdown.assert_called_once_with(cancel_futures=True)
+
+    @mock.patch("core.services.transcripts.ProcessPoolExecutor")
+    def test_download(self, executor):
+        self.client.force_login(self.user)
+        response = self.client.get(
+            reverse("core:transcripts"),
+            {"program": "P0", "year": "2024-2025", "format": "html"},
+        )
+        self.assertEqual(response["Content-Type"], "application/zip")
+        archive = zipfile.ZipFile(io.BytesIO(b"".join(response.streaming_content)))
+        self.assertEqual(len(archive.namelist()), 3)
+        # Rendered in the requesting process
+        executor.assert_not_called()
+
+
+class CohortAnalyticsTests(InstitutionTestCase):
+    DATASET_SIZE = 5
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # Program P0: S0-S3 enter in 2024, S4 in 2025
+        Enrollment.objects.update(program_id="P0")
+        Enrollment.objects.filter(pk="E4").update(academic_year_id=2025)
+        for year in (2025, 2026):
+            AcademicYear.objects.get_or_create(start_year=year)
+        later = {
+            # Graduates in the third year
+            "S0": [(2025, "active"), (2026, "graduated")],
+            # Abandons in the second year
+            "S1": [(2025, "abandoned")],
+            # S2 is not enrolled again: dropped out in the second year
+            "S3": [(2025, "active"), (2026, "active")],
+        }
+        Enrollment.objects.bulk_create(
+            Enrollment(
+                enrollment_id=f"{student_id}-{year}",
+                student_id=student_id,
+                program_id="P0",
+                institute=cls.institute,
+                academic_year_id=year,
+                status=status,
+            )
+            for student_id, years in later.items()
+            for year, status in years
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_funnels(self):
+        funnel = {
+            (row["entry_year"], row["years"]): row
+            for row in cohort_analytics(self.institution)["program_id"]
+        }
+        self.assertEqual([funnel[2024, years]["size"] for years in range(3)], [4, 4, 4])
+        self.assertEqual(
+            [funnel[2024, years]["retention"] for years in range(3)], [1, 0.75, 0.5]
+        )
+        self.assertEqual(
+            [funnel[2024, years]["graduation_rate"] for years in range(3)],
+            [0, 0, 0.25],
+        )
+        self.assertEqual(
+            [funnel[2024, years]["dropout_rate"] for years in range(3)], [0, 0.5, 0.5]
+        )
+        self.assertEqual(
+            [
+                (funnel[2025, years]["enrolled"], funnel[2025, years]["dropped"])
+                for years in range(2)
+            ],
+            [(1, 0), (0, 1)],
+        )
+        self.assertNotIn((2025, 2), funnel)
+
+        institutes = cohort_analytics(self.institution)["institute_id"]
+        self.assertEqual(len(institutes), len(funnel))
+
+    def test_cached_until_import(self):
+        cohort_analytics(self.institution)
+        with self.assertNumQueries(0):
+            cohort_analytics(self.institution)
+
+        Enrollment.objects.filter(pk="E4").delete()
+        bump_data_version()
+        records = cohort_analytics(self.institution)["program_id"]
+        self.assertNotIn(2025, {row["entry_year"] for row in records})
+
+    def test_table(self):
+        records = cohort_analytics(self.institution)["program_id"]
+        table = cohort_table(records, "program_id", "P0", "retention")
+        self.assertEqual(list(table.index), ["2024-2025", "2025-2026"])
+        self.assertEqual(
+            list(table.columns), ["Students", "Year 1", "Year 2", "Year 3"]
+        )
+        self.assertEqual(table.loc["2024-2025", "Year 2"], 75)
+        self.assertTrue(cohort_table(records, "program_id", "P1", "retention").empty)
+
+    def test_page(self):
+        self.client.force_login(self.user)
+        response = self.client.get(
+            reverse("core:cohorts"), {"group": "program", "key": "P0"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context["tables"]), 3)
+        self.assertContains(response, "75%")
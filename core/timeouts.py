@@ -0,0 +1,61 @@
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+
+SET_TIMEOUT = "SELECT set_config('statement_timeout', %s, %s)"
+
+
+@contextmanager
+def import_transaction():
+    """
+    transaction.atomic() under IMPORT_STATEMENT_TIMEOUT instead of the
+    statement timeout of web requests (PostgreSQL only). Imports and the
+    work following them (e.g. statistics refreshes) may run in a request.
+    """
+    with transaction.atomic():
+        if connection.vendor == "postgresql":
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    SET_TIMEOUT, [str(settings.IMPORT_STATEMENT_TIMEOUT), True]
+                )
+        yield
+
+
+class RequestTimeout:
+    """
+    Execute wrapper setting STATEMENT_TIMEOUT on its connection before the
+    first statement of a request.
+    """
+
+    def __init__(self):
+        self.applied = False
+
+    def __call__(self, execute, sql, params, many, context):
+        if not self.applied:
+            self.applied = True
+            context["cursor"].execute(
+                SET_TIMEOUT, [str(settings.STATEMENT_TIMEOUT), False]
+            )
+        return execute(sql, params, many, context)
+
+
+class StatementTimeoutMiddleware:
+    """
+    Put the statements of web requests under STATEMENT_TIMEOUT, on every
+    PostgreSQL connection the request uses. The limit is set per request
+    rather than as a connection option, so that management commands
+    (migrations, purges, statistics refreshes) run without it.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with ExitStack() as stack:
+            for alias in settings.DATABASES:
+                if connections[alias].vendor == "postgresql":
+                    stack.enter_context(
+                        connections[alias].execute_wrapper(RequestTimeout())
+                    )
+            return self.get_response(request)
@@ -1,8 +1,24 @@
 from django.urls import path
-from . import views
+from . import api, views
 
 app_name = 'core'
 
 urlpatterns = [
     path('dashboard/', views.dashboard, name='dashboard'),
+    path('grade-sheet/', views.grade_sheet, name='grade_sheet'),
+    path('transcripts/', views.transcripts, name='transcripts'),
+    path('cohorts/', views.cohorts, name='cohorts'),
+    path(
+        'course-statistics/',
+        views.course_statistics,
+        name='course_statistics',
+    ),
+    path(
+        'students/autocomplete/',
+        views.student_autocomplete,
+        name='student_autocomplete',
+    ),
+    path('profiling/', views.profiling_report, name='profiling_report'),
+    path('api/changes/', api.change_feed, name='api_changes'),
+    path('api/<str:resource>/', api.resource_list, name='api_resource'),
 ]
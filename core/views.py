@@ -1,19 +1,281 @@
-from django.shortcuts import render
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404, redirect, render
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from core.models import Student, Institute, Program, Course, Enrollment, Teacher
+from core.models import (
+    AcademicYear,
+    Student,
+    Institute,
+    Program,
+    Course,
+    Enrollment,
+    Result,
+    Teacher,
+)
+from core.caching import cached_for_institution
+from core.profiling import budget_for, store
+from core.routers import use_replica
+from core.services.cohorts import cohort_analytics, cohort_table
+from core.services.course_statistics import ranks
+from core.services.grade_sheet import build_grade_sheet, export_grade_sheet
+from core.services.student_search import autocomplete
+from core.services.transcripts import (
+    cohort_transcripts,
+    stream_transcripts,
+    transcript_formats,
+)
+
+# Rows rendered on the grade sheet page; downloads always hold every row.
+GRADE_SHEET_PREVIEW_ROWS = 200
+
+EXPORT_CONTENT_TYPES = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
 
 
 @login_required
+@use_replica()
 def dashboard(request):
     """
-    Main dashboard displaying summary statistics
+    Main dashboard displaying summary statistics, cached until the next
+    data import
+    """
+    context = cached_for_institution(
+        "dashboard",
+        request.user.institution,
+        lambda: {
+            "total_students": Student.objects.count(),
+            "total_institutes": Institute.objects.count(),
+            "total_programs": Program.objects.count(),
+            "total_courses": Course.objects.count(),
+            "total_enrollments": Enrollment.objects.count(),
+            "total_teachers": Teacher.objects.count(),
+        },
+    )
+    return render(request, "core/dashboard.html", context)
+
+
+@login_required
+@use_replica()
+def grade_sheet(request):
     """
+    Grade sheet (enrollments x courses) of a program for an academic year,
+    displayed as a table or downloaded as CSV/Excel.
+    """
+    programs = Program.objects.filter(
+        institute__institution=request.user.institution
+    ).order_by("name")
+    program = programs.filter(program_id=request.GET.get("program")).first()
+    academic_year = request.GET.get("year", "")
+
+    years, sheet = [], None
+    if program:
+        years = list(
+            AcademicYear.objects.filter(enrollments__program=program)
+            .distinct()
+            .order_by("-start_year")
+        )
+        selected = [year for year in years if year.label == academic_year]
+        if selected:
+            sheet = build_grade_sheet(program, selected[0])
+
+    file_format = request.GET.get("format")
+    if sheet is not None and file_format in EXPORT_CONTENT_TYPES:
+        response = HttpResponse(
+            export_grade_sheet(sheet, file_format),
+            content_type=EXPORT_CONTENT_TYPES[file_format],
+        )
+        filename = f"grades_{program.program_id}_{academic_year}.{file_format}"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
     context = {
-        "total_students": Student.objects.count(),
-        "total_institutes": Institute.objects.count(),
-        "total_programs": Program.objects.count(),
-        "total_courses": Course.objects.count(),
-        "total_enrollments": Enrollment.objects.count(),
-        "total_teachers": Teacher.objects.count(),
+        "programs": programs,
+        "program": program,
+        "years": years,
+        "academic_year": academic_year,
+        "total_rows": len(sheet) if sheet is not None else 0,
+        "preview_rows": GRADE_SHEET_PREVIEW_ROWS,
+        "transcript_formats": transcript_formats(),
+        "sheet_html": (
+            sheet.head(GRADE_SHEET_PREVIEW_ROWS).to_html(
+                classes="table table-bordered table-sm",
+                index=False,
+                na_rep="",
+                float_format="{:.2f}".format,
+            )
+            if sheet is not None
+            else ""
+        ),
     }
-    return render(request, "core/dashboard.html", context)
+    return render(request, "core/grade_sheet.html", context)
+
+
+@login_required
+@use_replica()
+def transcripts(request):
+    """
+    ZIP archive of the transcripts of a program's students for an academic
+    year, streamed while the documents are rendered.
+    """
+    program = get_object_or_404(
+        Program.objects.select_related("institute__institution"),
+        institute__institution=request.user.institution,
+        program_id=request.GET.get("program"),
+    )
+    try:
+        start_year = AcademicYear.parse(request.GET.get("year", ""))
+    except ValueError:
+        start_year = None
+    academic_year = get_object_or_404(AcademicYear, pk=start_year)
+    file_format = request.GET.get("format", "html")
+    if file_format not in transcript_formats():
+        return HttpResponse(status=400)
+
+    # Fetched here, on the replica; rendering happens while streaming
+    documents = cohort_transcripts(program, academic_year)
+    response = StreamingHttpResponse(
+        stream_transcripts(documents, file_format), content_type="application/zip"
+    )
+    filename = f"transcripts_{program.program_id}_{academic_year.label}.zip"
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+@login_required
+@use_replica()
+def course_statistics(request):
+    """
+    Note distribution of a course session with each student's rank and
+    percentile, served from the statistics stored at import time.
+    """
+    courses = Course.objects.filter(
+        program__institute__institution=request.user.institution
+    ).order_by("code")
+    course = courses.filter(course_id=request.GET.get("course")).first()
+    cohort = request.GET.get("cohort", "")
+
+    cohorts, statistics, rows, histogram = [], None, [], []
+    if course:
+        cohorts = list(
+            course.statistics.select_related("academic_year").order_by(
+                "-academic_year", "session"
+            )
+        )
+        selected = [c for c in cohorts if str(c.pk) == cohort]
+        if selected:
+            statistics = selected[0]
+            results = list(
+                Result.objects.filter(
+                    course=course,
+                    academic_year=statistics.academic_year_id,
+                    session=statistics.session,
+                )
+                .select_related("enrollment__student")
+                .order_by("-note", "enrollment__student__last_name")
+            )
+            rank, percentile = ranks(statistics, [result.note for result in results])
+            rows = list(zip(results, rank.tolist(), percentile.tolist()))
+            peak = max(statistics.histogram) or 1
+            histogram = [
+                (f"{note}–{note + 1}", count, 100 * count / peak)
+                for note, count in enumerate(statistics.histogram)
+            ]
+
+    context = {
+        "courses": courses,
+        "course": course,
+        "cohorts": cohorts,
+        "cohort": cohort,
+        "statistics": statistics,
+        "histogram": histogram,
+        "rows": rows,
+    }
+    return render(request, "core/course_statistics.html", context)
+
+
+# Tables of the cohorts page: funnel share -> title
+COHORT_TABLES = {
+    "retention": "Retention (still enrolled)",
+    "graduation_rate": "Graduated",
+    "dropout_rate": "Dropped out",
+}
+
+
+@login_required
+@use_replica()
+def cohorts(request):
+    """
+    Retention, graduation and dropout of the entry cohorts of a program or
+    an institute, by year since entry. The funnels are computed for the
+    whole institution at once and cached until the next import.
+    """
+    institution = request.user.institution
+    by = "institute_id" if request.GET.get("group") == "institute" else "program_id"
+    if by == "program_id":
+        choices = Program.objects.filter(institute__institution=institution)
+        choices = choices.order_by("name").values_list("program_id", "name")
+    else:
+        choices = Institute.objects.filter(institution=institution)
+        choices = choices.order_by("acronym").values_list("pk", "name")
+    choices = [(str(key), label) for key, label in choices]
+    key = request.GET.get("key", "")
+
+    tables = []
+    if key in dict(choices):
+        records = cohort_analytics(institution)[by]
+        for share, title in COHORT_TABLES.items():
+            table = cohort_table(records, by, key, share)
+            if not table.empty:
+                tables.append(
+                    (
+                        title,
+                        table.to_html(
+                            classes="table table-bordered table-sm",
+                            na_rep="",
+                            float_format="{:.0f}%".format,
+                        ),
+                    )
+                )
+
+    context = {
+        "group": "institute" if by == "institute_id" else "program",
+        "choices": choices,
+        "key": key,
+        "tables": tables,
+    }
+    return render(request, "core/cohorts.html", context)
+
+
+@login_required
+@use_replica()
+def student_autocomplete(request):
+    """
+    JSON autocomplete of the user's institution students, matched by ID
+    prefix or by name regardless of accents.
+    """
+    results = autocomplete(request.GET.get("q", ""), request.user.institution)
+    return JsonResponse({"results": results})
+
+
+@staff_member_required
+def profiling_report(request):
+    """
+    Query counts and timings per view, as recorded by the profiling
+    middleware over the last requests of this process. POST resets them.
+    """
+    if request.method == "POST":
+        store.clear()
+        return redirect("core:profiling_report")
+
+    rows = store.report()
+    for row in rows:
+        row["budget"] = budget_for(row["view"])
+    context = {
+        "enabled": settings.PROFILING,
+        "buffer_size": store.size,
+        "rows": rows,
+    }
+    return render(request, "core/profiling.html", context)
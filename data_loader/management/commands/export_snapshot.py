@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Institution
+from data_loader.services.snapshots import BATCH_SIZE, export_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Export every row reachable from an institution into a snapshot "
+        "archive: one compressed Parquet file per table, with checksums."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("institution", help="Acronym of the institution.")
+        parser.add_argument("archive", help="Path of the .zip archive to write.")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=BATCH_SIZE,
+            help="Rows read and written at a time.",
+        )
+
+    def handle(self, *args, institution, archive, batch_size, **options):
+        try:
+            institution = Institution.objects.get(acronym=institution)
+        except Institution.DoesNotExist:
+            raise CommandError(f"No institution with acronym '{institution}'.")
+        try:
+            manifest = export_snapshot(institution, archive, batch_size)
+        except ImportError:
+            raise CommandError("Snapshots require pyarrow.")
+
+        for table in manifest["tables"]:
+            self.stdout.write(f"{table['model']}\t{table['rows']} rows")
+        for label, count in manifest["left_out"].items():
+            if count:
+                self.stdout.write(
+                    self.style.WARNING(
+                        f"{label}\t{count} linked to another institution, left out"
+                    )
+                )
+        self.stdout.write(self.style.SUCCESS(f"Exported {institution} to {archive}"))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+
+from data_loader.services.snapshots import BATCH_SIZE, SnapshotError, restore_snapshot
+
+
+class Command(BaseCommand):
+    help = (
+        "Restore a snapshot archive written by export_snapshot: verify its "
+        "checksums, then upsert its rows table by table in one transaction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("archive", help="Path of the .zip archive to restore.")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=BATCH_SIZE,
+            help="Rows read and written at a time.",
+        )
+
+    def handle(self, *args, archive, batch_size, **options):
+        try:
+            manifest = restore_snapshot(archive, batch_size)
+        except ImportError:
+            raise CommandError("Snapshots require pyarrow.")
+        except (SnapshotError, DatabaseError, OSError) as e:
+            raise CommandError(e)
+
+        for table in manifest["tables"]:
+            self.stdout.write(f"{table['model']}\t{table['rows']} rows")
+        self.stdout.write(
+            self.style.SUCCESS(f"Restored {manifest['institution']} from {archive}")
+        )
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("data_loader", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="importfile",
+            name="checkpointed",
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name="importfile",
+            name="last_committed_row",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("data_loader", "0002_importfile_checkpoint"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="importfile",
+            name="checksum",
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-19 12:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_loader', '0003_importfile_checksum'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importfile',
+            name='sheet_name',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+    ]
@@ -19,13 +19,24 @@ class ImportFile(models.Model):
 
     file = models.FileField(upload_to="imports/")
     file_type = models.CharField(max_length=50, choices=FILE_TYPE_CHOICES)
+    # Excel worksheet to read; blank for the first one
+    sheet_name = models.CharField(max_length=100, blank=True)
     uploaded_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
+    checksum = models.CharField(max_length=64, blank=True)
+    checkpointed = models.BooleanField(default=False)
+    # Leading data rows of the file covered by the committed chunks
+    last_committed_row = models.PositiveIntegerField(default=0)
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return f"{self.file.name} ({self.file_type})"
 
+    @property
+    def resume_row(self):
+        """Row of the file a resumed import starts from, the header being row 1."""
+        return self.last_committed_row + 2
+
 
 class ImportLog(models.Model):
     import_file = models.ForeignKey(
@@ -0,0 +1,106 @@
+import io
+
+from django.db import connections, router
+from django.db.models import DateTimeField
+from django.utils import timezone
+
+from core.models import ChangeLog
+from core.services.partitioning import moved_rows_delete
+
+# Characters escaped in COPY's text format
+COPY_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+def copy_value(value):
+    """Render one column value in COPY's text format."""
+    if value is None:
+        return "\\N"
+    return str(value).translate(COPY_ESCAPES)
+
+
+def copy_rows(cursor, sql, buffer):
+    """Run ``COPY ... FROM STDIN`` with psycopg 3 or psycopg2."""
+    if hasattr(cursor, "copy_expert"):
+        cursor.copy_expert(sql, buffer)
+    else:
+        with cursor.copy(sql) as copy:
+            copy.write(buffer.getvalue())
+
+
+def copy_upsert(model, objs, update_fields, unique_fields):
+    """
+    Upsert ``objs`` on PostgreSQL: COPY them into a temporary staging table
+    shaped like the model's table, then merge it in a single
+    INSERT ... ON CONFLICT statement, which also appends the ChangeLog
+    entries. ``objs`` must not repeat a key. Returns a (created, updated)
+    tuple.
+    """
+    connection = connections[router.db_for_write(model)]
+    quote = connection.ops.quote_name
+    table = model._meta.db_table
+    staging = f"{table}_staging"
+    fields = model._meta.concrete_fields
+    columns = ", ".join(quote(field.column) for field in fields)
+    pk = quote(model._meta.pk.column)
+
+    # auto_now / auto_now_add timestamps: one value for the whole batch
+    now = timezone.now()
+    timestamps = {
+        field.attname: copy_value(field.get_db_prep_save(now, connection))
+        for field in fields
+        if isinstance(field, DateTimeField) and (field.auto_now or field.auto_now_add)
+    }
+
+    buffer = io.StringIO()
+    for obj in objs:
+        buffer.write(
+            "\t".join(
+                timestamps.get(field.attname)
+                or copy_value(
+                    field.get_db_prep_save(getattr(obj, field.attname), connection)
+                )
+                for field in fields
+            )
+        )
+        buffer.write("\n")
+    buffer.seek(0)
+
+    conflict = ", ".join(
+        quote(model._meta.get_field(name).column) for name in unique_fields
+    )
+    updates = ", ".join(
+        f"{quote(column)} = EXCLUDED.{quote(column)}"
+        for column in [
+            *(model._meta.get_field(name).column for name in update_fields),
+            "updated_at",
+        ]
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TEMPORARY TABLE {quote(staging)} "
+            f"(LIKE {quote(table)} INCLUDING DEFAULTS)"
+        )
+        copy_rows(cursor, f"COPY {quote(staging)} ({columns}) FROM STDIN", buffer)
+        # Rows moving to another partition leave their old one first
+        moved = moved_rows_delete(model, quote(staging), connection)
+        # Every part of the statement sees the same snapshot: ``existing``
+        # counts the rows present before the merge.
+        cursor.execute(
+            f"WITH {f'moved AS ({moved}), ' if moved else ''}existing AS ("
+            f"SELECT count(*) AS n FROM {quote(table)} "
+            f"JOIN {quote(staging)} USING ({pk})"
+            f"), merged AS ("
+            f"INSERT INTO {quote(table)} ({columns}) "
+            f"SELECT {columns} FROM {quote(staging)} "
+            f"ON CONFLICT ({conflict}) DO UPDATE SET {updates} "
+            f"RETURNING {pk} AS object_id"
+            f"), logged AS ("
+            f"INSERT INTO {quote(ChangeLog._meta.db_table)} "
+            f"(model, object_id, action, changed_at) "
+            f"SELECT %s, object_id, %s, now() FROM merged"
+            f") SELECT count(*), (SELECT n FROM existing) FROM merged",
+            [model._meta.model_name, ChangeLog.UPSERT],
+        )
+        total, updated = cursor.fetchone()
+        cursor.execute(f"DROP TABLE {quote(staging)}")
+    return total - updated, updated
@@ -1,5 +1,6 @@
-import pandas as pd
 from core.models import (
+    AcademicYear,
+    ChangeLog,
     Institute,
     Student,
     Teacher,
@@ -9,265 +10,423 @@ from core.models import (
     Result,
     Degree,
 )
-from django.db import transaction
+from core.caching import bump_data_version
+from core.services.course_statistics import refresh_course_statistics
+from core.services.partitioning import conflict_target
+from core.timeouts import import_transaction
+from data_loader.services.bulk_load import copy_upsert
+from data_loader.services.readers import load_dataframe
+from django.db import connection
+
+# Number of rows written (and, in checkpointed mode, committed) at a time.
+# PostgreSQL loads through COPY, which pays off on larger chunks; elsewhere
+# chunks stay small enough for the key lookups' IN (...) parameter lists.
+CHUNK_SIZE = 1000
+COPY_CHUNK_SIZE = 10000
 
 
 # ---------------------
 # Helper functions
 # ---------------------
-def load_dataframe(file_path):
-    """Load CSV or Excel into a pandas DataFrame."""
-    if file_path.endswith(".csv"):
-        df = pd.read_csv(file_path)
-    else:
-        df = pd.read_excel(file_path)
-    return df.fillna("")
+def get_institutes_by_acronym(user):
+    """Map acronym -> Institute for every institute of the user's institution."""
+    return {
+        institute.acronym: institute
+        for institute in Institute.objects.filter(institution=user.institution)
+    }
 
 
-def get_institute_by_acronym(acronym, user):
-    """Retrieve an institute object by its acronym for the current user's institution."""
-    try:
-        return Institute.objects.get(
-            acronym=acronym.strip(), institution=user.institution
+def existing_keys(model, keys):
+    """Return the subset of ``keys`` that already exist as primary keys of ``model``."""
+    return set(model.objects.filter(pk__in=set(keys)).values_list("pk", flat=True))
+
+
+def first_enrollments(student_ids, institutes):
+    """Map (student_id, institute_id) -> enrollment_id, keeping the first enrollment."""
+    enrollments = {}
+    rows = (
+        Enrollment.objects.filter(
+            student_id__in=set(student_ids), institute__in=institutes
         )
-    except Institute.DoesNotExist:
-        return None
+        .order_by("pk")
+        .values_list("student_id", "institute_id", "enrollment_id")
+    )
+    for student_id, institute_id, enrollment_id in rows:
+        enrollments.setdefault((student_id, institute_id), enrollment_id)
+    return enrollments
+
+
+def academic_year_resolver():
+    """
+    Return a function mapping an academic year label to its AcademicYear key,
+    or None when the label is malformed. Years are created on first use and
+    every label is looked up once per import.
+    """
+    cache = {}
+
+    def resolve(label):
+        if label not in cache:
+            try:
+                start_year = AcademicYear.parse(label)
+            except ValueError:
+                start_year = None
+            else:
+                AcademicYear.objects.get_or_create(start_year=start_year)
+            cache[label] = start_year
+        return cache[label]
+
+    return resolve
+
+
+def upsert(model, objs, update_fields):
+    """
+    Insert or update ``objs`` keyed on their primary key, refreshing
+    ``updated_at`` and logging the change in the ChangeLog.
+    When a key appears several times, the last occurrence wins.
+    Returns a (created, updated) tuple.
+
+    On PostgreSQL rows are streamed with COPY and merged in one statement
+    (see bulk_load.copy_upsert); other backends use batched ORM writes.
+    """
+    objs = list({obj.pk: obj for obj in objs}.values())
+    if not objs:
+        return 0, 0
+    if connection.vendor == "postgresql":
+        return copy_upsert(model, objs, update_fields, conflict_target(model))
+
+    keys = [obj.pk for obj in objs]
+    updated = len(existing_keys(model, keys))
+    model.objects.bulk_create(
+        objs,
+        update_conflicts=True,
+        unique_fields=conflict_target(model),
+        update_fields=[*update_fields, "updated_at"],
+    )
+    ChangeLog.record(model, keys)
+    return len(objs) - updated, updated
+
+
+def run_in_chunks(df, write_chunk, import_file=None):
+    """
+    Feed ``df`` to ``write_chunk`` one chunk of rows at a time and sum the
+    (created, updated, skipped) counts it returns.
+
+    Without a checkpointed ``import_file`` the whole file is written in a single
+    transaction. In checkpointed mode every chunk is committed on its own and
+    ``import_file.last_committed_row`` is advanced with it to the number of
+    data rows of the file written so far, so a failed import resumes from the
+    last committed chunk instead of starting over. ``df`` must keep the
+    position of its rows in the file as its index, as load_dataframe() does.
+
+    Cached values derived from imported data are invalidated afterwards,
+    including after a failure that may have committed some chunks.
+    """
+    chunk_size = COPY_CHUNK_SIZE if connection.vendor == "postgresql" else CHUNK_SIZE
+    checkpointed = import_file is not None and import_file.checkpointed
+    if checkpointed and import_file.last_committed_row:
+        df = df[df.index >= import_file.last_committed_row]
+    totals = [0, 0, 0]
+
+    def process(offset):
+        counts = write_chunk(df.iloc[offset : offset + chunk_size])
+        totals[:] = [total + count for total, count in zip(totals, counts)]
+
+    try:
+        if not checkpointed:
+            with import_transaction():
+                for offset in range(0, len(df), chunk_size):
+                    process(offset)
+            return tuple(totals)
+
+        for offset in range(0, len(df), chunk_size):
+            with import_transaction():
+                process(offset)
+                last = df.index[min(offset + chunk_size, len(df)) - 1]
+                import_file.last_committed_row = int(last) + 1
+                import_file.save(update_fields=["last_committed_row"])
+        return tuple(totals)
+    finally:
+        bump_data_version()
 
 
 # ---------------------
 # Ingestion functions
 # ---------------------
-@transaction.atomic
-def ingest_students(file_path):
-    df = load_dataframe(file_path)
-    created, updated = 0, 0
-
-    for _, row in df.iterrows():
-        sid = str(row["student_id"]).strip()
-        defaults = {
-            "first_name": row["first_name"].strip(),
-            "last_name": row["last_name"].strip(),
-            "gender": str(row["gender (M/F)"]).upper().strip(),
-            "birthdate": row["birthdate (YYYY-MM-DD)"],
-        }
-        obj, created_flag = Student.objects.update_or_create(
-            student_id=sid, defaults=defaults
+def ingest_students(file_path, import_file=None, sheet=None):
+    df = load_dataframe(file_path, "students", sheet)
+
+    def write_chunk(chunk):
+        students = [
+            Student(
+                student_id=str(row["student_id"]).strip(),
+                first_name=row["first_name"].strip(),
+                last_name=row["last_name"].strip(),
+                gender=str(row["gender (M/F)"]).upper().strip(),
+                birthdate=row["birthdate (YYYY-MM-DD)"],
+                search_name=Student.build_search_name(
+                    row["first_name"], row["last_name"]
+                ),
+            )
+            for _, row in chunk.iterrows()
+        ]
+        created, updated = upsert(
+            Student,
+            students,
+            ["first_name", "last_name", "gender", "birthdate", "search_name"],
         )
-        if created_flag:
-            created += 1
-        else:
-            updated += 1
+        return created, updated, 0
+
+    created, updated, _ = run_in_chunks(df, write_chunk, import_file)
     return f"Students imported successfully: {created} created, {updated} updated."
 
 
-@transaction.atomic
-def ingest_teachers(file_path, user):
-    df = load_dataframe(file_path)
-    created, skipped, updated = 0, 0, 0
-
-    for _, row in df.iterrows():
-        acronym = str(row["institute_acronym"]).strip()
-        teacher_id = str(row["teacher_id"]).strip()
-
-        institute = get_institute_by_acronym(acronym, user)
-        if not institute:
-            skipped += 1
-            continue
-
-        defaults = {
-            "first_name": row["first_name"].strip(),
-            "last_name": row["last_name"].strip(),
-            "grade": row["grade"].strip(),
-            "status": row["status"].strip(),
-            "institute": institute,
-        }
-        teacher, created_flag = Teacher.objects.update_or_create(
-            teacher_id=teacher_id, defaults=defaults
+def ingest_teachers(file_path, user, import_file=None, sheet=None):
+    df = load_dataframe(file_path, "teachers", sheet)
+    institutes = get_institutes_by_acronym(user)
+
+    def write_chunk(chunk):
+        teachers, skipped = [], 0
+        for _, row in chunk.iterrows():
+            institute = institutes.get(str(row["institute_acronym"]).strip())
+            if not institute:
+                skipped += 1
+                continue
+
+            teachers.append(
+                Teacher(
+                    teacher_id=str(row["teacher_id"]).strip(),
+                    first_name=row["first_name"].strip(),
+                    last_name=row["last_name"].strip(),
+                    grade=row["grade"].strip(),
+                    status=row["status"].strip(),
+                    institute=institute,
+                )
+            )
+        created, updated = upsert(
+            Teacher,
+            teachers,
+            ["first_name", "last_name", "grade", "status", "institute"],
         )
-        if created_flag:
-            created += 1
-        else:
-            updated += 1
+        return created, updated, skipped
+
+    created, updated, skipped = run_in_chunks(df, write_chunk, import_file)
     return f"Teachers imported successfully: {created} created, {updated} updated, {skipped} skipped."
 
 
-@transaction.atomic
-def ingest_programs(file_path, user):
-    df = load_dataframe(file_path)
-    created, skipped, updated = 0, 0, 0
-
-    for _, row in df.iterrows():
-        acronym = str(row["institute_acronym"]).strip()
-        program_id = row["program_id"].strip()
-
-        institute = get_institute_by_acronym(acronym, user)
-        if not institute:
-            skipped += 1
-            continue
-
-        defaults = {
-            "name": row["name"].strip(),
-            "domain": row["domain"].strip(),
-            "level": row["level"].strip(),
-            "institute": institute,
-        }
-        program, created_flag = Program.objects.update_or_create(
-            program_id=program_id, defaults=defaults
+def ingest_programs(file_path, user, import_file=None, sheet=None):
+    df = load_dataframe(file_path, "programs", sheet)
+    institutes = get_institutes_by_acronym(user)
+
+    def write_chunk(chunk):
+        programs, skipped = [], 0
+        for _, row in chunk.iterrows():
+            institute = institutes.get(str(row["institute_acronym"]).strip())
+            if not institute:
+                skipped += 1
+                continue
+
+            programs.append(
+                Program(
+                    program_id=row["program_id"].strip(),
+                    name=row["name"].strip(),
+                    domain=row["domain"].strip(),
+                    level=row["level"].strip(),
+                    institute=institute,
+                )
+            )
+        created, updated = upsert(
+            Program, programs, ["name", "domain", "level", "institute"]
         )
-        if created_flag:
-            created += 1
-        else:
-            updated += 1
+        return created, updated, skipped
+
+    created, updated, skipped = run_in_chunks(df, write_chunk, import_file)
     return f"Programs imported successfully: {created} created, {updated} updated, {skipped} skipped."
 
 
-@transaction.atomic
-def ingest_courses(file_path):
-    df = load_dataframe(file_path)
-    created, skipped, updated = 0, 0, 0
+def ingest_courses(file_path, import_file=None, sheet=None):
+    df = load_dataframe(file_path, "courses", sheet)
 
-    for _, row in df.iterrows():
-        try:
-            program = Program.objects.get(program_id=row["program_id"].strip())
-        except Program.DoesNotExist:
-            skipped += 1
-            continue
+    def write_chunk(chunk):
+        program_ids = existing_keys(
+            Program, [row["program_id"].strip() for _, row in chunk.iterrows()]
+        )
+        teacher_ids = existing_keys(
+            Teacher,
+            [str(row["teacher_id (optional)"]).strip() for _, row in chunk.iterrows()],
+        )
 
-        teacher_id = str(row["teacher_id (optional)"]).strip()
-        teacher = None
-        if teacher_id:
-            try:
-                teacher = Teacher.objects.get(teacher_id=teacher_id)
-            except Teacher.DoesNotExist:
-                pass
-
-        defaults = {
-            "name": row["name"].strip(),
-            "code": row["code"].strip(),
-            "credits": int(row["credits"]),
-            "semester": row["semester"].strip(),
-            "program": program,
-            "teacher": teacher,
-        }
-        course, created_flag = Course.objects.update_or_create(
-            course_id=row["course_id"].strip(), defaults=defaults
+        courses, skipped = [], 0
+        for _, row in chunk.iterrows():
+            program_id = row["program_id"].strip()
+            if program_id not in program_ids:
+                skipped += 1
+                continue
+
+            teacher_id = str(row["teacher_id (optional)"]).strip()
+            courses.append(
+                Course(
+                    course_id=row["course_id"].strip(),
+                    name=row["name"].strip(),
+                    code=row["code"].strip(),
+                    credits=int(row["credits"]),
+                    semester=row["semester"].strip(),
+                    program_id=program_id,
+                    teacher_id=teacher_id if teacher_id in teacher_ids else None,
+                )
+            )
+        created, updated = upsert(
+            Course,
+            courses,
+            ["name", "code", "credits", "semester", "program", "teacher"],
         )
-        if created_flag:
-            created += 1
-        else:
-            updated += 1
+        return created, updated, skipped
+
+    created, updated, skipped = run_in_chunks(df, write_chunk, import_file)
     return f"Courses imported successfully: {created} created, {updated} updated, {skipped} skipped (invalid program)."
 
 
-@transaction.atomic
-def ingest_enrollments(file_path, user):
-    df = load_dataframe(file_path)
-    created, skipped, updated = 0, 0, 0
-
-    for _, row in df.iterrows():
-        acronym = str(row["institute_acronym"]).strip()
-        institute = get_institute_by_acronym(acronym, user)
-        if not institute:
-            skipped += 1
-            continue
-
-        try:
-            student = Student.objects.get(student_id=row["student_id"].strip())
-            program = Program.objects.get(program_id=row["program_id"].strip())
-        except (Student.DoesNotExist, Program.DoesNotExist):
-            skipped += 1
-            continue
-
-        defaults = {
-            "student": student,
-            "program": program,
-            "institute": institute,
-            "academic_year": row["academic_year"].strip(),
-            "status": row["status"].strip(),
-        }
-        enrollment, created_flag = Enrollment.objects.update_or_create(
-            enrollment_id=row["enrollment_id"].strip(), defaults=defaults
+def ingest_enrollments(file_path, user, import_file=None, sheet=None):
+    df = load_dataframe(file_path, "enrollments", sheet)
+    institutes = get_institutes_by_acronym(user)
+    academic_year = academic_year_resolver()
+
+    def write_chunk(chunk):
+        student_ids = existing_keys(
+            Student, [row["student_id"].strip() for _, row in chunk.iterrows()]
         )
-        if created_flag:
-            created += 1
-        else:
-            updated += 1
+        program_ids = existing_keys(
+            Program, [row["program_id"].strip() for _, row in chunk.iterrows()]
+        )
+
+        enrollments, skipped = [], 0
+        for _, row in chunk.iterrows():
+            institute = institutes.get(str(row["institute_acronym"]).strip())
+            student_id = row["student_id"].strip()
+            program_id = row["program_id"].strip()
+            academic_year_id = academic_year(row["academic_year"])
+            if (
+                not institute
+                or student_id not in student_ids
+                or program_id not in program_ids
+                or not academic_year_id
+            ):
+                skipped += 1
+                continue
+
+            enrollments.append(
+                Enrollment(
+                    enrollment_id=row["enrollment_id"].strip(),
+                    student_id=student_id,
+                    program_id=program_id,
+                    institute=institute,
+                    academic_year_id=academic_year_id,
+                    status=row["status"].strip(),
+                )
+            )
+        created, updated = upsert(
+            Enrollment,
+            enrollments,
+            ["student", "program", "institute", "academic_year", "status"],
+        )
+        return created, updated, skipped
+
+    created, updated, skipped = run_in_chunks(df, write_chunk, import_file)
     return f"Enrollments imported successfully: {created} created, {updated} updated, {skipped} skipped."
 
 
-@transaction.atomic
-def ingest_results(file_path, user):
-    df = load_dataframe(file_path)
-    created, skipped = 0, 0
-
-    for _, row in df.iterrows():
-        acronym = str(row["institute_acronym"]).strip()
-        institute = get_institute_by_acronym(acronym, user)
-        if not institute:
-            skipped += 1
-            continue
-
-        try:
-            student = Student.objects.get(student_id=row["student_id"].strip())
-            course = Course.objects.get(course_id=row["course_id"].strip())
-            enrollment = Enrollment.objects.filter(
-                student=student, institute=institute
-            ).first()
-        except (Student.DoesNotExist, Course.DoesNotExist):
-            skipped += 1
-            continue
-
-        if not enrollment:
-            skipped += 1
-            continue
-
-        defaults = {
-            "enrollment": enrollment,
-            "course": course,
-            "academic_year": row["academic_year"].strip(),
-            "session": row["session"].strip(),
-            "note": float(row["note"]),
-        }
-        Result.objects.update_or_create(
-            result_id=row["result_id"].strip(), defaults=defaults
+def ingest_results(file_path, user, import_file=None, sheet=None):
+    df = load_dataframe(file_path, "results", sheet)
+    institutes = get_institutes_by_acronym(user)
+    academic_year = academic_year_resolver()
+    # Courses whose statistics the import changes
+    affected = set()
+
+    def write_chunk(chunk):
+        course_ids = existing_keys(
+            Course, [row["course_id"].strip() for _, row in chunk.iterrows()]
+        )
+        enrollments = first_enrollments(
+            [row["student_id"].strip() for _, row in chunk.iterrows()],
+            institutes.values(),
+        )
+
+        results, skipped = [], 0
+        for _, row in chunk.iterrows():
+            institute = institutes.get(str(row["institute_acronym"]).strip())
+            course_id = row["course_id"].strip()
+            enrollment_id = institute and enrollments.get(
+                (row["student_id"].strip(), institute.pk)
+            )
+            academic_year_id = academic_year(row["academic_year"])
+            if not enrollment_id or course_id not in course_ids or not academic_year_id:
+                skipped += 1
+                continue
+
+            results.append(
+                Result(
+                    result_id=row["result_id"].strip(),
+                    enrollment_id=enrollment_id,
+                    course_id=course_id,
+                    academic_year_id=academic_year_id,
+                    session=row["session"].strip(),
+                    note=float(row["note"]),
+                )
+            )
+        # An updated result may have moved away from its previous course
+        affected.update(
+            Result.objects.filter(pk__in=[result.pk for result in results])
+            .values_list("course_id", flat=True)
+            .distinct()
         )
-        created += 1
+        affected.update(result.course_id for result in results)
+        created, updated = upsert(
+            Result,
+            results,
+            ["enrollment", "course", "academic_year", "session", "note"],
+        )
+        return created + updated, 0, skipped
+
+    try:
+        created, _, skipped = run_in_chunks(df, write_chunk, import_file)
+    finally:
+        # Including after a failure, which may have committed some chunks
+        refresh_course_statistics(affected)
     return f"Results imported successfully: {created} created, {skipped} skipped."
 
 
-@transaction.atomic
-def ingest_degrees(file_path, user):
-    df = load_dataframe(file_path)
-    created, skipped = 0, 0
-
-    for _, row in df.iterrows():
-        acronym = str(row["institute_acronym"]).strip()
-        institute = get_institute_by_acronym(acronym, user)
-        if not institute:
-            skipped += 1
-            continue
-
-        try:
-            student = Student.objects.get(student_id=row["student_id"].strip())
-            enrollment = Enrollment.objects.filter(
-                student=student, institute=institute
-            ).first()
-        except Student.DoesNotExist:
-            skipped += 1
-            continue
-
-        if not enrollment:
-            skipped += 1
-            continue
-
-        defaults = {
-            "enrollment": enrollment,
-            "date_awarded": row["date_awarded (YYYY-MM-DD)"],
-            "degree_type": row["degree_type"].strip(),
-            "name": row["name"].strip(),
-        }
-        Degree.objects.update_or_create(
-            degree_id=row["degree_id"].strip(), defaults=defaults
+def ingest_degrees(file_path, user, import_file=None, sheet=None):
+    df = load_dataframe(file_path, "degrees", sheet)
+    institutes = get_institutes_by_acronym(user)
+
+    def write_chunk(chunk):
+        enrollments = first_enrollments(
+            [row["student_id"].strip() for _, row in chunk.iterrows()],
+            institutes.values(),
         )
-        created += 1
+
+        degrees, skipped = [], 0
+        for _, row in chunk.iterrows():
+            institute = institutes.get(str(row["institute_acronym"]).strip())
+            enrollment_id = institute and enrollments.get(
+                (row["student_id"].strip(), institute.pk)
+            )
+            if not enrollment_id:
+                skipped += 1
+                continue
+
+            degrees.append(
+                Degree(
+                    degree_id=row["degree_id"].strip(),
+                    enrollment_id=enrollment_id,
+                    date_awarded=row["date_awarded (YYYY-MM-DD)"],
+                    degree_type=row["degree_type"].strip(),
+                    name=row["name"].strip(),
+                )
+            )
+        created, updated = upsert(
+            Degree, degrees, ["enrollment", "date_awarded", "degree_type", "name"]
+        )
+        return created + updated, 0, skipped
+
+    created, _, skipped = run_in_chunks(df, write_chunk, import_file)
     return f"Degrees imported successfully: {created} created, {skipped} skipped."
@@ -0,0 +1,312 @@
+import codecs
+import csv
+from importlib.util import find_spec
+
+# Bytes of a CSV file read to sniff its encoding, delimiter and header
+SNIFF_BYTES = 64 * 1024
+
+# Delimiters used by the registrar tools we receive exports from
+DELIMITERS = ",;\t|"
+
+BOMS = [
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+]
+
+# Columns each file type must provide, keyed by ImportFile.file_type
+REQUIRED_COLUMNS = {
+    "students": [
+        "student_id",
+        "first_name",
+        "last_name",
+        "gender (M/F)",
+        "birthdate (YYYY-MM-DD)",
+    ],
+    "teachers": [
+        "teacher_id",
+        "first_name",
+        "last_name",
+        "grade",
+        "status",
+        "institute_acronym",
+    ],
+    "programs": ["program_id", "name", "domain", "level", "institute_acronym"],
+    "courses": [
+        "course_id",
+        "code",
+        "name",
+        "credits",
+        "semester",
+        "program_id",
+        "teacher_id (optional)",
+    ],
+    "enrollments": [
+        "enrollment_id",
+        "student_id",
+        "program_id",
+        "institute_acronym",
+        "academic_year",
+        "status",
+    ],
+    "results": [
+        "result_id",
+        "student_id",
+        "institute_acronym",
+        "course_id",
+        "academic_year",
+        "session",
+        "note",
+    ],
+    "degrees": [
+        "degree_id",
+        "student_id",
+        "institute_acronym",
+        "date_awarded (YYYY-MM-DD)",
+        "degree_type",
+        "name",
+    ],
+}
+
+# Type of the columns of each file type that are not plain text:
+# - "category": few distinct values repeated over many rows, stored once;
+# - "integer" / "number": nullable numbers, NA where missing or invalid;
+# - "date": YYYY-MM-DD dates as datetime64, NaT where missing or invalid.
+COLUMN_TYPES = {
+    "students": {
+        "gender (M/F)": "category",
+        "birthdate (YYYY-MM-DD)": "date",
+    },
+    "teachers": {
+        "grade": "category",
+        "status": "category",
+        "institute_acronym": "category",
+    },
+    "programs": {
+        "domain": "category",
+        "level": "category",
+        "institute_acronym": "category",
+    },
+    "courses": {
+        "credits": "integer",
+        "semester": "category",
+        "program_id": "category",
+        "teacher_id (optional)": "category",
+    },
+    "enrollments": {
+        "program_id": "category",
+        "institute_acronym": "category",
+        "academic_year": "category",
+        "status": "category",
+    },
+    "results": {
+        "student_id": "category",
+        "institute_acronym": "category",
+        "course_id": "category",
+        "academic_year": "category",
+        "session": "category",
+        "note": "number",
+    },
+    "degrees": {
+        "institute_acronym": "category",
+        "date_awarded (YYYY-MM-DD)": "date",
+        "degree_type": "category",
+        "name": "category",
+    },
+}
+
+# Columns identifying a row of each file type: the primary key first, then
+# the natural keys under which two rows would describe the same record
+UNIQUE_COLUMNS = {
+    "students": [["student_id"]],
+    "teachers": [["teacher_id"]],
+    "programs": [["program_id"]],
+    "courses": [["course_id"], ["program_id", "code"]],
+    "enrollments": [
+        ["enrollment_id"],
+        ["student_id", "program_id", "academic_year"],
+    ],
+    "results": [
+        ["result_id"],
+        ["student_id", "course_id", "academic_year", "session"],
+    ],
+    "degrees": [["degree_id"], ["student_id", "institute_acronym"]],
+}
+
+
+def excel_engine():
+    """
+    The calamine reader (Rust, via python-calamine) parses .xlsx files many
+    times faster than openpyxl; use it when installed.
+    """
+    return "calamine" if find_spec("python_calamine") else "openpyxl"
+
+
+def sniff_encoding(prefix):
+    """
+    Guess the encoding of a file from its first bytes: a BOM if there is
+    one, else UTF-8 if the bytes decode as such, else Windows-1252 (the
+    Latin-1 superset spreadsheet software writes).
+    """
+    for bom, encoding in BOMS:
+        if prefix.startswith(bom):
+            return encoding
+    try:
+        prefix.decode("utf-8")
+    except UnicodeDecodeError as e:
+        # A multi-byte character cut at the end of the prefix is still UTF-8
+        if e.start < len(prefix) - 3 or e.reason != "unexpected end of data":
+            return "cp1252"
+    return "utf-8"
+
+
+def sniff_delimiter(text):
+    """Guess the delimiter of CSV ``text``, a comma if nothing stands out."""
+    try:
+        return csv.Sniffer().sniff(text, delimiters=DELIMITERS).delimiter
+    except csv.Error:
+        header = text.partition("\n")[0]
+        counts = {delimiter: header.count(delimiter) for delimiter in DELIMITERS}
+        delimiter = max(counts, key=counts.get)
+        return delimiter if counts[delimiter] else ","
+
+
+def sniff_csv(prefix):
+    """
+    Return (encoding, delimiter, header columns) of a CSV file from its
+    first bytes ``prefix``.
+    """
+    encoding = sniff_encoding(prefix)
+    text = prefix.decode(encoding, errors="replace").lstrip("\ufeff")
+    # Sniff complete lines only: the last one may be cut by the prefix
+    lines = text.splitlines()[:-1] or text.splitlines()
+    delimiter = sniff_delimiter("\n".join(lines))
+    header = next(csv.reader(lines[:1], delimiter=delimiter), [])
+    return encoding, delimiter, header
+
+
+def read_csv(file_path, columns, categories=()):
+    """
+    Read the ``columns`` of a CSV file as strings, empty cells as "", after
+    sniffing its encoding and delimiter. Columns in ``categories`` are read
+    straight into categoricals. The multithreaded pyarrow parser is
+    used when installed; pandas' C parser is the fallback, also for files
+    pyarrow rejects (e.g. rows with a stray extra field).
+    """
+    import pandas as pd
+
+    with open(file_path, "rb") as f:
+        encoding, delimiter, header = sniff_csv(f.read(SNIFF_BYTES))
+    usecols = [column for column in header if column in columns]
+
+    try:
+        import pyarrow as pa
+        from pyarrow import csv as pa_csv
+    except ImportError:
+        pa = None
+
+    if pa is not None:
+        try:
+            table = pa_csv.read_csv(
+                file_path,
+                # pyarrow skips a UTF-8 BOM by itself
+                read_options=pa_csv.ReadOptions(
+                    encoding="utf8" if encoding == "utf-8-sig" else encoding
+                ),
+                parse_options=pa_csv.ParseOptions(delimiter=delimiter),
+                convert_options=pa_csv.ConvertOptions(
+                    include_columns=usecols,
+                    column_types={
+                        column: (
+                            pa.dictionary(pa.int32(), pa.string())
+                            if column in categories
+                            else pa.string()
+                        )
+                        for column in usecols
+                    },
+                    strings_can_be_null=False,
+                ),
+            )
+            return table.to_pandas()
+        except pa.ArrowInvalid:
+            pass
+
+    return pd.read_csv(
+        file_path,
+        sep=delimiter,
+        encoding=encoding,
+        usecols=usecols,
+        dtype={
+            column: "category" if column in categories else str for column in usecols
+        },
+        keep_default_na=False,
+    )
+
+
+def apply_schema(df, file_type):
+    """Convert the columns of ``df`` to their COLUMN_TYPES, in place."""
+    import pandas as pd
+
+    for column, kind in COLUMN_TYPES[file_type].items():
+        if column not in df:
+            continue
+        values = df[column]
+        if kind == "category":
+            if not isinstance(values.dtype, pd.CategoricalDtype):
+                df[column] = values.astype("category")
+        elif kind == "date":
+            df[column] = pd.to_datetime(values, format="%Y-%m-%d", errors="coerce")
+        else:
+            numbers = pd.to_numeric(values, errors="coerce")
+            if kind == "integer":
+                df[column] = numbers.where(numbers % 1 == 0).astype("Int64")
+            else:
+                df[column] = numbers.astype("Float64")
+    return df
+
+
+def load_dataframe(file_path, file_type, sheet=None):
+    """
+    Load a CSV or Excel import file of ``file_type`` into a pandas DataFrame
+    typed after COLUMN_TYPES, other cells as text (numbers included) with
+    empty cells as "".
+    Only the columns required for ``file_type`` are read; missing ones are
+    left for the validators to report, as are rows sharing a key with
+    different values; exact duplicate rows are dropped. ``sheet`` picks the
+    Excel worksheet by name, the first one by default.
+
+    pandas is imported here rather than at module level, so that only an
+    import actually reading a file pays for loading it.
+    """
+    import pandas as pd
+
+    columns = set(REQUIRED_COLUMNS[file_type])
+
+    if file_path.endswith(".csv"):
+        categories = {
+            column
+            for column, kind in COLUMN_TYPES[file_type].items()
+            if kind == "category"
+        }
+        df = read_csv(file_path, columns, categories)
+    else:
+        # Ids and other text typed as numbers in the sheet are read as text,
+        # like in CSV files; numbers and dates are left to apply_schema()
+        typed = {
+            column
+            for column, kind in COLUMN_TYPES[file_type].items()
+            if kind != "category"
+        }
+        # Without NA filtering empty cells are read as "" straight away,
+        # sparing a fillna() copy of every column
+        df = pd.read_excel(
+            file_path,
+            sheet_name=sheet or 0,
+            usecols=lambda column: column in columns,
+            dtype={column: str for column in columns - typed},
+            engine=excel_engine(),
+            na_filter=False,
+        )
+    # A row repeated verbatim is written once; rows keep their file index,
+    # so validators still report the right row numbers
+    return apply_schema(df, file_type).drop_duplicates()
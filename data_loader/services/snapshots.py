@@ -0,0 +1,417 @@
+import hashlib
+import io
+import json
+import os
+import tempfile
+import zipfile
+from itertools import islice
+
+from django.apps import apps
+from django.core.management.color import no_style
+from django.db import connection, connections, router
+from django.db.models import Case, F, Q, When
+
+from core.caching import bump_data_version
+from core.models import (
+    AcademicYear,
+    ChangeLog,
+    Course,
+    Degree,
+    Enrollment,
+    Institute,
+    Institution,
+    Program,
+    Result,
+    Student,
+    Teacher,
+    TrackedModel,
+)
+from core.routers import use_replica
+from core.services.course_statistics import refresh_course_statistics
+from core.services.partitioning import conflict_target, moved_rows_delete
+from core.timeouts import import_transaction
+from data_loader.services.bulk_load import copy_rows
+
+# Bumped whenever the archive layout changes; restore refuses other versions
+FORMAT_VERSION = 1
+
+MANIFEST = "manifest.json"
+
+# Rows fetched, converted and written at a time
+BATCH_SIZE = 10000
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def snapshot_querysets(institution):
+    """
+    (model, queryset, columns) triples selecting every core row reachable
+    from ``institution``, parents before children so that a restore in
+    this order satisfies every foreign key. ``columns`` maps the attnames
+    of some fields to the expression exported in their place.
+
+    Links to another institution's rows are not followed, so that a
+    snapshot restores into an empty database: enrollments in its programs,
+    with their results and degrees, and results of its courses are left
+    out (see left_out()), and courses taught by its teachers are exported
+    without teacher.
+    """
+    enrollments = Enrollment.objects.filter(
+        institute__institution=institution,
+        program__institute__institution=institution,
+    )
+    results = Result.objects.filter(
+        enrollment__in=enrollments,
+        course__program__institute__institution=institution,
+    )
+    teachers = Teacher.objects.filter(institute__institution=institution)
+    return [
+        (Institution, Institution.objects.filter(pk=institution.pk), {}),
+        (Institute, Institute.objects.filter(institution=institution), {}),
+        (
+            AcademicYear,
+            AcademicYear.objects.filter(
+                Q(pk__in=enrollments.values("academic_year"))
+                | Q(pk__in=results.values("academic_year"))
+            ),
+            {},
+        ),
+        (Student, Student.objects.filter(pk__in=enrollments.values("student")), {}),
+        (Teacher, teachers, {}),
+        (Program, Program.objects.filter(institute__institution=institution), {}),
+        (
+            Course,
+            Course.objects.filter(program__institute__institution=institution),
+            {"teacher_id": Case(When(teacher__in=teachers, then=F("teacher_id")))},
+        ),
+        (Enrollment, enrollments, {}),
+        (Result, results, {}),
+        (Degree, Degree.objects.filter(enrollment__in=enrollments), {}),
+    ]
+
+
+def left_out(institution):
+    """
+    Rows of ``institution`` linking to another institution's rows, which
+    its snapshots leave out or export without the link, counted per kind.
+    """
+    exported = {
+        model: queryset for model, queryset, _ in snapshot_querysets(institution)
+    }
+    reachable = {
+        Enrollment: Enrollment.objects.filter(institute__institution=institution),
+        Result: Result.objects.filter(enrollment__institute__institution=institution),
+        Degree: Degree.objects.filter(enrollment__institute__institution=institution),
+    }
+    counts = {
+        model._meta.label: queryset.exclude(pk__in=exported[model].values("pk")).count()
+        for model, queryset in reachable.items()
+    }
+    counts["core.Course.teacher"] = (
+        exported[Course]
+        .filter(teacher__isnull=False)
+        .exclude(teacher__institute__institution=institution)
+        .count()
+    )
+    return counts
+
+
+def arrow_type(field):
+    """The Arrow type holding the values of a model ``field``."""
+    import pyarrow as pa
+
+    if field.is_relation:
+        field = field.target_field
+    internal_type = field.get_internal_type()
+    if internal_type == "DecimalField":
+        return pa.decimal128(field.max_digits, field.decimal_places)
+    if internal_type == "DateTimeField":
+        return pa.timestamp("us", tz="UTC")
+    if internal_type == "DateField":
+        return pa.date32()
+    if internal_type == "BooleanField":
+        return pa.bool_()
+    if internal_type == "FloatField":
+        return pa.float64()
+    if internal_type.endswith(("IntegerField", "AutoField")):
+        return pa.int64()
+    return pa.string()
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def export_table(model, queryset, path, batch_size=BATCH_SIZE, columns=None):
+    """
+    Stream the rows of ``queryset`` into a zstd-compressed Parquet file,
+    one row group per batch, and return the number of rows written.
+    ``columns`` maps attnames to the expressions exported in their place.
+    """
+    columns = columns or {}
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    fields = model._meta.concrete_fields
+    schema = pa.schema([(field.attname, arrow_type(field)) for field in fields])
+    rows = (
+        queryset.order_by("pk")
+        .values_list(*(columns.get(field.attname, field.attname) for field in fields))
+        .iterator(chunk_size=batch_size)
+    )
+
+    count = 0
+    with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+        for batch in batches(rows, batch_size):
+            columns = zip(*batch)
+            writer.write_batch(
+                pa.record_batch(
+                    [
+                        pa.array(values, type=column.type)
+                        for values, column in zip(columns, schema)
+                    ],
+                    schema=schema,
+                )
+            )
+            count += len(batch)
+    return count
+
+
+def export_snapshot(institution, archive_path, batch_size=BATCH_SIZE):
+    """
+    Write the rows reachable from ``institution`` to a ZIP archive holding
+    one Parquet file per table and a manifest of their row counts and
+    SHA-256 checksums, and of the rows left out (see snapshot_querysets()),
+    reading from the replica when available. Returns the manifest.
+    """
+    manifest = {
+        "format": FORMAT_VERSION,
+        "institution": institution.acronym,
+        "tables": [],
+    }
+    with tempfile.TemporaryDirectory() as directory, use_replica():
+        manifest["left_out"] = left_out(institution)
+        for model, queryset, columns in snapshot_querysets(institution):
+            name = f"{model._meta.db_table}.parquet"
+            path = os.path.join(directory, name)
+            rows = export_table(model, queryset, path, batch_size, columns)
+            manifest["tables"].append(
+                {
+                    "model": model._meta.label,
+                    "file": name,
+                    "rows": rows,
+                    "sha256": sha256(path),
+                }
+            )
+
+        # Parquet pages are already compressed: store them as they are
+        with zipfile.ZipFile(archive_path, "w", zipfile.ZIP_STORED) as archive:
+            archive.writestr(MANIFEST, json.dumps(manifest, indent=2))
+            for table in manifest["tables"]:
+                archive.write(os.path.join(directory, table["file"]), table["file"])
+    return manifest
+
+
+def read_manifest(archive):
+    try:
+        manifest = json.loads(archive.read(MANIFEST))
+    except KeyError:
+        raise SnapshotError("Not a snapshot archive: no manifest.")
+    if manifest.get("format") != FORMAT_VERSION:
+        raise SnapshotError(
+            f"Unsupported snapshot format {manifest.get('format')!r} "
+            f"(expected {FORMAT_VERSION})."
+        )
+    return manifest
+
+
+def verify_snapshot(archive_path, directory):
+    """
+    Extract the archive into ``directory`` and check every table file
+    against the checksum of the manifest. Returns the manifest.
+    """
+    with zipfile.ZipFile(archive_path) as archive:
+        manifest = read_manifest(archive)
+        for table in manifest["tables"]:
+            path = archive.extract(table["file"], directory)
+            if sha256(path) != table["sha256"]:
+                raise SnapshotError(f"Checksum mismatch for {table['file']}.")
+    return manifest
+
+
+def check_ids_free(manifest, directory):
+    """
+    Institutions and institutes have serial ids, which may already belong
+    to other data in the target database: refuse to overwrite it.
+    """
+    import pyarrow.parquet as pq
+
+    tables = {table["model"]: table["file"] for table in manifest["tables"]}
+    institution_id = pq.read_table(
+        os.path.join(directory, tables[Institution._meta.label]), columns=["id"]
+    )["id"][0].as_py()
+    institute_ids = pq.read_table(
+        os.path.join(directory, tables[Institute._meta.label]), columns=["id"]
+    )["id"].to_pylist()
+
+    taken = (
+        Institution.objects.filter(
+            Q(pk=institution_id) | Q(acronym=manifest["institution"])
+        )
+        .exclude(pk=institution_id, acronym=manifest["institution"])
+        .exists()
+        or Institute.objects.filter(pk__in=institute_ids)
+        .exclude(institution_id=institution_id)
+        .exists()
+    )
+    if taken:
+        raise SnapshotError(
+            "The snapshot's institution or institute ids are used by other "
+            "data in this database."
+        )
+
+
+def merge_statement(model, columns, source):
+    """INSERT ... ON CONFLICT DO UPDATE of ``columns`` from ``source`` into ``model``."""
+    quote = connection.ops.quote_name
+    target = conflict_target(model)
+    updates = [column for column in columns if column not in target]
+    action = (
+        "DO UPDATE SET "
+        + ", ".join(f"{quote(column)} = EXCLUDED.{quote(column)}" for column in updates)
+        if updates
+        else "DO NOTHING"
+    )
+    return (
+        f"INSERT INTO {quote(model._meta.db_table)} "
+        f"({', '.join(quote(column) for column in columns)}) {source} "
+        f"ON CONFLICT ({', '.join(quote(column) for column in target)}) {action}"
+    )
+
+
+def restore_batch(model, fields, batch):
+    """
+    Upsert one Arrow record batch of ``model`` rows, keeping their stored
+    timestamps, and log them in the ChangeLog.
+
+    On PostgreSQL the batch is written out as CSV by Arrow and loaded with
+    COPY into a staging table, then merged in one statement: no value goes
+    through Python. Other backends convert the values field by field.
+    """
+    connection = connections[router.db_for_write(model)]
+    quote = connection.ops.quote_name
+    columns = [field.column for field in fields]
+    tracked = issubclass(model, TrackedModel)
+
+    with connection.cursor() as cursor:
+        if connection.vendor != "postgresql":
+            values = [
+                [
+                    field.get_db_prep_save(value, connection)
+                    for value in column.to_pylist()
+                ]
+                for field, column in zip(fields, batch.columns)
+            ]
+            placeholders = ", ".join(["%s"] * len(columns))
+            cursor.executemany(
+                merge_statement(model, columns, f"VALUES ({placeholders})"),
+                list(zip(*values)),
+            )
+            if tracked:
+                ChangeLog.record(model, values[fields.index(model._meta.pk)])
+            return
+
+        from pyarrow import csv as pa_csv
+
+        # Strings are quoted and nulls left empty, as COPY's CSV format expects
+        buffer = io.BytesIO()
+        pa_csv.write_csv(
+            batch, buffer, write_options=pa_csv.WriteOptions(include_header=False)
+        )
+        buffer.seek(0)
+
+        staging = quote(f"{model._meta.db_table}_staging")
+        column_list = ", ".join(quote(column) for column in columns)
+        cursor.execute(
+            f"CREATE TEMPORARY TABLE {staging} "
+            f"(LIKE {quote(model._meta.db_table)} INCLUDING DEFAULTS)"
+        )
+        copy_rows(
+            cursor, f"COPY {staging} ({column_list}) FROM STDIN (FORMAT csv)", buffer
+        )
+        moved = moved_rows_delete(model, staging, connection)
+        if moved:
+            cursor.execute(moved)
+        cursor.execute(
+            merge_statement(model, columns, f"SELECT {column_list} FROM {staging}")
+        )
+        if tracked:
+            cursor.execute(
+                f"INSERT INTO {quote(ChangeLog._meta.db_table)} "
+                f"(model, object_id, action, changed_at) "
+                f"SELECT %s, {quote(model._meta.pk.column)}, %s, now() "
+                f"FROM {staging}",
+                [model._meta.model_name, ChangeLog.UPSERT],
+            )
+        cursor.execute(f"DROP TABLE {staging}")
+
+
+def restore_snapshot(archive_path, batch_size=BATCH_SIZE):
+    """
+    Verify a snapshot archive, then upsert its tables in dependency order in
+    one transaction: rows of the snapshot replace rows with the same keys,
+    other rows are left alone. The statistics of the restored results' courses
+    are then recomputed. Returns the manifest.
+    """
+    import pyarrow.parquet as pq
+
+    with tempfile.TemporaryDirectory() as directory:
+        manifest = verify_snapshot(archive_path, directory)
+        check_ids_free(manifest, directory)
+
+        try:
+            with import_transaction():
+                for table in manifest["tables"]:
+                    model = apps.get_model(table["model"])
+                    parquet = pq.ParquetFile(os.path.join(directory, table["file"]))
+                    fields = [
+                        model._meta.get_field(name)
+                        for name in parquet.schema_arrow.names
+                    ]
+                    restored = 0
+                    for batch in parquet.iter_batches(batch_size=batch_size):
+                        restore_batch(model, fields, batch)
+                        restored += batch.num_rows
+                    if restored != table["rows"]:
+                        raise SnapshotError(
+                            f"{table['file']}: restored {restored} rows, "
+                            f"expected {table['rows']}."
+                        )
+
+                # Explicit ids were inserted: move serial sequences past them
+                with connection.cursor() as cursor:
+                    for sql in connection.ops.sequence_reset_sql(
+                        no_style(), [Institution, Institute]
+                    ):
+                        cursor.execute(sql)
+        finally:
+            bump_data_version()
+
+        tables = {table["model"]: table["file"] for table in manifest["tables"]}
+        course_ids = pq.read_table(
+            os.path.join(directory, tables[Result._meta.label]), columns=["course_id"]
+        )["course_id"]
+        refresh_course_statistics(course_ids.unique().to_pylist())
+    return manifest
@@ -1,22 +1,101 @@
-import pandas as pd
-from core.models import Institute, Program, Course, Student, Teacher
+from core.models import AcademicYear, Institute, Program, Course, Student, Teacher
+from data_loader.services.readers import (
+    REQUIRED_COLUMNS,
+    UNIQUE_COLUMNS,
+    load_dataframe,
+)
 
 
 # -------------
 # Helper utils
 # -------------
-def load_dataframe(file_path):
-    """Load CSV or Excel into a pandas DataFrame"""
-    if file_path.endswith(".csv"):
-        df = pd.read_csv(file_path)
-    else:
-        df = pd.read_excel(file_path)
-    return df.fillna("")  # éviter les NaN
+def check_required_columns(columns, required_cols):
+    """Retourne la liste des colonnes manquantes"""
+    return [col for col in required_cols if col not in columns]
 
 
-def check_required_columns(df, required_cols):
-    """Retourne la liste des colonnes manquantes"""
-    return [col for col in required_cols if col not in df.columns]
+def invalid(column, is_valid):
+    """
+    Boolean mask of the rows of ``column`` whose value fails ``is_valid``.
+    The test runs once per distinct value (category), not once per row.
+    """
+    column = column.astype("category")
+    bad = [
+        code for code, value in enumerate(column.cat.categories) if not is_valid(value)
+    ]
+    return column.cat.codes.isin(bad)
+
+
+def one_of(valid):
+    """Test a value, stripped, for membership in ``valid``."""
+    return lambda value: str(value).strip() in valid
+
+
+def row_errors(df, checks):
+    """
+    Error messages of the rows of ``df`` failing ``checks``, in row order.
+    ``checks`` are (mask, message) pairs, ``message(row)`` describing the
+    error of a row flagged by ``mask``.
+    """
+    errors = []
+    masks = [mask.to_numpy(dtype=bool, na_value=True) for mask, _ in checks]
+    failing = masks[0].copy()
+    for mask in masks[1:]:
+        failing |= mask
+    positions = failing.nonzero()[0]
+    rows = df.iloc[positions].to_dict("records")
+    for position, row in zip(positions, rows):
+        for mask, (_, message) in zip(masks, checks):
+            if mask[position]:
+                errors.append(f"Row {df.index[position] + 2}: {message(row)}")
+    return errors
+
+
+def duplicate_checks(df, file_type):
+    """
+    Checks flagging the rows that repeat the primary key or a natural key
+    (UNIQUE_COLUMNS) of an earlier row with different values. Exact
+    duplicate rows never get here: load_dataframe() drops them.
+    """
+    checks = []
+    for columns in UNIQUE_COLUMNS[file_type]:
+        later = df.duplicated(columns)
+        if not later.any():
+            continue
+        firsts = df[df.duplicated(columns, keep=False) & ~later]
+        first_rows = {
+            key: index + 2
+            for key, index in zip(
+                firsts[columns].itertuples(index=False, name=None), firsts.index
+            )
+        }
+
+        def message(row, columns=columns, first_rows=first_rows):
+            key = tuple(row[column] for column in columns)
+            return (
+                f"Duplicate {', '.join(columns)} "
+                f"'{', '.join(str(value) for value in key)}' "
+                f"(already on row {first_rows[key]} with different values)."
+            )
+
+        checks.append((later, message))
+    return checks
+
+
+def institution_acronyms(user):
+    return set(
+        Institute.objects.filter(institution=user.institution).values_list(
+            "acronym", flat=True
+        )
+    )
+
+
+def is_academic_year(value):
+    try:
+        AcademicYear.parse(value)
+    except ValueError:
+        return False
+    return True
 
 
 # -------------
@@ -24,239 +103,238 @@ def check_required_columns(df, required_cols):
 # -------------
 
 
-def validate_students_file(file_path):
+def validate_students_file(file_path, sheet=None):
     errors = []
-    df = load_dataframe(file_path)
-    required = [
-        "student_id",
-        "first_name",
-        "last_name",
-        "gender (M/F)",
-        "birthdate (YYYY-MM-DD)",
-    ]
+    df = load_dataframe(file_path, "students", sheet)
+    required = REQUIRED_COLUMNS["students"]
 
     # Vérifier colonnes
-    missing = check_required_columns(df, required)
+    missing = check_required_columns(df.columns, required)
     if missing:
         errors.append(f"Missing required columns: {', '.join(missing)}")
         return errors
 
     # Vérification des valeurs
-    for index, row in df.iterrows():
-        sid = str(row["student_id"]).strip()
-        if not sid:
-            errors.append(f"Row {index + 2}: Missing student_id")
-        gender = str(row["gender (M/F)"]).upper().strip()
-        if gender not in ["M", "F"]:
-            errors.append(f"Row {index + 2}: Invalid gender '{gender}' (expected M/F)")
-    return errors
+    gender = "gender (M/F)"
+    birthdate = "birthdate (YYYY-MM-DD)"
+    return row_errors(
+        df,
+        [
+            (
+                df["student_id"].astype(str).str.strip() == "",
+                lambda row: "Missing student_id",
+            ),
+            (
+                invalid(df[gender], lambda v: str(v).upper().strip() in ("M", "F")),
+                lambda row: f"Invalid gender '{str(row[gender]).upper().strip()}' (expected M/F)",
+            ),
+            (
+                df[birthdate].isna(),
+                lambda row: "Missing or invalid birthdate (expected YYYY-MM-DD).",
+            ),
+            *duplicate_checks(df, "students"),
+        ],
+    )
 
 
-def validate_teachers_file(file_path, user):
+def validate_teachers_file(file_path, user, sheet=None):
     errors = []
-    df = load_dataframe(file_path)
-    required = ["first_name", "last_name", "grade", "status", "institute_acronym"]
+    df = load_dataframe(file_path, "teachers", sheet)
+    required = REQUIRED_COLUMNS["teachers"]
 
-    missing = check_required_columns(df, required)
+    missing = check_required_columns(df.columns, required)
     if missing:
         errors.append(f"Missing required columns: {', '.join(missing)}")
         return errors
 
     # Vérification existence des institutes
-    user_institution = user.institution
-    valid_acronyms = set(
-        Institute.objects.filter(institution=user_institution).values_list(
-            "acronym", flat=True
-        )
+    valid_acronyms = institution_acronyms(user)
+    return row_errors(
+        df,
+        [
+            (
+                invalid(df["institute_acronym"], one_of(valid_acronyms)),
+                lambda row: f"Institute '{str(row['institute_acronym']).strip()}' not found for your institution.",
+            ),
+            *duplicate_checks(df, "teachers"),
+        ],
     )
 
-    for index, row in df.iterrows():
-        acronym = str(row["institute_acronym"]).strip()
-        if acronym not in valid_acronyms:
-            errors.append(
-                f"Row {index + 2}: Institute '{acronym}' not found for your institution."
-            )
-    return errors
 
-
-def validate_programs_file(file_path, user):
+def validate_programs_file(file_path, user, sheet=None):
     errors = []
-    df = load_dataframe(file_path)
-    required = ["program_id", "name", "domain", "level", "institute_acronym"]
+    df = load_dataframe(file_path, "programs", sheet)
+    required = REQUIRED_COLUMNS["programs"]
 
-    missing = check_required_columns(df, required)
+    missing = check_required_columns(df.columns, required)
     if missing:
         errors.append(f"Missing required columns: {', '.join(missing)}")
         return errors
 
-    user_institution = user.institution
-    valid_acronyms = set(
-        Institute.objects.filter(institution=user_institution).values_list(
-            "acronym", flat=True
-        )
+    valid_acronyms = institution_acronyms(user)
+    return row_errors(
+        df,
+        [
+            (
+                invalid(df["institute_acronym"], one_of(valid_acronyms)),
+                lambda row: f"Unknown institute acronym '{str(row['institute_acronym']).strip()}' for your institution.",
+            ),
+            *duplicate_checks(df, "programs"),
+        ],
     )
 
-    for index, row in df.iterrows():
-        acronym = str(row["institute_acronym"]).strip()
-        if acronym not in valid_acronyms:
-            errors.append(
-                f"Row {index + 2}: Unknown institute acronym '{acronym}' for your institution."
-            )
-    return errors
 
-
-def validate_courses_file(file_path):
+def validate_courses_file(file_path, sheet=None):
     errors = []
-    df = load_dataframe(file_path)
-    required = [
-        "course_id",
-        "code",
-        "name",
-        "credits",
-        "semester",
-        "program_id",
-        "teacher_id (optional)",
-    ]
+    df = load_dataframe(file_path, "courses", sheet)
+    required = REQUIRED_COLUMNS["courses"]
 
-    missing = check_required_columns(df, required)
+    missing = check_required_columns(df.columns, required)
     if missing:
         errors.append(f"Missing required columns: {', '.join(missing)}")
         return errors
 
     program_ids = set(Program.objects.values_list("program_id", flat=True))
     teacher_ids = set(Teacher.objects.values_list("teacher_id", flat=True))
-
-    for index, row in df.iterrows():
-        if row["program_id"] not in program_ids:
-            errors.append(
-                f"Row {index + 2}: Program '{row['program_id']}' does not exist."
-            )
-        teacher = str(row["teacher_id (optional)"]).strip()
-        if teacher and teacher not in teacher_ids:
-            errors.append(f"Row {index + 2}: Teacher '{teacher}' not found.")
-    return errors
+    teacher = "teacher_id (optional)"
+
+    return row_errors(
+        df,
+        [
+            (
+                invalid(df["program_id"], one_of(program_ids)),
+                lambda row: f"Program '{row['program_id']}' does not exist.",
+            ),
+            (
+                invalid(df[teacher], one_of(teacher_ids | {""})),
+                lambda row: f"Teacher '{str(row[teacher]).strip()}' not found.",
+            ),
+            (
+                df["credits"].isna() | (df["credits"] < 0),
+                lambda row: "Invalid credits (must be a positive whole number).",
+            ),
+            *duplicate_checks(df, "courses"),
+        ],
+    )
 
 
-def validate_enrollments_file(file_path, user):
+def validate_enrollments_file(file_path, user, sheet=None):
     errors = []
-    df = load_dataframe(file_path)
-    required = [
-        "enrollment_id",
-        "student_id",
-        "program_id",
-        "institute_acronym",
-        "academic_year",
-        "status",
-    ]
+    df = load_dataframe(file_path, "enrollments", sheet)
+    required = REQUIRED_COLUMNS["enrollments"]
 
-    missing = check_required_columns(df, required)
+    missing = check_required_columns(df.columns, required)
     if missing:
         errors.append(f"Missing required columns: {', '.join(missing)}")
         return errors
 
-    user_institution = user.institution
-    valid_acronyms = set(
-        Institute.objects.filter(institution=user_institution).values_list(
-            "acronym", flat=True
-        )
-    )
+    valid_acronyms = institution_acronyms(user)
     student_ids = set(Student.objects.values_list("student_id", flat=True))
     program_ids = set(Program.objects.values_list("program_id", flat=True))
 
-    for index, row in df.iterrows():
-        acronym = str(row["institute_acronym"]).strip()
-        if acronym not in valid_acronyms:
-            errors.append(
-                f"Row {index + 2}: Institute '{acronym}' not valid for your institution."
-            )
-        if row["student_id"] not in student_ids:
-            errors.append(
-                f"Row {index + 2}: Student '{row['student_id']}' does not exist."
-            )
-        if row["program_id"] not in program_ids:
-            errors.append(f"Row {index + 2}: Program '{row['program_id']}' not found.")
-    return errors
+    return row_errors(
+        df,
+        [
+            (
+                invalid(df["institute_acronym"], one_of(valid_acronyms)),
+                lambda row: f"Institute '{str(row['institute_acronym']).strip()}' not valid for your institution.",
+            ),
+            (
+                invalid(df["student_id"], one_of(student_ids)),
+                lambda row: f"Student '{row['student_id']}' does not exist.",
+            ),
+            (
+                invalid(df["program_id"], one_of(program_ids)),
+                lambda row: f"Program '{row['program_id']}' not found.",
+            ),
+            (
+                invalid(
+                    df["academic_year"], lambda v: is_academic_year(str(v).strip())
+                ),
+                lambda row: f"Invalid academic year '{str(row['academic_year']).strip()}' (expected e.g. 2024-2025).",
+            ),
+            *duplicate_checks(df, "enrollments"),
+        ],
+    )
 
 
-def validate_results_file(file_path, user):
+def validate_results_file(file_path, user, sheet=None):
     errors = []
-    df = load_dataframe(file_path)
-    required = [
-        "result_id",
-        "student_id",
-        "institute_acronym",
-        "course_id",
-        "academic_year",
-        "session",
-        "note",
-    ]
+    df = load_dataframe(file_path, "results", sheet)
+    required = REQUIRED_COLUMNS["results"]
 
-    missing = check_required_columns(df, required)
+    missing = check_required_columns(df.columns, required)
     if missing:
         errors.append(f"Missing required columns: {', '.join(missing)}")
         return errors
 
-    user_institution = user.institution
-    valid_acronyms = set(
-        Institute.objects.filter(institution=user_institution).values_list(
-            "acronym", flat=True
-        )
-    )
+    valid_acronyms = institution_acronyms(user)
     student_ids = set(Student.objects.values_list("student_id", flat=True))
     course_ids = set(Course.objects.values_list("course_id", flat=True))
-
-    for index, row in df.iterrows():
-        if row["student_id"] not in student_ids:
-            errors.append(f"Row {index + 2}: Unknown student '{row['student_id']}'")
-        acronym = str(row["institute_acronym"]).strip()
-        if acronym not in valid_acronyms:
-            errors.append(f"Row {index + 2}: Invalid institute acronym '{acronym}'")
-        if row["course_id"] not in course_ids:
-            errors.append(f"Row {index + 2}: Course '{row['course_id']}' not found.")
-        try:
-            note = float(row["note"])
-            if not (0 <= note <= 20):
-                errors.append(
-                    f"Row {index + 2}: Invalid note '{note}' (should be between 0 and 20)."
-                )
-        except Exception:
-            errors.append(
-                f"Row {index + 2}: Invalid note value '{row['note']}' (must be numeric)."
-            )
-    return errors
+    note = df["note"]
+
+    return row_errors(
+        df,
+        [
+            (
+                invalid(df["student_id"], one_of(student_ids)),
+                lambda row: f"Unknown student '{row['student_id']}'",
+            ),
+            (
+                invalid(df["institute_acronym"], one_of(valid_acronyms)),
+                lambda row: f"Invalid institute acronym '{str(row['institute_acronym']).strip()}'",
+            ),
+            (
+                invalid(df["course_id"], one_of(course_ids)),
+                lambda row: f"Course '{row['course_id']}' not found.",
+            ),
+            (
+                invalid(
+                    df["academic_year"], lambda v: is_academic_year(str(v).strip())
+                ),
+                lambda row: f"Invalid academic year '{str(row['academic_year']).strip()}' (expected e.g. 2024-2025).",
+            ),
+            (
+                note.isna(),
+                lambda row: "Missing or invalid note (must be numeric).",
+            ),
+            (
+                ((note < 0) | (note > 20)).fillna(False),
+                lambda row: f"Invalid note '{row['note']}' (should be between 0 and 20).",
+            ),
+            *duplicate_checks(df, "results"),
+        ],
+    )
 
 
-def validate_degrees_file(file_path, user):
+def validate_degrees_file(file_path, user, sheet=None):
     errors = []
-    df = load_dataframe(file_path)
-    required = [
-        "degree_id",
-        "student_id",
-        "institute_acronym",
-        "date_awarded (YYYY-MM-DD)",
-        "degree_type",
-        "name",
-    ]
+    df = load_dataframe(file_path, "degrees", sheet)
+    required = REQUIRED_COLUMNS["degrees"]
 
-    missing = check_required_columns(df, required)
+    missing = check_required_columns(df.columns, required)
     if missing:
         errors.append(f"Missing required columns: {', '.join(missing)}")
         return errors
 
-    user_institution = user.institution
-    valid_acronyms = set(
-        Institute.objects.filter(institution=user_institution).values_list(
-            "acronym", flat=True
-        )
-    )
+    valid_acronyms = institution_acronyms(user)
     student_ids = set(Student.objects.values_list("student_id", flat=True))
 
-    for index, row in df.iterrows():
-        acronym = str(row["institute_acronym"]).strip()
-        if acronym not in valid_acronyms:
-            errors.append(
-                f"Row {index + 2}: Institute '{acronym}' not recognized for your institution."
-            )
-        if row["student_id"] not in student_ids:
-            errors.append(f"Row {index + 2}: Student '{row['student_id']}' not found.")
-    return errors
+    return row_errors(
+        df,
+        [
+            (
+                invalid(df["institute_acronym"], one_of(valid_acronyms)),
+                lambda row: f"Institute '{str(row['institute_acronym']).strip()}' not recognized for your institution.",
+            ),
+            (
+                invalid(df["student_id"], one_of(student_ids)),
+                lambda row: f"Student '{row['student_id']}' not found.",
+            ),
+            (
+                df["date_awarded (YYYY-MM-DD)"].isna(),
+                lambda row: "Missing or invalid date_awarded (expected YYYY-MM-DD).",
+            ),
+            *duplicate_checks(df, "degrees"),
+        ],
+    )
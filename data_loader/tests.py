@@ -1,3 +1,500 @@
-from django.test import TestCase
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from unittest import mock
 
-# Create your tests here.
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.models import (
+    AcademicYear,
+    Course,
+    CourseStatistics,
+    Degree,
+    Enrollment,
+    Institute,
+    Institution,
+    Result,
+    Student,
+)
+from core.services.course_statistics import refresh_course_statistics
+from core.tests import MAX_SECONDS, InstitutionTestCase, build_dataset
+from data_loader.models import ImportFile
+from data_loader.services import ingestion, readers, snapshots, validators
+
+# Header and row of each file type, formatted with the index ``i`` of the
+# fixture rows it refers to and a ``run`` prefix for the ids it creates.
+FILES = {
+    "students": (
+        "student_id,first_name,last_name,gender (M/F),birthdate (YYYY-MM-DD)",
+        "N{run}{i},First{i},Last{i},F,2001-02-03",
+    ),
+    "teachers": (
+        "teacher_id,first_name,last_name,grade,status,institute_acronym",
+        "N{run}{i},First{i},Last{i},docteur,permanent,FDS",
+    ),
+    "programs": (
+        "program_id,name,domain,level,institute_acronym",
+        "N{run}{i},Program {i},Sciences,L1,FDS",
+    ),
+    "courses": (
+        "course_id,code,name,credits,semester,program_id,teacher_id (optional)",
+        "N{run}{i},K{i},Course {i},3,S1,P{i},T{i}",
+    ),
+    "enrollments": (
+        "enrollment_id,student_id,program_id,institute_acronym,academic_year,status",
+        "N{run}{i},S{i},P{i},FDS,2024-2025,active",
+    ),
+    "results": (
+        "result_id,student_id,institute_acronym,course_id,academic_year,session,note",
+        "N{run}{i},S{i},FDS,C{i},2024-2025,normal,14.5",
+    ),
+    "degrees": (
+        "degree_id,student_id,institute_acronym,date_awarded (YYYY-MM-DD),degree_type,name",
+        "N{run}{i},S{i},FDS,2025-07-01,licence_fondamentale,Licence",
+    ),
+}
+
+# file type -> (ingestor, validator, takes the user)
+SERVICES = {
+    "students": (ingestion.ingest_students, validators.validate_students_file, False),
+    "teachers": (ingestion.ingest_teachers, validators.validate_teachers_file, True),
+    "programs": (ingestion.ingest_programs, validators.validate_programs_file, True),
+    "courses": (ingestion.ingest_courses, validators.validate_courses_file, False),
+    "enrollments": (
+        ingestion.ingest_enrollments,
+        validators.validate_enrollments_file,
+        True,
+    ),
+    "results": (ingestion.ingest_results, validators.validate_results_file, True),
+    "degrees": (ingestion.ingest_degrees, validators.validate_degrees_file, True),
+}
+
+
+class AcademicYearResolverTests(TestCase):
+    def test_resolve(self):
+        resolve = ingestion.academic_year_resolver()
+        self.assertEqual(resolve("2024-2025"), 2024)
+        self.assertTrue(AcademicYear.objects.filter(pk=2024).exists())
+        for label in ["2024/2025", "2024-2026", ""]:
+            with self.subTest(label=label):
+                self.assertIsNone(resolve(label))
+        # Every label is looked up once
+        with self.assertNumQueries(0):
+            self.assertEqual(resolve("2024-2025"), 2024)
+            self.assertIsNone(resolve("2024/2025"))
+        self.assertEqual(AcademicYear.objects.count(), 1)
+
+
+class ImportQueryCountTests(InstitutionTestCase):
+    """
+    Each ingestor and validator must run a fixed number of queries whatever
+    the file size: a per-row query shows up as a difference between a small
+    and a larger file. Sizes stay within one ingestion chunk and one SQLite
+    insert batch, whose counts legitimately grow with the file. The two files
+    refer to distinct fixture rows, so that each degree goes to a fresh
+    enrollment.
+    """
+
+    SMALL = 3
+    LARGE = 40
+    MAX_QUERIES = 20
+    DATASET_SIZE = SMALL + LARGE
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        # A degree is awarded once per enrollment: leave room for the files'
+        Degree.objects.all().delete()
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write_file(self, file_type, rows, run):
+        header, row = FILES[file_type]
+        path = os.path.join(self.directory, f"{file_type}_{run}.csv")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(header + "\n")
+            for i in rows:
+                f.write(row.format(run=run, i=i) + "\n")
+        return path
+
+    def count_queries(self, func, file_type, rows, run):
+        path = self.write_file(file_type, rows, run)
+        args = (path, self.user) if SERVICES[file_type][2] else (path,)
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            func(*args)
+            elapsed = time.perf_counter() - start
+        self.assertLess(elapsed, MAX_SECONDS)
+        return len(queries)
+
+    def assertConstantQueries(self, func, file_type):
+        small = self.count_queries(func, file_type, range(self.SMALL), "a")
+        large = self.count_queries(
+            func, file_type, range(self.SMALL, self.SMALL + self.LARGE), "b"
+        )
+        self.assertEqual(
+            small,
+            large,
+            f"{func.__name__}: {small} queries for {self.SMALL} rows, "
+            f"{large} for {self.LARGE}",
+        )
+        self.assertLessEqual(large, self.MAX_QUERIES, func.__name__)
+
+    def test_ingestors(self):
+        for file_type, (ingest, _, _) in SERVICES.items():
+            with self.subTest(file_type):
+                self.assertConstantQueries(ingest, file_type)
+
+    def test_validators(self):
+        for file_type, (_, validate, _) in SERVICES.items():
+            with self.subTest(file_type):
+                self.assertConstantQueries(validate, file_type)
+
+
+class CheckpointedImportTests(InstitutionTestCase):
+    # File rows 2-7; row 4 repeats row 3 and is dropped
+    ROWS = ["N0", "N1", "N1", "N2", "N3", "N4"]
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        media_root = override_settings(MEDIA_ROOT=media)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+
+        os.mkdir(os.path.join(media, "imports"))
+        header, row = FILES["students"]
+        with open(os.path.join(media, "imports", "students.csv"), "w") as f:
+            f.write(header + "\n")
+            for student_id in self.ROWS:
+                f.write(row.format(run="", i=student_id[1:]) + "\n")
+        self.import_file = ImportFile.objects.create(
+            file="imports/students.csv",
+            file_type="students",
+            uploaded_by=self.user,
+            checkpointed=True,
+        )
+        # Chunks of two rows
+        chunk_size = mock.patch.object(ingestion, "CHUNK_SIZE", 2)
+        chunk_size.start()
+        self.addCleanup(chunk_size.stop)
+
+    def test_resume_after_failure(self):
+        path = self.import_file.file.path
+        upsert = ingestion.upsert
+        # The second chunk fails
+        failing = [upsert, mock.Mock(side_effect=RuntimeError("Connection lost."))]
+        with mock.patch.object(
+            ingestion, "upsert", side_effect=lambda *args: failing.pop(0)(*args)
+        ):
+            with self.assertRaises(RuntimeError):
+                ingestion.ingest_students(path, self.import_file)
+        self.assertEqual(self.import_file.last_committed_row, 2)
+        self.assertEqual(self.import_file.resume_row, 4)
+        self.assertEqual(
+            sorted(
+                Student.objects.filter(pk__startswith="N").values_list("pk", flat=True)
+            ),
+            ["N0", "N1"],
+        )
+
+        self.import_file.status = "error"
+        self.import_file.save()
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("data_loader:upload"))
+        self.assertContains(response, "Resume from row 4")
+
+        with mock.patch.object(ingestion, "upsert", wraps=upsert) as written:
+            self.client.post(reverse("data_loader:resume", args=[self.import_file.pk]))
+        self.import_file.refresh_from_db()
+        self.assertEqual(self.import_file.status, "validated")
+        self.assertEqual(self.import_file.last_committed_row, 6)
+        self.assertEqual(Student.objects.filter(pk__startswith="N").count(), 5)
+        # Only the rows after the checkpoint were written again
+        self.assertEqual(
+            [
+                [student.pk for student in call.args[1]]
+                for call in written.call_args_list
+            ],
+            [["N2", "N3"], ["N4"]],
+        )
+
+        # Importing the file again changes nothing
+        self.assertEqual(
+            ingestion.ingest_students(path),
+            "Students imported successfully: 0 created, 5 updated.",
+        )
+        self.assertEqual(Student.objects.filter(pk__startswith="N").count(), 5)
+
+
+class ExcelReaderTests(SimpleTestCase):
+    def setUp(self):
+        import pandas as pd
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, "courses.xlsx")
+        header, row = FILES["courses"]
+        frame = pd.DataFrame(
+            [row.format(run="x", i=i).split(",") for i in range(3)],
+            columns=header.split(","),
+        )
+        frame["comment"] = "ignored"
+        frame.loc[0, "teacher_id (optional)"] = None
+        with pd.ExcelWriter(self.path) as writer:
+            frame.head(1).to_excel(writer, sheet_name="Draft", index=False)
+            frame.to_excel(writer, sheet_name="Courses", index=False)
+
+    def test_reads_required_columns_of_selected_sheet(self):
+        df = readers.load_dataframe(self.path, "courses", sheet="Courses")
+        self.assertEqual(len(df), 3)
+        self.assertEqual(
+            sorted(df.columns), sorted(readers.REQUIRED_COLUMNS["courses"])
+        )
+        self.assertEqual(df.loc[0, "teacher_id (optional)"], "")
+
+    def test_first_sheet_by_default(self):
+        self.assertEqual(len(readers.load_dataframe(self.path, "courses")), 1)
+
+    def test_missing_sheet(self):
+        with self.assertRaises(ValueError):
+            readers.load_dataframe(self.path, "courses", sheet="Missing")
+
+
+class ExcelImportTests(InstitutionTestCase):
+    DATASET_SIZE = 1
+
+    def test_numeric_ids_are_read_as_text(self):
+        import pandas as pd
+
+        student = Student.objects.create(
+            student_id="7",
+            first_name="Adélaïde",
+            last_name="Kpogo",
+            gender="F",
+            birthdate="2001-02-03",
+        )
+        Enrollment.objects.create(
+            enrollment_id="E7",
+            student=student,
+            program_id="P0",
+            institute=self.institute,
+            academic_year_id=2024,
+        )
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "results.xlsx")
+        pd.DataFrame(
+            [[100, 7, "FDS", "C0", "2024-2025", "normal", 14.5]],
+            columns=FILES["results"][0].split(","),
+        ).to_excel(path, index=False)
+
+        df = readers.load_dataframe(path, "results")
+        self.assertEqual(df.loc[0, "result_id"], "100")
+        self.assertEqual(df.loc[0, "student_id"], "7")
+        self.assertEqual(df.loc[0, "note"], 14.5)
+        self.assertEqual(validators.validate_results_file(path, self.user), [])
+        self.assertEqual(
+            ingestion.ingest_results(path, self.user),
+            "Results imported successfully: 1 created, 0 skipped.",
+        )
+        self.assertEqual(Result.objects.get(pk="100").enrollment_id, "E7")
+
+
+class CsvReaderTests(SimpleTestCase):
+    HEADER = "student_id;first_name;last_name;gender (M/F);birthdate (YYYY-MM-DD)"
+    ROW = "007;Adélaïde;Kpogo;F;2001-02-03"
+
+    def write(self, content):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "students.csv")
+        with open(path, "wb") as f:
+            f.write(content)
+        return path
+
+    def assertReads(self, content):
+        df = readers.load_dataframe(self.write(content), "students")
+        self.assertEqual(list(df.columns), self.HEADER.split(";"))
+        *text, birthdate = self.ROW.split(";")
+        self.assertEqual(df.iloc[0].tolist()[:-1], text)
+        self.assertEqual(df.iloc[0, -1].strftime("%Y-%m-%d"), birthdate)
+
+    def test_utf8_with_bom(self):
+        self.assertReads(f"{self.HEADER}\n{self.ROW}\n".encode("utf-8-sig"))
+
+    def test_latin1(self):
+        self.assertReads(f"{self.HEADER}\r\n{self.ROW}\r\n".encode("cp1252"))
+
+    def test_sniff_csv(self):
+        prefix = f"{self.HEADER}\n{self.ROW}\n{self.ROW[:4]}".encode("cp1252")
+        encoding, delimiter, header = readers.sniff_csv(prefix)
+        self.assertEqual((encoding, delimiter), ("cp1252", ";"))
+        self.assertEqual(header, self.HEADER.split(";"))
+
+    def test_sniff_encoding_of_truncated_utf8(self):
+        prefix = "Adélaïde".encode("utf-8")[:-1]
+        self.assertEqual(readers.sniff_encoding(prefix), "utf-8")
+
+    def test_schema_types(self):
+        header, row = FILES["results"]
+        content = "\n".join(
+            [header, row.format(run="x", i=1), "Nx2,S2,FDS,C2,2024-2025,normal,"]
+        )
+        df = readers.load_dataframe(self.write(content.encode()), "results")
+        self.assertEqual(df["session"].dtype, "category")
+        self.assertEqual(df["note"].dtype, "Float64")
+        self.assertEqual(df["note"].isna().tolist(), [False, True])
+        self.assertEqual(df["result_id"].tolist(), ["Nx1", "Nx2"])
+
+
+class DuplicateRowTests(InstitutionTestCase):
+    DATASET_SIZE = 2
+
+    def write_results(self, *rows):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "results.csv")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join([FILES["results"][0], *rows]) + "\n")
+        return path
+
+    def test_exact_duplicates_are_written_once(self):
+        row = "N1,S1,FDS,C1,2024-2025,normal,14.5"
+        path = self.write_results(row, "N2,S0,FDS,C0,2024-2025,normal,9", row)
+        self.assertEqual(validators.validate_results_file(path, self.user), [])
+        self.assertEqual(
+            ingestion.ingest_results(path, self.user),
+            "Results imported successfully: 2 created, 0 skipped.",
+        )
+
+    def test_conflicting_duplicates_are_reported(self):
+        path = self.write_results(
+            "N1,S1,FDS,C1,2024-2025,normal,14.5",
+            "N1,S0,FDS,C0,2024-2025,normal,9",
+            "N2,S1,FDS,C1,2024-2025,normal,11",
+        )
+        self.assertEqual(
+            validators.validate_results_file(path, self.user),
+            [
+                "Row 3: Duplicate result_id 'N1' (already on row 2 with different values).",
+                "Row 4: Duplicate student_id, course_id, academic_year, session "
+                "'S1, C1, 2024-2025, normal' (already on row 2 with different values).",
+            ],
+        )
+
+
+class CourseStatisticsRefreshTests(InstitutionTestCase):
+    DATASET_SIZE = 3
+
+    def test_ingest_refreshes_affected_courses(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "results.csv")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(
+                "\n".join(
+                    [
+                        FILES["results"][0],
+                        "N1,S1,FDS,C1,2024-2025,normal,14",
+                        # Moves result R2 from course C2 to C1
+                        "R2,S2,FDS,C1,2024-2025,normal,8",
+                    ]
+                )
+            )
+        refresh_course_statistics()
+        untouched = CourseStatistics.objects.get(course="C0").computed_at
+        ingestion.ingest_results(path, self.user)
+
+        statistics = {
+            statistics.course_id: statistics
+            for statistics in CourseStatistics.objects.all()
+        }
+        self.assertEqual(sorted(statistics), ["C0", "C1"])
+        self.assertEqual(statistics["C0"].computed_at, untouched)
+        self.assertEqual(statistics["C1"].notes, [8, 12, 14])
+
+
+class SnapshotTests(InstitutionTestCase):
+    DATASET_SIZE = 5
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.archive = os.path.join(directory, "ul.zip")
+
+    def test_export_then_restore(self):
+        before = list(Result.objects.order_by("pk").values())
+        manifest = snapshots.export_snapshot(self.institution, self.archive)
+        self.assertEqual(
+            {table["model"]: table["rows"] for table in manifest["tables"]}[
+                "core.Result"
+            ],
+            5,
+        )
+
+        self.institution.delete()
+        self.assertFalse(Result.objects.exists())
+        snapshots.restore_snapshot(self.archive)
+        self.assertEqual(list(Result.objects.order_by("pk").values()), before)
+        self.assertEqual(Degree.objects.count(), 5)
+
+    def test_links_to_other_institutions(self):
+        other = Institution.objects.create(
+            name="Université de Kara", acronym="UK", type="public", city="Kara"
+        )
+        build_dataset(
+            Institute.objects.create(
+                institution=other, name="Faculté des Lettres", acronym="FDL"
+            ),
+            1,
+            offset=5,
+        )
+        # A result on, a course taught by and an enrollment in another
+        # institution's course, teacher and program
+        Result.objects.filter(pk="R0").update(course_id="C5")
+        Course.objects.filter(pk="C1").update(teacher_id="T5")
+        Enrollment.objects.filter(pk="E2").update(program_id="P5")
+
+        manifest = snapshots.export_snapshot(self.institution, self.archive)
+        self.assertEqual(
+            manifest["left_out"],
+            {
+                "core.Enrollment": 1,
+                "core.Result": 2,
+                "core.Degree": 1,
+                "core.Course.teacher": 1,
+            },
+        )
+
+        # Restore into an empty database
+        Institution.objects.all().delete()
+        Student.objects.all().delete()
+        AcademicYear.objects.all().delete()
+        snapshots.restore_snapshot(self.archive)
+        connection.check_constraints()
+        self.assertIsNone(Course.objects.get(pk="C1").teacher_id)
+        self.assertEqual(
+            sorted(Result.objects.values_list("pk", flat=True)), ["R1", "R3", "R4"]
+        )
+        self.assertFalse(Enrollment.objects.filter(pk="E2").exists())
+        self.assertEqual(Degree.objects.count(), 4)
+
+    def test_checksum_mismatch(self):
+        snapshots.export_snapshot(self.institution, self.archive)
+        with zipfile.ZipFile(self.archive) as archive:
+            contents = {name: archive.read(name) for name in archive.namelist()}
+        contents["core_result.parquet"] = contents["core_result.parquet"][:-1]
+        with zipfile.ZipFile(self.archive, "w") as archive:
+            for name, data in contents.items():
+                archive.writestr(name, data)
+
+        with self.assertRaisesMessage(snapshots.SnapshotError, "core_result.parquet"):
+            snapshots.restore_snapshot(self.archive)
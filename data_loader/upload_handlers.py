@@ -0,0 +1,75 @@
+import hashlib
+import os
+
+from django.core.files.uploadhandler import StopUpload, TemporaryFileUploadHandler
+
+from .services.readers import sniff_csv
+from .services.validators import REQUIRED_COLUMNS, check_required_columns
+
+ALLOWED_EXTENSIONS = (".csv", ".xlsx")
+
+# A CSV header row longer than this is treated as malformed.
+MAX_HEADER_BYTES = 64 * 1024
+
+
+class StreamingImportUploadHandler(TemporaryFileUploadHandler):
+    """
+    Stream an import file to a temporary file on disk chunk by chunk while
+    computing its SHA-256, and check the CSV header row against the columns
+    required for ``file_type`` as soon as that row has been received.
+
+    A malformed file stops the upload: ``error`` is set and no further data is
+    read, so the rest of the body is neither buffered nor written.
+    """
+
+    def __init__(self, request, file_type):
+        super().__init__(request)
+        self.required = REQUIRED_COLUMNS[file_type]
+        self.error = None
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        extension = os.path.splitext(self.file_name)[1].lower()
+        if extension not in ALLOWED_EXTENSIONS:
+            self.reject(
+                f"Unsupported file type '{extension}' (expected .csv or .xlsx)."
+            )
+
+        # Excel headers live inside a zip archive that can only be read once
+        # complete, so only CSV files are checked while streaming.
+        self.sniff_header = extension == ".csv"
+        self.header = b""
+        self.sha256 = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.sha256.update(raw_data)
+        if self.sniff_header:
+            self.check_header(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        if self.sniff_header:
+            self.check_header(b"", complete=True)
+        file = super().file_complete(file_size)
+        file.sha256 = self.sha256.hexdigest()
+        return file
+
+    def check_header(self, raw_data, complete=False):
+        self.header += raw_data
+        _, newline, _ = self.header.partition(b"\n")
+        if not (newline or complete) and len(self.header) < MAX_HEADER_BYTES:
+            return
+
+        self.sniff_header = False
+        if not newline and not complete:
+            self.reject("The header row is missing or too long.")
+
+        # Same encoding and delimiter sniffing as the reader used on import
+        _, _, columns = sniff_csv(self.header)
+        missing = check_required_columns(columns, self.required)
+        if missing:
+            self.reject(f"Missing required columns: {', '.join(missing)}")
+
+    def reject(self, message):
+        self.error = message
+        raise StopUpload(connection_reset=True)
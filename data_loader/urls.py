@@ -5,4 +5,10 @@ app_name = "data_loader"
 
 urlpatterns = [
     path("upload/", views.upload_file, name="upload"),
+    path(
+        "upload/<str:file_type>/stream/",
+        views.upload_file_stream,
+        name="upload_stream",
+    ),
+    path("imports/<int:pk>/resume/", views.resume_import, name="resume"),
 ]
@@ -1,32 +1,89 @@
-from django.shortcuts import render, redirect
+from asgiref.sync import sync_to_async
+from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from django.views.decorators.http import require_POST
 
 from .models import ImportFile, ImportLog
 from .services import validators, ingestion
+from .upload_handlers import StreamingImportUploadHandler
 
 # Mapping between file_type and corresponding functions
 VALIDATORS = {
-    "students": lambda f, u: validators.validate_students_file(f),
+    "students": lambda f, u, **kw: validators.validate_students_file(f, **kw),
     "teachers": validators.validate_teachers_file,
     "programs": validators.validate_programs_file,
-    "courses": lambda f, u: validators.validate_courses_file(f),
+    "courses": lambda f, u, **kw: validators.validate_courses_file(f, **kw),
     "enrollments": validators.validate_enrollments_file,
     "results": validators.validate_results_file,
     "degrees": validators.validate_degrees_file,
 }
 
 INGESTORS = {
-    "students": lambda f, u: ingestion.ingest_students(f),
+    "students": lambda f, u, i, **kw: ingestion.ingest_students(f, i, **kw),
     "teachers": ingestion.ingest_teachers,
     "programs": ingestion.ingest_programs,
-    "courses": lambda f, u: ingestion.ingest_courses(f),
+    "courses": lambda f, u, i, **kw: ingestion.ingest_courses(f, i, **kw),
     "enrollments": ingestion.ingest_enrollments,
     "results": ingestion.ingest_results,
     "degrees": ingestion.ingest_degrees,
 }
 
 
+def process_import(request, import_file):
+    """
+    Validate then ingest a registered import file, recording the outcome
+    on the ImportFile, in its logs and as a user message.
+    """
+    file_type = import_file.file_type
+    sheet = import_file.sheet_name or None
+    try:
+        errors = VALIDATORS[file_type](import_file.file.path, request.user, sheet=sheet)
+    except ValueError as e:
+        # Unreadable file, e.g. a worksheet missing from the workbook
+        errors = [str(e)]
+
+    if errors:
+        import_file.status = "error"
+        import_file.save()
+        for e in errors:
+            ImportLog.objects.create(import_file=import_file, message=e, is_error=True)
+
+        # Formatage des erreurs pour affichage
+        error_text = "\n".join([f"- {e}" for e in errors[:5]])
+        if len(errors) > 5:
+            error_text += f"\n...and {len(errors) - 5} more."
+
+        messages.error(
+            request,
+            f"File validation failed with {len(errors)} error(s):\n{error_text}",
+        )
+        return
+
+    try:
+        result_msg = INGESTORS[file_type](
+            import_file.file.path, request.user, import_file, sheet=sheet
+        )
+        import_file.status = "validated"
+        ImportLog.objects.create(
+            import_file=import_file, message="File successfully ingested."
+        )
+        messages.success(request, result_msg)
+    except Exception as e:
+        import_file.status = "error"
+        ImportLog.objects.create(import_file=import_file, message=str(e), is_error=True)
+        error_msg = f"An error occurred during import: {str(e)}"
+        if import_file.checkpointed:
+            error_msg += (
+                f"\nRows committed so far: up to row {import_file.resume_row - 1}"
+                " of the file. You can resume the import from the upload history."
+            )
+        messages.error(request, error_msg)
+    finally:
+        import_file.save()
+
+
 @login_required
 def upload_file(request):
     """
@@ -42,45 +99,13 @@ def upload_file(request):
 
         # Register file in DB
         import_file = ImportFile.objects.create(
-            file=file, file_type=file_type, uploaded_by=request.user
+            file=file,
+            file_type=file_type,
+            uploaded_by=request.user,
+            sheet_name=request.POST.get("sheet_name", "").strip(),
+            checkpointed=bool(request.POST.get("checkpointed")),
         )
-
-        # Validation
-        errors = VALIDATORS[file_type](import_file.file.path, request.user)
-
-        if errors:
-            import_file.status = "error"
-            import_file.save()
-            for e in errors:
-                ImportLog.objects.create(
-                    import_file=import_file, message=e, is_error=True
-                )
-
-            # Formatage des erreurs pour affichage
-            error_text = "\n".join([f"- {e}" for e in errors[:5]])
-            if len(errors) > 5:
-                error_text += f"\n...and {len(errors) - 5} more."
-
-            messages.error(
-                request,
-                f"File validation failed with {len(errors)} error(s):\n{error_text}",
-            )
-        else:
-            try:
-                result_msg = INGESTORS[file_type](import_file.file.path, request.user)
-                import_file.status = "validated"
-                ImportLog.objects.create(
-                    import_file=import_file, message="File successfully ingested."
-                )
-                messages.success(request, result_msg)
-            except Exception as e:
-                import_file.status = "error"
-                ImportLog.objects.create(
-                    import_file=import_file, message=str(e), is_error=True
-                )
-                messages.error(request, f"An error occurred during import: {str(e)}")
-            finally:
-                import_file.save()
+        process_import(request, import_file)
 
         return redirect("data_loader:upload")
 
@@ -96,3 +121,60 @@ def upload_file(request):
             "imports": imports,
         },
     )
+
+
+@login_required
+@require_POST
+def resume_import(request, pk):
+    """
+    Resume a failed checkpointed import from its last committed row.
+    """
+    import_file = get_object_or_404(
+        ImportFile, pk=pk, uploaded_by=request.user, checkpointed=True, status="error"
+    )
+    process_import(request, import_file)
+    return redirect("data_loader:upload")
+
+
+@login_required
+@csrf_exempt
+@require_POST
+async def upload_file_stream(request, file_type):
+    """
+    Asynchronous upload view. The file is streamed to disk while it is hashed
+    and its header row checked, so malformed files are rejected early; accepted
+    files are then validated and ingested on a worker thread.
+    """
+    if file_type not in VALIDATORS:
+        messages.error(request, "Invalid file type.")
+        return redirect("data_loader:upload")
+
+    # Upload handlers can only be swapped before the body is parsed, hence
+    # csrf_exempt here and the CSRF check once parsing is done.
+    handler = StreamingImportUploadHandler(request, file_type)
+    request.upload_handlers = [handler]
+    await sync_to_async(lambda: request.POST)()
+    return await store_streamed_upload(request, file_type, handler)
+
+
+@csrf_protect
+async def store_streamed_upload(request, file_type, handler):
+    if handler.error:
+        messages.error(request, f"File rejected: {handler.error}")
+        return redirect("data_loader:upload")
+
+    file = request.FILES.get("file")
+    if file is None:
+        messages.error(request, "No file received.")
+        return redirect("data_loader:upload")
+
+    import_file = await ImportFile.objects.acreate(
+        file=file,
+        file_type=file_type,
+        uploaded_by=await request.auser(),
+        checksum=file.sha256,
+        sheet_name=request.POST.get("sheet_name", "").strip(),
+        checkpointed=bool(request.POST.get("checkpointed")),
+    )
+    await sync_to_async(process_import)(request, import_file)
+    return redirect("data_loader:upload")